@@ -0,0 +1,257 @@
+"""Background completion of signal activations.
+
+Activations take minutes to hours. Each pending activation is a row in
+activation_jobs with the time it is next due; one timer thread sleeps on a
+heap of due times and hands due jobs to a small worker pool, which advances
+them (polls the platform, or completes a simulated activation) and either
+finishes them or schedules the next check. Pending jobs cost nothing until
+they are due, and status reads are plain lookups of the persisted state.
+Jobs survive restarts, and when several worker processes run a scheduler a
+short claim on each job keeps two of them from advancing it at once.
+"""
+
+import heapq
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Optional, Callable
+
+from database import create_activation_jobs_table
+
+
+def activation_job_key(segment_id: str, platform: str, account: Optional[str]) -> str:
+    return f"{segment_id}|{platform}|{account or ''}"
+
+
+class ActivationJob:
+    """A pending activation of a segment on a platform/account."""
+
+    __slots__ = ("key", "kind", "segment_id", "platform", "account", "platform_segment_id",
+                 "due_at", "attempts", "created_at")
+
+    def __init__(self, kind: str, segment_id: str, platform: str, account: Optional[str],
+                 platform_segment_id: str, due_at: float, attempts: int = 0, created_at: float = 0.0):
+        self.key = activation_job_key(segment_id, platform, account)
+        self.kind = kind
+        self.segment_id = segment_id
+        self.platform = platform
+        self.account = account
+        self.platform_segment_id = platform_segment_id
+        self.due_at = due_at
+        self.attempts = attempts
+        self.created_at = created_at
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "ActivationJob":
+        return cls(row["kind"], row["segment_id"], row["platform"], row["account"],
+                   row["platform_segment_id"], row["due_at"], row["attempts"], row["created_at"])
+
+
+class ActivationScheduler:
+    """Timer-driven state machine for pending activations.
+
+    advance(job) moves a due job forward and returns the seconds until it
+    should be checked again, or None once the activation is finished
+    (deployed or failed). If advance raises, the job is retried after
+    retry_seconds, doubling with each consecutive failure up to
+    max_retry_seconds. connect() returns a connection for the caller's
+    thread, such as a pooled one.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection],
+                 advance: Callable[[ActivationJob], Optional[float]],
+                 max_workers: int = 4, claim_seconds: float = 120, reload_seconds: float = 60,
+                 retry_seconds: float = 30, max_retry_seconds: float = 1800,
+                 clock: Callable[[], float] = time.time):
+        self.connect = connect
+        self.advance = advance
+        self.claim_seconds = claim_seconds
+        self.reload_seconds = reload_seconds
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self.clock = clock
+        self._heap: List[tuple] = []
+        self._due: Dict[str, float] = {}
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="activations")
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._table_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = self.connect()
+        conn.row_factory = sqlite3.Row
+        if not self._table_ready:
+            create_activation_jobs_table(conn.cursor())
+            conn.commit()
+            self._table_ready = True
+        return conn
+
+    def schedule(self, kind: str, segment_id: str, platform: str, account: Optional[str],
+                 platform_segment_id: str, delay_seconds: float) -> ActivationJob:
+        """Persist a pending activation, first due after delay_seconds; replaces an earlier one."""
+        now = self.clock()
+        job = ActivationJob(kind, segment_id, platform, account, platform_segment_id, now + delay_seconds,
+                            created_at=now)
+        conn = self._connect()
+        try:
+            conn.execute("""
+                INSERT OR REPLACE INTO activation_jobs
+                (job_key, kind, segment_id, platform, account, platform_segment_id, due_at, attempts,
+                 claimed_until, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 0, 0, ?)
+            """, (job.key, kind, segment_id, platform, account, platform_segment_id, job.due_at, now))
+            conn.commit()
+        finally:
+            conn.close()
+        self._push(job.key, job.due_at)
+        return job
+
+    def get(self, segment_id: str, platform: str, account: Optional[str]) -> Optional[ActivationJob]:
+        """The pending activation for a segment on a platform/account, or None."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM activation_jobs WHERE job_key = ?",
+                               (activation_job_key(segment_id, platform, account),)).fetchone()
+        finally:
+            conn.close()
+        return ActivationJob.from_row(row) if row else None
+
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._due)
+
+    def _push(self, key: str, due_at: float):
+        with self._condition:
+            if self._due.get(key) == due_at:
+                return
+            self._due[key] = due_at
+            heapq.heappush(self._heap, (due_at, key))
+            if self._heap[0][1] == key:
+                self._condition.notify()
+
+    def reload(self, until: Optional[float] = None):
+        """Pick up jobs from the database: after a restart, or scheduled by another process.
+
+        With until, only jobs due (and not claimed) by then are read, so a
+        periodic reload costs an index range scan instead of the whole table.
+        """
+        conn = self._connect()
+        try:
+            if until is None:
+                rows = conn.execute("SELECT job_key, due_at, claimed_until FROM activation_jobs").fetchall()
+            else:
+                rows = conn.execute("""
+                    SELECT job_key, due_at, claimed_until FROM activation_jobs
+                    WHERE due_at <= ? AND claimed_until <= ?
+                """, (until, until)).fetchall()
+        finally:
+            conn.close()
+        for row in rows:
+            self._push(row["job_key"], max(row["due_at"], row["claimed_until"]))
+
+    def _pop_due(self, now: float) -> List[str]:
+        keys = []
+        with self._condition:
+            while self._heap and self._heap[0][0] <= now:
+                due_at, key = heapq.heappop(self._heap)
+                # Entries superseded by a reschedule are skipped
+                if self._due.get(key) == due_at:
+                    del self._due[key]
+                    keys.append(key)
+        return keys
+
+    def _claim(self, key: str, now: float) -> Optional[ActivationJob]:
+        conn = self._connect()
+        try:
+            claimed = conn.execute("""
+                UPDATE activation_jobs SET claimed_until = ?
+                WHERE job_key = ? AND due_at <= ? AND claimed_until <= ?
+            """, (now + self.claim_seconds, key, now, now)).rowcount
+            row = conn.execute("SELECT * FROM activation_jobs WHERE job_key = ?", (key,)).fetchone() if claimed else None
+            conn.commit()
+        finally:
+            conn.close()
+        return ActivationJob.from_row(row) if row else None
+
+    def run_due(self) -> List[Future]:
+        """Claim every job that is due and advance it on the worker pool."""
+        now = self.clock()
+        futures = []
+        for key in self._pop_due(now):
+            try:
+                job = self._claim(key, now)
+            except sqlite3.Error as e:
+                print(f"Could not claim activation {key}: {e}")
+                self._push(key, now + self.retry_seconds)
+                continue
+            if job is not None:
+                futures.append(self._executor.submit(self._process, job))
+        return futures
+
+    def _process(self, job: ActivationJob):
+        attempts = 0
+        try:
+            next_check = self.advance(job)
+        except Exception as e:
+            attempts = job.attempts + 1
+            next_check = min(self.retry_seconds * 2 ** job.attempts, self.max_retry_seconds)
+            print(f"Advancing activation {job.key} failed ({e}), retrying in {next_check:g}s")
+
+        conn = self._connect()
+        try:
+            if next_check is None:
+                conn.execute("DELETE FROM activation_jobs WHERE job_key = ? AND created_at = ?",
+                             (job.key, job.created_at))
+            else:
+                due_at = self.clock() + next_check
+                conn.execute("""
+                    UPDATE activation_jobs SET due_at = ?, attempts = ?, claimed_until = 0
+                    WHERE job_key = ? AND created_at = ?
+                """, (due_at, attempts, job.key, job.created_at))
+                self._push(job.key, due_at)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def start(self):
+        """Resume persisted jobs and run the timer thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        try:
+            self.reload()
+        except sqlite3.Error as e:
+            print(f"Could not load pending activations: {e}")
+
+        def run():
+            next_reload = self.clock() + self.reload_seconds
+            while not self._stop.is_set():
+                with self._condition:
+                    now = self.clock()
+                    wake_at = min(self._heap[0][0] if self._heap else next_reload, next_reload)
+                    if wake_at > now:
+                        self._condition.wait(wake_at - now)
+                if self._stop.is_set():
+                    break
+                try:
+                    if self.clock() >= next_reload:
+                        # Everything was loaded at startup; later jobs come in as they fall due
+                        next_reload = self.clock() + self.reload_seconds
+                        self.reload(until=next_reload)
+                    self.run_due()
+                except Exception as e:
+                    print(f"Activation scheduler error: {e}")
+                    self._stop.wait(1.0)
+
+        self._thread = threading.Thread(target=run, name="activation-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._condition:
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
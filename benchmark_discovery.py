@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Offline benchmark of the full signal discovery pipeline.
+
+Runs discovery requests concurrently against the local LLM stand-in
+(llm.backend "local", configured under llm.stand_in) and reports request
+latency percentiles, throughput and the LLM call metrics. The stand-in's
+replies, latencies and injected failures are seeded per prompt, so runs
+are reproducible; with ranking batching on, which prompts get built still
+depends on request timing.
+
+    python benchmark_discovery.py --requests 200 --concurrency 16
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault('LLM_BACKEND', 'local')
+
+from database import init_db  # noqa: E402
+
+
+DEFAULT_SPECS = [
+    "luxury automotive buyers",
+    "sports enthusiasts",
+    "travel and vacation planners",
+    "health and fitness",
+    "weather-sensitive retail",
+    "parents with young children",
+    "technology early adopters",
+    "cooking and recipes",
+]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-results", type=int, default=10)
+    parser.add_argument("--progressive", action="store_true", help="Measure the progressive first phase")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the discovery and LLM response caches")
+    parser.add_argument("--specs", nargs="+", default=DEFAULT_SPECS)
+    args = parser.parse_args()
+
+    init_db()
+    import main as agent
+    from schemas import DeliverySpecification
+
+    if agent.LLM_MODEL_NAME != "local-stand-in":
+        print(f"Warning: benchmarking against the live model {agent.LLM_MODEL_NAME}")
+    if args.no_cache:
+        agent.discovery_cache = None
+        agent.llm_cache = None
+
+    deliver_to = DeliverySpecification(platforms="all", countries=["US"])
+
+    def run(i):
+        spec = args.specs[i % len(args.specs)]
+        started = time.monotonic()
+        try:
+            agent.discover_signals(spec, deliver_to, max_results=args.max_results, progressive=args.progressive)
+            return time.monotonic() - started, None
+        except Exception as e:
+            return time.monotonic() - started, type(e).__name__
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(run, range(args.requests)))
+    elapsed = time.monotonic() - started
+
+    latencies = [latency for latency, _ in results]
+    errors = [error for _, error in results if error]
+    print(f"{args.requests} requests, concurrency {args.concurrency}: {elapsed:.2f}s, "
+          f"{args.requests / elapsed:.1f} req/s, {len(errors)} errors")
+    print(f"latency p50 {percentile(latencies, 0.5) * 1000:.0f}ms, "
+          f"p95 {percentile(latencies, 0.95) * 1000:.0f}ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.0f}ms, "
+          f"max {max(latencies) * 1000:.0f}ms")
+    print(json.dumps({
+        "llm": agent.llm_metrics.snapshot(),
+        "circuit_breaker": agent.llm_breaker.stats() if agent.llm_breaker else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
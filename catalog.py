@@ -0,0 +1,552 @@
+"""In-memory catalog snapshot used by the signal discovery hot path."""
+
+import bisect
+import copy
+import itertools
+import math
+import re
+import sqlite3
+import threading
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Iterable, Tuple, Callable
+
+import numpy as np
+
+from database import get_catalog_versions
+from columnar import ColumnarSegments
+from taxonomy import TaxonomyTrie
+from vector_index import VectorIndex, Embedder
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Fields indexed for keyword search and their BM25 weights (name matches count
+# for more than description matches, same as the FTS5 ranking).
+INDEXED_FIELDS = {"name": 10.0, "description": 1.0}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Split text into lowercase word tokens."""
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class CatalogSnapshot:
+    """View of signal_segments and platform_deployments at one catalog version.
+
+    Holds per-segment records, deployments grouped by segment (and flagged
+    per platform/account row for deliverability masks), an inverted
+    index with per-field postings (field -> token -> {segment_id: term freq}),
+    a columnar view for vectorized filtering, a taxonomy trie over the
+    hierarchical segment names and, when semantic search is enabled, the
+    segment embedding matrix.
+
+    A snapshot never changes once it is built. apply_changes returns a new
+    snapshot for the new versions that shares everything the changes do not
+    touch and copies the rest (the changed posting lists, the columns and
+    flag arrays, the taxonomy nodes along changed paths) before patching
+    them, so readers take no locks and never see a half-applied refresh.
+    Rows never move: new segments are appended and deleted ones tombstoned.
+    """
+
+    def __init__(self, segments: Dict[str, Dict[str, Any]],
+                 deployments: Dict[str, List[Dict[str, Any]]],
+                 versions: Optional[Dict[str, int]] = None,
+                 updated_at_watermark: Optional[str] = None,
+                 vectors: Optional[VectorIndex] = None):
+        self.segments = segments
+        self.deployments = deployments
+        self.versions = versions or {}
+        self.updated_at_watermark = updated_at_watermark
+        self._owned: Optional[set] = None  # structures copied by the apply_changes in progress
+
+        self.postings: Dict[str, Dict[str, Dict[str, int]]] = {field: {} for field in INDEXED_FIELDS}
+        self.field_lengths: Dict[str, Dict[str, int]] = {field: {} for field in INDEXED_FIELDS}
+        self._length_totals = {field: 0 for field in INDEXED_FIELDS}
+        self.vocabulary: List[str] = []
+        for segment in segments.values():
+            self._index_segment(segment, new_tokens=False)
+        self.vocabulary = sorted({token for field_postings in self.postings.values() for token in field_postings})
+
+        self.columns = ColumnarSegments(segments.values())
+        self.ids = self.columns.ids
+        self.positions = {segment_id: i for i, segment_id in enumerate(self.ids)}
+        self.count = len(self.ids)
+        self.taxonomy = TaxonomyTrie(
+            [segment.get("name") or "" for segment in segments.values()],
+            self.columns.coverage_percentage,
+            self.columns.base_cpm
+        )
+        # platform -> account (None for platform-wide) -> per-row flag for such a deployment
+        self.deployment_rows: Dict[str, Dict[Optional[str], np.ndarray]] = {}
+        for segment_id, segment_deployments in deployments.items():
+            row = self.positions.get(segment_id)
+            if row is not None:
+                for deployment in segment_deployments:
+                    self._flag_deployment(deployment, row, True)
+        self._set_vectors(vectors)
+
+    def _set_vectors(self, vectors: Optional[VectorIndex]):
+        self.vectors = vectors
+        self.vector_positions = None
+        if vectors is not None:
+            self.vector_positions = np.fromiter(
+                (self.positions[segment_id] for segment_id in vectors.ids), dtype=np.int64, count=len(vectors)
+            )
+
+    @property
+    def average_lengths(self) -> Dict[str, float]:
+        return {
+            field: self._length_totals[field] / len(lengths) if lengths else 0.0
+            for field, lengths in self.field_lengths.items()
+        }
+
+    def _own(self, key: tuple) -> bool:
+        """Claim a shared structure for copying; False if already copied or nothing is shared."""
+        if self._owned is None or key in self._owned:
+            return False
+        self._owned.add(key)
+        return True
+
+    def _token_postings(self, field: str, token: str) -> Optional[Dict[str, int]]:
+        field_postings = self.postings[field]
+        token_postings = field_postings.get(token)
+        if token_postings is not None and self._own(("postings", field, token)):
+            token_postings = field_postings[token] = dict(token_postings)
+        return token_postings
+
+    def _index_segment(self, segment: Dict[str, Any], new_tokens: bool = True):
+        segment_id = segment["id"]
+        for field in INDEXED_FIELDS:
+            tokens = tokenize(segment.get(field))
+            self.field_lengths[field][segment_id] = len(tokens)
+            self._length_totals[field] += len(tokens)
+            for token in tokens:
+                token_postings = self._token_postings(field, token)
+                if token_postings is None:
+                    token_postings = self.postings[field][token] = {}
+                    self._own(("postings", field, token))
+                    if new_tokens:
+                        self._add_token(token)
+                token_postings[segment_id] = token_postings.get(segment_id, 0) + 1
+
+    def _unindex_segment(self, segment: Dict[str, Any]):
+        segment_id = segment["id"]
+        for field in INDEXED_FIELDS:
+            for token in set(tokenize(segment.get(field))):
+                token_postings = self._token_postings(field, token)
+                if token_postings is None:
+                    continue
+                token_postings.pop(segment_id, None)
+                if not token_postings:
+                    del self.postings[field][token]
+                    self._remove_token(token)
+            self._length_totals[field] -= self.field_lengths[field].pop(segment_id, 0)
+
+    def _add_token(self, token: str):
+        i = bisect.bisect_left(self.vocabulary, token)
+        if i == len(self.vocabulary) or self.vocabulary[i] != token:
+            self.vocabulary.insert(i, token)
+
+    def _remove_token(self, token: str):
+        if any(token in field_postings for field_postings in self.postings.values()):
+            return
+        i = bisect.bisect_left(self.vocabulary, token)
+        if i < len(self.vocabulary) and self.vocabulary[i] == token:
+            del self.vocabulary[i]
+
+    def _flag_deployment(self, deployment: Dict[str, Any], row: int, value: bool):
+        platform = deployment["platform"]
+        accounts = self.deployment_rows.get(platform)
+        if accounts is None or self._own(("platform", platform)):
+            accounts = self.deployment_rows[platform] = dict(accounts or {})
+        account = deployment.get("account")
+        flags = accounts.get(account)
+        if flags is not None and row < len(flags) and self._own(("flags", platform, account)):
+            accounts[account] = flags = flags.copy()
+        if flags is None or row >= len(flags):
+            grown = np.zeros(max(16, len(self.columns.alive), row + 1), dtype=bool)
+            if flags is not None:
+                grown[:len(flags)] = flags
+            accounts[account] = flags = grown
+        flags[row] = value
+
+    def _set_deployments(self, segment_id: str, segment_deployments: List[Dict[str, Any]]):
+        row = self.positions.get(segment_id)
+        if row is not None:
+            for deployment in self.deployments.get(segment_id, []):
+                self._flag_deployment(deployment, row, False)
+            for deployment in segment_deployments:
+                self._flag_deployment(deployment, row, True)
+        if segment_deployments:
+            self.deployments[segment_id] = segment_deployments
+        else:
+            self.deployments.pop(segment_id, None)
+
+    def apply_changes(self, upserts: Iterable[Dict[str, Any]], deleted_ids: Iterable[str],
+                      deployments: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+                      versions: Optional[Dict[str, int]] = None,
+                      updated_at_watermark: Optional[str] = None) -> "CatalogSnapshot":
+        """Return the snapshot for the new versions with segments added, replaced or removed.
+
+        Only the rows, posting lists and taxonomy paths of changed segments
+        are rebuilt; this snapshot is left as it was. deployments maps
+        segment ids to their complete new deployment lists, for the segments
+        whose deployments changed.
+        """
+        upserts = list(upserts)
+        deleted_ids = [segment_id for segment_id in deleted_ids if segment_id in self.segments]
+
+        snapshot = copy.copy(self)
+        snapshot.versions = versions if versions is not None else self.versions
+        snapshot.updated_at_watermark = updated_at_watermark or self.updated_at_watermark
+        snapshot._owned = set()
+        snapshot.segments = dict(self.segments)
+        snapshot.deployments = dict(self.deployments)
+        snapshot.positions = dict(self.positions)
+        snapshot.postings = {field: dict(field_postings) for field, field_postings in self.postings.items()}
+        snapshot.field_lengths = {field: dict(lengths) for field, lengths in self.field_lengths.items()}
+        snapshot._length_totals = dict(self._length_totals)
+        snapshot.vocabulary = list(self.vocabulary)
+        snapshot.columns = self.columns.copy()
+        snapshot.ids = snapshot.columns.ids
+        snapshot.taxonomy = self.taxonomy.copy(snapshot.columns.coverage_percentage, snapshot.columns.base_cpm)
+        snapshot.deployment_rows = dict(self.deployment_rows)
+        snapshot._patch(upserts, deleted_ids, deployments or {})
+        snapshot._owned = None
+        snapshot.count = len(snapshot.columns)
+        if self.vectors is not None and (upserts or deleted_ids):
+            snapshot._set_vectors(self.vectors.with_changes(upserts, deleted_ids))
+        return snapshot
+
+    def _patch(self, upserts: List[Dict[str, Any]], deleted_ids: List[str],
+               deployments: Dict[str, List[Dict[str, Any]]]):
+        for segment_id in deleted_ids:
+            old = self.segments[segment_id]
+            row = self.positions[segment_id]
+            self._unindex_segment(old)
+            self.taxonomy.remove(row, old.get("name") or "")
+            self.columns.remove_row(row)
+            del self.segments[segment_id]
+
+        for segment in upserts:
+            segment_id = segment["id"]
+            old = self.segments.get(segment_id)
+            row = self.positions.get(segment_id)
+            if old is not None:
+                self._unindex_segment(old)
+                self.taxonomy.remove(row, old.get("name") or "")
+            if row is None:
+                # A new segment gets the next row; a deleted one that comes back keeps its row
+                row = len(self.columns)
+            self.columns.set_row(row, segment)
+            self.segments[segment_id] = segment
+            if segment_id not in self.positions:
+                self.positions[segment_id] = row
+                for deployment in self.deployments.get(segment_id, []):
+                    self._flag_deployment(deployment, row, True)
+            self._index_segment(segment)
+            # The columns may have grown into new arrays
+            self.taxonomy.coverage = self.columns.coverage_percentage
+            self.taxonomy.cpm = self.columns.base_cpm
+            self.taxonomy.add(row, segment.get("name") or "")
+
+        for segment_id, segment_deployments in deployments.items():
+            self._set_deployments(segment_id, segment_deployments)
+
+    def expand_prefix(self, prefix: str) -> List[str]:
+        """Return all indexed tokens starting with prefix."""
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        matches = []
+        for token in itertools.islice(self.vocabulary, start, None):
+            if not token.startswith(prefix):
+                break
+            matches.append(token)
+        return matches
+
+    def keyword_scores(self, text: str) -> Dict[str, float]:
+        """BM25 score every segment matching any word of text (as a prefix)."""
+        total = len(self.segments)
+        average_lengths = self.average_lengths
+        scores: Dict[str, float] = defaultdict(float)
+
+        for word in dict.fromkeys(tokenize(text)):
+            for token in self.expand_prefix(word):
+                for field, weight in INDEXED_FIELDS.items():
+                    token_postings = self.postings[field].get(token)
+                    if not token_postings:
+                        continue
+                    idf = math.log(1 + (total - len(token_postings) + 0.5) / (len(token_postings) + 0.5))
+                    average_length = average_lengths[field] or 1.0
+                    lengths = self.field_lengths[field]
+                    for segment_id, tf in token_postings.items():
+                        norm = 1 - BM25_B + BM25_B * lengths.get(segment_id, 0) / average_length
+                        scores[segment_id] += weight * idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+
+        return scores
+
+    def filter_mask(self, access_level: str, filters: Any = None) -> np.ndarray:
+        """Vectorized access/filter mask aligned with self.ids."""
+        return self.columns.mask(access_level, filters, self.count)
+
+    def deliverable_mask(self, platforms: List[Tuple[str, Optional[str]]]) -> np.ndarray:
+        """Rows with a deployment that can deliver to one of the (platform, account) pairs.
+
+        An account is served by platform-wide deployments and by deployments
+        on that account; a None account accepts any deployment on the platform.
+        """
+        mask = np.zeros(self.count, dtype=bool)
+        for platform, account in platforms:
+            accounts = self.deployment_rows.get(platform, {})
+            for deployment_account, flags in accounts.items():
+                if account is None or deployment_account in (None, account):
+                    rows = min(self.count, len(flags))
+                    mask[:rows] |= flags[:rows]
+        return mask
+
+    def search(self, text: Optional[str], mask: Optional[np.ndarray] = None,
+               limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Find segments for a free-text spec.
+
+        With text, returns keyword matches ordered by BM25 score; without, all
+        segments ordered by coverage. mask (aligned with self.ids, see
+        filter_mask) drops candidates before the limit is applied.
+        """
+        if text and tokenize(text):
+            ranked: List[Tuple[str, float]] = sorted(
+                self.keyword_scores(text).items(), key=lambda item: (-item[1], item[0])
+            )
+            if mask is not None:
+                # Segments added after the mask was computed are not in it
+                rows = [self.positions.get(segment_id, len(mask)) for segment_id, _ in ranked]
+                ranked = [item for item, row in zip(ranked, rows) if row < len(mask) and mask[row]]
+            selected = [segment_id for segment_id, _ in ranked[:limit]]
+        else:
+            rows = np.flatnonzero(mask if mask is not None else self.columns.alive[:self.count])
+            rows = rows[np.argsort(-self.columns.coverage_percentage[rows], kind="stable")]
+            selected = [self.ids[i] for i in rows[:limit]]
+
+        return [dict(segment) for segment in map(self.segments.get, selected) if segment is not None]
+
+    def semantic_search(self, text: Optional[str], k: int = 10, min_similarity: float = 0.0,
+                        mask: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Find the k segments closest to text in embedding space."""
+        if self.vectors is None or not text:
+            return []
+
+        if mask is not None:
+            # Re-align the mask from snapshot order to embedding-matrix order
+            mask = mask[self.vector_positions]
+
+        results = []
+        for segment_id, similarity in self.vectors.search(text, k, min_similarity, mask):
+            segment = self.segments.get(segment_id)
+            if segment is not None:
+                segment = dict(segment)
+                segment["semantic_similarity"] = round(similarity, 4)
+                results.append(segment)
+        return results
+
+    def taxonomy_search(self, text: Optional[str], mask: Optional[np.ndarray] = None,
+                        limit: Optional[int] = None):
+        """Resolve taxonomy nodes named in text to the segments in their subtrees.
+
+        Returns (segments, nodes); only nodes with children count as taxonomy
+        matches, so flat segment names are left to keyword search.
+        """
+        nodes = [node for node in self.taxonomy.match(text) if node.children]
+        results = []
+        for node in nodes:
+            for row in self.taxonomy.subtree_rows(node, mask):
+                if limit is not None and len(results) >= limit:
+                    return results, nodes
+                segment = self.segments.get(self.ids[row])
+                if segment is not None:
+                    results.append(dict(segment))
+        return results, nodes
+
+    def get_segment(self, segment_id: str) -> Optional[Dict[str, Any]]:
+        """Get a segment record by ID."""
+        return self.segments.get(segment_id)
+
+    def get_deployments(self, segment_id: str) -> List[Dict[str, Any]]:
+        """Get platform deployment records for a segment."""
+        return self.deployments.get(segment_id, [])
+
+
+class CatalogStore:
+    """Owns the current catalog snapshot and keeps it fresh.
+
+    A background thread polls SQLite's data_version (cheap, and changes when
+    any other connection commits) and then the per-table counters in
+    catalog_versions. Changed segments are reloaded incrementally through the
+    updated_at watermark (a trigger bumps updated_at on every UPDATE, and a
+    change that still can't be found triggers a full reload); deployments are reloaded when their counter moves,
+    and only the segments whose deployments differ are patched. Readers just
+    grab the current snapshot reference, so the hot path never touches disk.
+    """
+
+    def __init__(self, db_path: str = 'signals_agent.db', refresh_interval_seconds: float = 2.0,
+                 embedder: Optional[Embedder] = None, embeddings_path: Optional[str] = None,
+                 approximate_threshold: Optional[int] = None):
+        self.db_path = db_path
+        self.refresh_interval_seconds = refresh_interval_seconds
+        self.embedder = embedder
+        self.embeddings_path = embeddings_path
+        self.approximate_threshold = approximate_threshold
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._data_version: Optional[int] = None
+        self._lock = threading.Lock()
+        self._poller: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._wake = threading.Event()
+        self._listeners: List[Callable[[Dict[str, int], Dict[str, int]], None]] = []
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, timeout=30.0, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+        return self._conn
+
+    def snapshot(self) -> Optional[CatalogSnapshot]:
+        """Return the current snapshot, loading it on first use.
+
+        Returns None if the catalog tables are not available yet.
+        """
+        if self._snapshot is None:
+            try:
+                self.refresh(force=True)
+            except sqlite3.Error:
+                return None
+            self.start()
+        return self._snapshot
+
+    def refresh(self, force: bool = False) -> Optional[CatalogSnapshot]:
+        """Reload whatever changed since the last refresh and swap the snapshot."""
+        with self._lock:
+            conn = self._connection()
+            cursor = conn.cursor()
+
+            cursor.execute("PRAGMA data_version")
+            data_version = cursor.fetchone()[0]
+            if not force and self._snapshot is not None and data_version == self._data_version:
+                return self._snapshot
+
+            versions = get_catalog_versions(cursor)
+            current = self._snapshot
+
+            if current is None:
+                self._snapshot = self._load_full(cursor, versions)
+            elif versions != current.versions:
+                self._snapshot = self._load_changes(cursor, current, versions)
+                for listener in self._listeners:
+                    listener(current.versions, versions)
+
+            self._data_version = data_version
+            return self._snapshot
+
+    def add_listener(self, listener: Callable[[Dict[str, int], Dict[str, int]], None]):
+        """Call listener(previous_versions, versions) whenever a catalog table changes."""
+        self._listeners.append(listener)
+
+    def _load_deployments(self, cursor: sqlite3.Cursor) -> Dict[str, List[Dict[str, Any]]]:
+        cursor.execute("SELECT * FROM platform_deployments")
+        deployments: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for row in cursor.fetchall():
+            deployment = dict(row)
+            deployments[deployment["signals_agent_segment_id"]].append(deployment)
+        return dict(deployments)
+
+    def _load_full(self, cursor: sqlite3.Cursor, versions: Dict[str, int]) -> CatalogSnapshot:
+        cursor.execute("SELECT * FROM signal_segments")
+        segments = {row["id"]: dict(row) for row in cursor.fetchall()}
+        watermark = max((s["updated_at"] for s in segments.values()), default=None)
+        vectors = None
+        if self.embedder is not None:
+            vectors = VectorIndex.load_or_build(
+                self.embeddings_path, segments.values(), self.embedder, self.approximate_threshold
+            )
+        return CatalogSnapshot(segments, self._load_deployments(cursor), versions, watermark, vectors)
+
+    def _load_changes(self, cursor: sqlite3.Cursor, current: CatalogSnapshot,
+                      versions: Dict[str, int]) -> CatalogSnapshot:
+        upserts: List[Dict[str, Any]] = []
+        deleted_ids: List[str] = []
+        watermark = current.updated_at_watermark
+
+        if versions.get("signal_segments") != current.versions.get("signal_segments"):
+            if watermark is None:
+                cursor.execute("SELECT * FROM signal_segments")
+            else:
+                # >= so rows sharing the watermark timestamp are not missed
+                cursor.execute("SELECT * FROM signal_segments WHERE updated_at >= ?", (watermark,))
+            upserts = [dict(row) for row in cursor.fetchall()]
+            watermark = max([watermark or ""] + [s["updated_at"] for s in upserts]) or None
+
+            cursor.execute("SELECT id FROM signal_segments")
+            live_ids = {row["id"] for row in cursor.fetchall()}
+            deleted_ids = [segment_id for segment_id in current.segments if segment_id not in live_ids]
+            if not upserts and not deleted_ids:
+                # The table changed but no row moved past the watermark (e.g. an
+                # explicit older updated_at), so the change can't be located
+                return self._load_full(cursor, versions)
+
+        deployments = None
+        if versions.get("platform_deployments") != current.versions.get("platform_deployments"):
+            loaded = self._load_deployments(cursor)
+            deployments = {
+                segment_id: loaded.get(segment_id, [])
+                for segment_id in set(loaded) | set(current.deployments)
+                if loaded.get(segment_id, []) != current.deployments.get(segment_id, [])
+            }
+
+        return current.apply_changes(upserts, deleted_ids, deployments, versions, watermark)
+
+    def notify_write(self):
+        """Have the polling thread refresh now, after a catalog write made by this process.
+
+        Without a polling thread (refresh_interval_seconds <= 0) the refresh
+        runs inline.
+        """
+        if self._snapshot is None:
+            return
+        if self._poller is not None:
+            self._wake.set()
+        else:
+            self.refresh()
+
+    def start(self):
+        """Start the background polling thread (idempotent)."""
+        if self._poller is not None or self.refresh_interval_seconds <= 0:
+            return
+        self._poller = threading.Thread(target=self._poll, name="catalog-refresh", daemon=True)
+        self._poller.start()
+
+    def stop(self):
+        """Stop polling and close the polling connection."""
+        self._stopped.set()
+        self._wake.set()
+        if self._poller is not None:
+            self._poller.join(timeout=self.refresh_interval_seconds + 1)
+            self._poller = None
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _poll(self):
+        while True:
+            self._wake.wait(self.refresh_interval_seconds)
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.refresh()
+            except sqlite3.Error as e:
+                print(f"Catalog refresh failed: {e}")
+
@@ -0,0 +1,146 @@
+"""Circuit breaker for a flaky dependency (the Gemini API)."""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Callable
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the dependency while the circuit is open."""
+
+
+class CircuitBreaker:
+    """Trips on a high error rate or slow-call rate, then probes for recovery.
+
+    While closed, the outcomes of the last window_size calls are kept; once
+    at least min_calls are in the window and either the failure rate or the
+    rate of calls slower than slow_call_seconds reaches its threshold, the
+    circuit opens. Calls are refused for open_seconds, after which the
+    circuit is half-open: up to half_open_probes calls go through, and the
+    first probe outcome closes or reopens it. A probe that has not reported
+    back within open_seconds frees its slot for another probe.
+    """
+
+    def __init__(self, name: str = "llm", window_size: int = 20, min_calls: int = 5,
+                 failure_rate_threshold: float = 0.5, slow_call_seconds: float = 8.0,
+                 slow_call_rate_threshold: float = 0.5, open_seconds: float = 30.0,
+                 half_open_probes: int = 1, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.clock = clock
+        self._window: deque = deque(maxlen=window_size)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._half_open_at = 0.0
+        self._probes: deque = deque()
+        self._trips = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def is_open(self) -> bool:
+        """Whether calls are currently refused outright (half-open is not open)."""
+        return self.state == OPEN
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now; half-open admits a limited number of probes."""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN:
+                now = self.clock()
+                while self._probes and now - self._probes[0] > self.open_seconds:
+                    self._probes.popleft()
+                if len(self._probes) < self.half_open_probes:
+                    self._probes.append(now)
+                    return True
+            self._rejected += 1
+            return False
+
+    def record_success(self, latency_seconds: float):
+        self._record(False, latency_seconds)
+
+    def record_failure(self, latency_seconds: float):
+        self._record(True, latency_seconds)
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn through the breaker; exceptions from fn count as failures."""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        started = self.clock()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record_failure(self.clock() - started)
+            raise
+        self.record_success(self.clock() - started)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "trips": self._trips,
+                "rejected": self._rejected,
+                "window_calls": len(self._window),
+                "window_failures": sum(1 for failed, _ in self._window if failed),
+                "window_slow_calls": sum(1 for _, slow in self._window if slow),
+            }
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and self.clock() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._half_open_at = self._opened_at + self.open_seconds
+            self._probes.clear()
+        return self._state
+
+    def _record(self, failed: bool, latency_seconds: float):
+        slow = latency_seconds >= self.slow_call_seconds
+        with self._lock:
+            state = self._current_state()
+            if state == HALF_OPEN:
+                if self.clock() - latency_seconds < self._half_open_at:
+                    # Started before the probing began, so not a probe
+                    return
+                if failed or slow:
+                    self._open()
+                else:
+                    self._state = CLOSED
+                    self._window.clear()
+                return
+            if state == OPEN:
+                # A call admitted before the circuit opened
+                return
+
+            self._window.append((failed, slow))
+            calls = len(self._window)
+            if calls < self.min_calls:
+                return
+            failures = sum(1 for f, _ in self._window if f)
+            slow_calls = sum(1 for _, s in self._window if s)
+            if failures / calls >= self.failure_rate_threshold or slow_calls / calls >= self.slow_call_rate_threshold:
+                self._open()
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = self.clock()
+        self._window.clear()
+        self._probes.clear()
+        self._trips += 1
+        print(f"{self.name} circuit opened; calls are short-circuited for {self.open_seconds:g}s")
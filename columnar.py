@@ -0,0 +1,149 @@
+"""Columnar view of segments for vectorized SignalFilters evaluation."""
+
+import copy
+from typing import List, Dict, Any, Optional, Iterable
+
+import numpy as np
+
+
+# Catalogs visible at each principal access level
+ACCESS_LEVEL_CATALOGS = {
+    'public': ('public',),
+    'personalized': ('public', 'personalized'),
+    'private': ('public', 'personalized', 'private'),
+}
+
+CATEGORICAL_COLUMNS = ('signal_type', 'data_provider', 'catalog_access', 'platform')
+
+
+def segment_signal_type(segment: Dict[str, Any]) -> str:
+    """Signal type of a segment (adapter segments report it as audience_type)."""
+    return segment.get('signal_type', segment.get('audience_type', 'audience'))
+
+
+def _float_or_nan(value: Any) -> float:
+    return float(value) if value is not None else np.nan
+
+
+class ColumnarSegments:
+    """Segments stored as NumPy columns.
+
+    Numeric fields become float64 arrays (NaN for unknown values) and
+    categorical fields become int32 code arrays with a per-column vocabulary,
+    so a whole SignalFilters request is one vectorized mask computation.
+
+    Rows can be patched, appended (the arrays grow by doubling) and removed
+    (tombstoned, so row numbers never move) on a copy() while readers keep
+    using the original. The arrays may be longer than len(self); only the
+    first len(self) rows are segments.
+    """
+
+    def __init__(self, segments: Iterable[Dict[str, Any]]):
+        segments = list(segments)
+        count = len(segments)
+        self.ids = [segment['id'] for segment in segments]
+        self.base_cpm = np.fromiter(
+            (_float_or_nan(s.get('base_cpm')) for s in segments), dtype=np.float64, count=count
+        )
+        self.coverage_percentage = np.fromiter(
+            (_float_or_nan(s.get('coverage_percentage')) for s in segments), dtype=np.float64, count=count
+        )
+        self.alive = np.ones(count, dtype=bool)
+
+        self.vocabularies: Dict[str, Dict[Optional[str], int]] = {}
+        self.codes: Dict[str, np.ndarray] = {}
+        for column in CATEGORICAL_COLUMNS:
+            vocabulary: Dict[Optional[str], int] = {}
+            if column == 'signal_type':
+                values = (segment_signal_type(s) for s in segments)
+            else:
+                values = (s.get(column) for s in segments)
+            self.codes[column] = np.fromiter(
+                (vocabulary.setdefault(value, len(vocabulary)) for value in values),
+                dtype=np.int32, count=count
+            )
+            self.vocabularies[column] = vocabulary
+        self._size = count
+
+    def __len__(self) -> int:
+        return self._size
+
+    def copy(self) -> "ColumnarSegments":
+        """Independent copy of the columns to write changes into."""
+        columns = copy.copy(self)
+        columns.ids = list(self.ids)
+        columns.base_cpm = self.base_cpm.copy()
+        columns.coverage_percentage = self.coverage_percentage.copy()
+        columns.alive = self.alive.copy()
+        columns.vocabularies = {column: dict(vocabulary) for column, vocabulary in self.vocabularies.items()}
+        columns.codes = {column: codes.copy() for column, codes in self.codes.items()}
+        return columns
+
+    def _grow(self):
+        capacity = max(16, 2 * len(self.base_cpm))
+
+        def grown(array: np.ndarray, fill) -> np.ndarray:
+            bigger = np.full(capacity, fill, dtype=array.dtype)
+            bigger[:len(array)] = array
+            return bigger
+
+        self.base_cpm = grown(self.base_cpm, np.nan)
+        self.coverage_percentage = grown(self.coverage_percentage, np.nan)
+        self.alive = grown(self.alive, False)
+        self.codes = {column: grown(codes, -1) for column, codes in self.codes.items()}
+
+    def set_row(self, row: int, segment: Dict[str, Any]):
+        """Write segment into an existing row, or append it when row == len(self)."""
+        if row == self._size and row == len(self.base_cpm):
+            self._grow()
+        self.base_cpm[row] = _float_or_nan(segment.get('base_cpm'))
+        self.coverage_percentage[row] = _float_or_nan(segment.get('coverage_percentage'))
+        for column in CATEGORICAL_COLUMNS:
+            value = segment_signal_type(segment) if column == 'signal_type' else segment.get(column)
+            vocabulary = self.vocabularies[column]
+            self.codes[column][row] = vocabulary.setdefault(value, len(vocabulary))
+        self.alive[row] = True
+        if row == self._size:
+            self.ids.append(segment['id'])
+            self._size += 1
+
+    def remove_row(self, row: int):
+        """Tombstone a row; it no longer passes any mask."""
+        self.alive[row] = False
+
+    def isin(self, column: str, values: Iterable[Optional[str]], count: Optional[int] = None) -> np.ndarray:
+        """Boolean mask of rows whose categorical column is one of values."""
+        count = len(self) if count is None else count
+        vocabulary = self.vocabularies[column]
+        wanted = [vocabulary[value] for value in values if value in vocabulary]
+        if not wanted:
+            return np.zeros(count, dtype=bool)
+        return np.isin(self.codes[column][:count], np.array(wanted, dtype=np.int32))
+
+    def mask(self, access_level: str, filters: Any = None, count: Optional[int] = None) -> np.ndarray:
+        """Rows visible at access_level that pass SignalFilters.
+
+        Unknown CPM or coverage never satisfies a CPM or coverage filter,
+        matching SQL NULL comparison semantics. count limits the mask to the
+        first count rows (a snapshot's rows); removed rows never pass.
+        """
+        count = len(self) if count is None else count
+        mask = self.isin('catalog_access', ACCESS_LEVEL_CATALOGS.get(access_level, ('public',)), count)
+        mask &= self.alive[:count]
+
+        if filters:
+            if filters.catalog_types:
+                mask &= self.isin('signal_type', filters.catalog_types, count)
+            if filters.data_providers:
+                mask &= self.isin('data_provider', filters.data_providers, count)
+            with np.errstate(invalid='ignore'):
+                if filters.max_cpm:
+                    mask &= self.base_cpm[:count] <= filters.max_cpm
+                if filters.min_coverage_percentage:
+                    mask &= self.coverage_percentage[:count] >= filters.min_coverage_percentage
+
+        return mask
+
+    def select(self, segments: List[Dict[str, Any]], mask: np.ndarray) -> List[Dict[str, Any]]:
+        """Return the segments (aligned with this view) where mask is True."""
+        return [segments[i] for i in np.flatnonzero(mask)]
@@ -10,6 +10,7 @@ def load_config() -> Dict[str, Any]:
     
     Environment variables:
     - GEMINI_API_KEY: Overrides gemini_api_key
+    - LLM_BACKEND: Overrides llm.backend ("gemini" or "local")
     - IX_USERNAME: Overrides platforms.index-exchange.username
     - IX_PASSWORD: Overrides platforms.index-exchange.password
     - IX_ACCOUNT_MAPPING: JSON string for principal account mappings
@@ -27,6 +28,10 @@ def load_config() -> Dict[str, Any]:
     if gemini_key := os.environ.get('GEMINI_API_KEY'):
         config['gemini_api_key'] = gemini_key
     
+    # LLM backend override (the local stand-in for offline benchmarks)
+    if llm_backend := os.environ.get('LLM_BACKEND'):
+        config.setdefault('llm', {})['backend'] = llm_backend
+    
     # Platform-specific overrides
     if 'platforms' in config:
         # Index Exchange overrides
@@ -0,0 +1,214 @@
+"""Context ids, expiry and purging of expired contexts.
+
+Every discovery and activation leaves a context row that expires after 7 or
+30 days. Expiry works on integer epoch columns with an index, and a
+background thread deletes expired rows in small batches, each its own short
+transaction, so purging never holds the write lock for long.
+
+Context ids are time-ordered (a millisecond timestamp followed by random
+bits, ULID style), so consecutive inserts land next to each other in the
+primary key index instead of at random pages. The creation time in the id
+also allows optional time-bucketed storage: with partition_days set,
+contexts go to one table per period, and a period whose contexts have all
+expired is dropped as a whole instead of deleted row by row.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Dict, Optional, Callable
+
+from database import create_contexts_table
+
+
+CONTEXT_TABLE = "contexts"
+ALIAS_TABLE = "context_aliases"
+
+# Crockford base32, lowercase to match the rest of the id
+_ALPHABET = "0123456789abcdefghjkmnpqrstvwxyz"
+_ULID_ID = re.compile(r"^ctx_([0-9a-hjkmnp-tv-z]{10})[0-9a-hjkmnp-tv-z]{16}$")
+_LEGACY_ID = re.compile(r"^ctx_(\d+)_[a-z0-9]+$")
+_PARTITION_TABLE = re.compile(r"^contexts_(\d{8})$")
+
+_id_lock = threading.Lock()
+_last_ms = 0
+_last_random = 0
+
+
+def _encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        value, index = divmod(value, 32)
+        chars.append(_ALPHABET[index])
+    return "".join(reversed(chars))
+
+
+def new_context_id(now: Optional[float] = None) -> str:
+    """A time-ordered context id: ctx_ + 48-bit ms timestamp + 80 random bits.
+
+    Ids made in the same millisecond increment the random part, so ids from
+    one process always sort in creation order.
+    """
+    global _last_ms, _last_random
+    ms = int((time.time() if now is None else now) * 1000)
+    with _id_lock:
+        if ms == _last_ms:
+            randomness = _last_random + 1
+            if randomness >= 1 << 80:
+                ms += 1
+                randomness = int.from_bytes(os.urandom(10), "big")
+        else:
+            randomness = int.from_bytes(os.urandom(10), "big")
+        _last_ms, _last_random = ms, randomness
+    return f"ctx_{_encode(ms, 10)}{_encode(randomness, 16)}"
+
+
+def context_id_timestamp(context_id: str) -> Optional[float]:
+    """Creation time (epoch seconds) encoded in a context id, or None if it has none."""
+    match = _ULID_ID.match(context_id or "")
+    if match:
+        ms = 0
+        for char in match.group(1):
+            ms = ms * 32 + _ALPHABET.index(char)
+        return ms / 1000.0
+    match = _LEGACY_ID.match(context_id or "")
+    if match:
+        return float(match.group(1))
+    return None
+
+
+class ContextRetention:
+    """Routes contexts to their table and purges expired ones.
+
+    connect() opens a connection for the caller's thread. With
+    partition_days > 0, contexts with a time-ordered id are stored in a
+    table per period (contexts_YYYYMMDD, the period's first day in UTC);
+    contexts with older ids stay in the contexts table.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], batch_size: int = 500,
+                 pause_seconds: float = 0.01, partition_days: int = 0,
+                 clock: Callable[[], float] = time.time):
+        self.connect = connect
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self.partition_seconds = partition_days * 86400
+        self.clock = clock
+        self._tables = {CONTEXT_TABLE}
+        self._tables_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _partition(self, created_at: float) -> str:
+        start = int(created_at // self.partition_seconds) * self.partition_seconds
+        return datetime.fromtimestamp(start, timezone.utc).strftime("contexts_%Y%m%d")
+
+    def table_for(self, context_id: str) -> str:
+        """Table holding context_id, created if it is a new period's table."""
+        if not self.partition_seconds or not _ULID_ID.match(context_id or ""):
+            return CONTEXT_TABLE
+        table = self._partition(context_id_timestamp(context_id))
+        with self._tables_lock:
+            if table not in self._tables:
+                conn = self.connect()
+                try:
+                    create_contexts_table(conn.cursor(), table)
+                    conn.commit()
+                finally:
+                    conn.close()
+                self._tables.add(table)
+        return table
+
+    def context_tables(self, conn: sqlite3.Connection) -> List[str]:
+        rows = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND (name = ? OR name GLOB 'contexts_[0-9]*')",
+            (CONTEXT_TABLE,)
+        ).fetchall()
+        return [row[0] for row in rows if row[0] == CONTEXT_TABLE or _PARTITION_TABLE.match(row[0])]
+
+    def purge_expired(self) -> int:
+        """Delete expired contexts (and client context aliases) in batches of batch_size.
+
+        Returns how many contexts were deleted.
+        """
+        deleted = 0
+        conn = self.connect()
+        try:
+            tables = self.context_tables(conn)
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                            (ALIAS_TABLE,)).fetchone():
+                tables.append(ALIAS_TABLE)
+            for table in tables:
+                while not self._stop.is_set():
+                    count = conn.execute(f"""
+                        DELETE FROM {table} WHERE rowid IN (
+                            SELECT rowid FROM {table} WHERE expires_at_epoch <= ? LIMIT ?
+                        )
+                    """, (int(self.clock()), self.batch_size)).rowcount
+                    conn.commit()
+                    if table != ALIAS_TABLE:
+                        deleted += count
+                    if count < self.batch_size:
+                        break
+                    # Let request writes in between batches
+                    time.sleep(self.pause_seconds)
+        finally:
+            conn.close()
+        return deleted
+
+    def drop_expired_partitions(self) -> List[str]:
+        """Drop period tables whose period is over and whose contexts have all expired."""
+        if not self.partition_seconds:
+            return []
+        now = self.clock()
+        dropped = []
+        conn = self.connect()
+        try:
+            for table in self.context_tables(conn):
+                match = _PARTITION_TABLE.match(table)
+                if not match:
+                    continue
+                start = datetime.strptime(match.group(1), "%Y%m%d").replace(tzinfo=timezone.utc).timestamp()
+                if start + self.partition_seconds > now:
+                    continue
+                latest = conn.execute(f"SELECT MAX(expires_at_epoch) FROM {table}").fetchone()[0]
+                if latest is not None and latest > now:
+                    continue
+                with self._tables_lock:
+                    conn.execute(f"DROP TABLE {table}")
+                    conn.commit()
+                    self._tables.discard(table)
+                dropped.append(table)
+        finally:
+            conn.close()
+        return dropped
+
+    def run_once(self) -> Dict[str, int]:
+        dropped = self.drop_expired_partitions()
+        return {"deleted": self.purge_expired(), "dropped_tables": len(dropped)}
+
+    def start(self, interval_seconds: float = 300):
+        """Purge on a background thread every interval_seconds."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                try:
+                    self.run_once()
+                except sqlite3.Error as e:
+                    print(f"Context purge failed: {e}")
+                self._stop.wait(interval_seconds)
+
+        self._thread = threading.Thread(target=run, name="context-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -0,0 +1,215 @@
+"""Single writer thread with group commit for context writes.
+
+Discovery and activation contexts are written on every request. Instead of
+each request running its own INSERT and COMMIT, and waiting on SQLite's
+database lock behind other writers, writes are queued and one thread
+commits them in groups: whatever arrives within max_delay_ms of the first
+queued write, up to max_batch_rows, goes into a single transaction. Writes
+are keyed (by context id); wait_for(key) gives read-your-writes by blocking
+until that key's queued writes are committed, which readers of a context
+call before querying it.
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Dict, Optional, Callable, Sequence
+
+
+class ContextWrite:
+    """One queued SQL statement."""
+
+    __slots__ = ("key", "sql", "params", "future")
+
+    def __init__(self, key: Optional[str], sql: str, params: Sequence):
+        self.key = key
+        self.sql = sql
+        self.params = params
+        self.future: Future = Future()
+
+
+_STOP = object()
+
+
+class ContextWriter:
+    """Queue of writes drained by one thread that commits them in groups.
+
+    connect() opens the writer's connection and is called on the writer
+    thread. A statement that fails only fails its own write: the group is
+    rolled back and its statements retried one at a time.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], max_batch_rows: int = 256,
+                 max_delay_ms: float = 2.0, queue_size: int = 10000):
+        self.connect = connect
+        self.max_batch_rows = max_batch_rows
+        self.max_delay_seconds = max_delay_ms / 1000.0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._pending: Dict[Optional[str], int] = {}
+        self._unfinished = 0
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+        self._submitting = 0  # submits past the closed check that have not queued their write yet
+        self.commits = 0
+        self.rows = 0
+
+    def submit(self, key: Optional[str], sql: str, params: Sequence = ()) -> Future:
+        """Queue a write; the future resolves once it is committed.
+
+        Raises RuntimeError once close() has been called.
+        """
+        write = ContextWrite(key, sql, params)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Context writer is closed")
+            self._pending[key] = self._pending.get(key, 0) + 1
+            self._unfinished += 1
+            self._submitting += 1
+        try:
+            self._ensure_thread()
+            # Outside the lock: a full queue blocks here until the writer drains it
+            self._queue.put(write)
+        finally:
+            with self._condition:
+                self._submitting -= 1
+                self._condition.notify_all()
+        return write.future
+
+    def wait_for(self, key: Optional[str], timeout: float = 5.0) -> bool:
+        """Block until every queued write for key is committed; False on timeout."""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while key in self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """Block until every queued write is committed; False on timeout."""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._unfinished:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 30.0):
+        """Flush queued writes and stop the writer thread."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            # Writes already accepted must be queued ahead of the stop marker
+            while self._submitting:
+                self._condition.wait()
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> Dict[str, float]:
+        with self._condition:
+            return {
+                "commits": self.commits,
+                "rows": self.rows,
+                "queued": self._unfinished,
+                "rows_per_commit": round(self.rows / self.commits, 2) if self.commits else 0.0,
+            }
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="context-writer", daemon=True)
+                self._thread.start()
+
+    def _next_batch(self) -> tuple:
+        """Block for one write, then gather more for up to max_delay; returns (batch, stop)."""
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay_seconds
+        while len(batch) < self.max_batch_rows:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        conn = None
+        stop = False
+        while not stop:
+            batch, stop = self._next_batch()
+            if not batch:
+                continue
+            try:
+                if conn is None:
+                    conn = self.connect()
+                self._commit(conn, batch)
+            except sqlite3.Error as e:
+                print(f"Context writer could not commit {len(batch)} writes: {e}")
+                for write in batch:
+                    if not write.future.done():
+                        write.future.set_exception(e)
+                if conn is not None:
+                    conn.close()
+                    conn = None
+            self._finish(batch)
+        if conn is not None:
+            conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, batch: List[ContextWrite]):
+        try:
+            for write in batch:
+                conn.execute(write.sql, write.params)
+            conn.commit()
+            committed = len(batch)
+            for write in batch:
+                write.future.set_result(None)
+        except sqlite3.Error as e:
+            conn.rollback()
+            if len(batch) == 1:
+                print(f"Context write failed: {e}")
+                batch[0].future.set_exception(e)
+                committed = 0
+            else:
+                committed = 0
+                for write in batch:
+                    try:
+                        conn.execute(write.sql, write.params)
+                        conn.commit()
+                        write.future.set_result(None)
+                        committed += 1
+                    except sqlite3.Error as write_error:
+                        conn.rollback()
+                        print(f"Context write failed: {write_error}")
+                        write.future.set_exception(write_error)
+        with self._condition:
+            self.commits += 1
+            self.rows += committed
+
+    def _finish(self, batch: List[ContextWrite]):
+        with self._condition:
+            for write in batch:
+                count = self._pending[write.key] - 1
+                if count:
+                    self._pending[write.key] = count
+                else:
+                    del self._pending[write.key]
+            self._unfinished -= len(batch)
+            self._condition.notify_all()
@@ -0,0 +1,170 @@
+"""Persistent store of AI-generated custom segments and their activations.
+
+Custom segments live in SQLite so every worker process can activate a
+proposal made by another, and they survive restarts. Ids are derived from a
+hash of the segment content, so proposing the same segment again reuses its
+id instead of adding an entry. Segments not proposed again within
+ttl_seconds expire unless they have been activated. A small in-process LRU
+sits in front for segment reads; activations change over time and are
+always read from the database.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Callable
+
+from database import create_custom_segment_tables
+
+
+# Expired and over-capacity segments are pruned once every this many writes
+PRUNE_EVERY_WRITES = 50
+
+# Fields that do not make two proposals different
+UNHASHED_FIELDS = ("id", "created_at")
+
+
+def custom_segment_id(segment: Dict[str, Any]) -> str:
+    """Content-derived id: identical segments share it, different ones never collide in practice."""
+    content = {key: value for key, value in segment.items() if key not in UNHASHED_FIELDS}
+    if isinstance(content.get("name"), str):
+        content["name"] = " ".join(content["name"].split()).casefold()
+    digest = hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return f"custom_{digest[:20]}"
+
+
+class CustomSegmentStore:
+    """SQLite-backed custom segments with TTL, size cap and an LRU front.
+
+    connect() returns a connection for the caller's thread, such as a pooled
+    one; the store closes it after each operation.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], ttl_seconds: float = 7 * 86400,
+                 max_entries: int = 100000, memory_entries: int = 1024):
+        self.connect = connect
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._table_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = self.connect()
+        if not self._table_ready:
+            create_custom_segment_tables(conn.cursor())
+            conn.commit()
+            self._table_ready = True
+        return conn
+
+    def _remember(self, segment_id: str, last_seen_at: float, segment: Dict[str, Any]):
+        with self._lock:
+            self._memory[segment_id] = (last_seen_at, segment)
+            self._memory.move_to_end(segment_id)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def add(self, segments: List[Dict[str, Any]]) -> List[str]:
+        """Store segments, returning their ids; re-adding a segment renews its TTL."""
+        now = time.time()
+        ids = []
+        rows = []
+        for segment in segments:
+            segment_id = custom_segment_id(segment)
+            segment = dict(segment, id=segment_id)
+            ids.append(segment_id)
+            rows.append((segment_id, json.dumps(segment), now, now))
+            self._remember(segment_id, now, segment)
+
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % PRUNE_EVERY_WRITES == 0
+
+        conn = self._connect()
+        try:
+            conn.executemany(
+                "INSERT INTO custom_segments (id, segment, created_at, last_seen_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET last_seen_at = excluded.last_seen_at",
+                rows
+            )
+            if prune:
+                self._prune(conn, now)
+            conn.commit()
+        finally:
+            conn.close()
+        return ids
+
+    def get(self, segment_id: str) -> Optional[Dict[str, Any]]:
+        """A custom segment by id, or None if it is unknown or expired."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(segment_id)
+            if entry is not None and now - entry[0] < self.ttl_seconds:
+                self._memory.move_to_end(segment_id)
+                return entry[1]
+
+        conn = self._connect()
+        try:
+            row = conn.execute("""
+                SELECT segment, last_seen_at FROM custom_segments
+                WHERE id = ? AND (last_seen_at > ? OR EXISTS (
+                    SELECT 1 FROM custom_segment_activations WHERE segment_id = custom_segments.id
+                ))
+            """, (segment_id, now - self.ttl_seconds)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            with self._lock:
+                self._memory.pop(segment_id, None)
+            return None
+        segment = json.loads(row[0])
+        self._remember(segment_id, row[1], segment)
+        return segment
+
+    def get_activation(self, activation_key: str) -> Optional[Dict[str, Any]]:
+        """The activation record for a segment/platform/account key, or None."""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT activation FROM custom_segment_activations WHERE activation_key = ?", (activation_key,)
+            ).fetchone()
+        finally:
+            conn.close()
+        return json.loads(row[0]) if row else None
+
+    def put_activation(self, activation_key: str, segment_id: str, activation: Dict[str, Any]):
+        """Create or update an activation record; activated segments no longer expire."""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO custom_segment_activations "
+                "(activation_key, segment_id, activation, updated_at) VALUES (?, ?, ?, ?)",
+                (activation_key, segment_id, json.dumps(activation), time.time())
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _prune(self, conn: sqlite3.Connection, now: float):
+        """Drop expired segments, then the least recently seen beyond max_entries, keeping activated ones."""
+        conn.execute("""
+            DELETE FROM custom_segments WHERE last_seen_at <= ?
+            AND id NOT IN (SELECT segment_id FROM custom_segment_activations)
+        """, (now - self.ttl_seconds,))
+        conn.execute("""
+            DELETE FROM custom_segments WHERE last_seen_at <= (
+                SELECT last_seen_at FROM custom_segments ORDER BY last_seen_at DESC LIMIT 1 OFFSET ?
+            ) AND id NOT IN (SELECT segment_id FROM custom_segment_activations)
+        """, (self.max_entries,))
+
+    def __len__(self) -> int:
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM custom_segments").fetchone()[0]
+        finally:
+            conn.close()
@@ -1,8 +1,18 @@
 """Database initialization and sample data for the Signals Agent."""
 
+import re
 import sqlite3
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+
+# Full-text index over signal segment names and descriptions (external content
+# table, kept in sync with signal_segments by triggers).
+SEGMENTS_FTS_TABLE = "signal_segments_fts"
+
+# Tables whose writes bump a row in catalog_versions, so in-process catalog
+# snapshots can tell cheaply whether they need to reload.
+VERSIONED_CATALOG_TABLES = ["signal_segments", "platform_deployments", "principal_segment_access", "principals"]
 
 
 def init_db():
@@ -19,6 +29,9 @@ def init_db():
     # Insert sample data
     insert_sample_data(cursor)
     
+    # Make sure the full-text index covers rows written before it existed
+    rebuild_segments_fts(cursor)
+    
     conn.commit()
     conn.close()
     print("Database initialized with sample data")
@@ -89,8 +102,31 @@ def create_tables(cursor: sqlite3.Cursor):
     """)
     
     # Unified contexts table for all context types (A2A-ready)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS contexts (
+    create_contexts_table(cursor)
+    create_context_aliases_table(cursor)
+    
+    create_segments_fts(cursor)
+    create_catalog_versions(cursor)
+    create_llm_cache_table(cursor)
+    create_cluster_proposals_table(cursor)
+    create_custom_segment_tables(cursor)
+    create_activation_jobs_table(cursor)
+
+
+def create_contexts_table(cursor: sqlite3.Cursor, table: str = "contexts"):
+    """Create a contexts table: the main one, or a time bucket of it.
+    
+    created_at and expires_at are ISO text in local time; the integer epoch
+    columns next to them are what expiry uses. Older databases get the epoch
+    columns added and backfilled from the text columns. Only the main table
+    references parent contexts: a period table can outlive the period of its
+    parent, so it has no foreign key.
+    """
+    parent_key = ""
+    if table == "contexts":
+        parent_key = ",\n            FOREIGN KEY (parent_context_id) REFERENCES contexts (context_id)"
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
             context_id TEXT PRIMARY KEY,
             context_type TEXT NOT NULL CHECK (context_type IN ('discovery', 'activation', 'optimization', 'reporting')),
             parent_context_id TEXT,
@@ -100,21 +136,245 @@ def create_tables(cursor: sqlite3.Cursor):
             created_at TEXT NOT NULL,
             completed_at TEXT,
             expires_at TEXT NOT NULL,
-            FOREIGN KEY (parent_context_id) REFERENCES contexts (context_id)
+            created_at_epoch INTEGER,
+            expires_at_epoch INTEGER{parent_key}
         )
     """)
     
+    columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    if "expires_at_epoch" not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN created_at_epoch INTEGER")
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN expires_at_epoch INTEGER")
+        # 'utc' reads the naive text as local time, as datetime.timestamp() does for new rows
+        cursor.execute(f"""
+            UPDATE {table} SET
+                created_at_epoch = CAST(strftime('%s', created_at, 'utc') AS INTEGER),
+                expires_at_epoch = CAST(strftime('%s', expires_at, 'utc') AS INTEGER)
+        """)
+    
     # Create index for efficient lookups
+    cursor.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_{table}_type_principal 
+        ON {table} (context_type, principal_id)
+    """)
+    
+    cursor.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_{table}_parent 
+        ON {table} (parent_context_id)
+    """)
+    
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_expires_at_epoch ON {table} (expires_at_epoch)")
+
+
+def create_context_aliases_table(cursor: sqlite3.Cursor):
+    """Create the table mapping client context ids (A2A contextId) to discovery contexts."""
     cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_contexts_type_principal 
-        ON contexts (context_type, principal_id)
+        CREATE TABLE IF NOT EXISTS context_aliases (
+            alias TEXT PRIMARY KEY,
+            context_id TEXT NOT NULL,
+            expires_at_epoch INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_context_aliases_expires_at_epoch ON context_aliases (expires_at_epoch)")
+
+
+def create_catalog_versions(cursor: sqlite3.Cursor):
+    """Create per-table change counters maintained by triggers."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    
+    # Lets the catalog refresh pick up changed segments without a full scan
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_signal_segments_updated_at 
+        ON signal_segments (updated_at)
+    """)
+    
+    # An UPDATE that leaves updated_at alone still has to reach the refresh
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS signal_segments_touch_updated_at
+        AFTER UPDATE ON signal_segments
+        WHEN NEW.updated_at IS OLD.updated_at BEGIN
+            UPDATE signal_segments
+            SET updated_at = strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')
+            WHERE id = NEW.id;
+        END
     """)
     
+    for table in VERSIONED_CATALOG_TABLES:
+        cursor.execute(
+            "INSERT OR IGNORE INTO catalog_versions (table_name, version) VALUES (?, 0)",
+            (table,)
+        )
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()}
+                AFTER {event} ON {table} BEGIN
+                    UPDATE catalog_versions SET version = version + 1
+                    WHERE table_name = '{table}';
+                END
+            """)
+
+
+def create_llm_cache_table(cursor: sqlite3.Cursor):
+    """Create the table backing the LLM response cache."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            cache_key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_created_at ON llm_cache (created_at)")
+
+
+def create_custom_segment_tables(cursor: sqlite3.Cursor):
+    """Create the tables of AI-generated custom segments and their activations."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS custom_segments (
+            id TEXT PRIMARY KEY,
+            segment TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_seen_at REAL NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_custom_segments_last_seen ON custom_segments (last_seen_at)")
     cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_contexts_parent 
-        ON contexts (parent_context_id)
+        CREATE TABLE IF NOT EXISTS custom_segment_activations (
+            activation_key TEXT PRIMARY KEY,
+            segment_id TEXT NOT NULL,
+            activation TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        )
     """)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_custom_segment_activations_segment ON custom_segment_activations (segment_id)"
+    )
+
+
+def create_activation_jobs_table(cursor: sqlite3.Cursor):
+    """Create the table of pending activations for the activation scheduler."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS activation_jobs (
+            job_key TEXT PRIMARY KEY,
+            kind TEXT NOT NULL CHECK (kind IN ('catalog', 'custom')),
+            segment_id TEXT NOT NULL,
+            platform TEXT NOT NULL,
+            account TEXT,
+            platform_segment_id TEXT NOT NULL,
+            due_at REAL NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            claimed_until REAL NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_activation_jobs_due_at ON activation_jobs (due_at)")
+
+
+def create_cluster_proposals_table(cursor: sqlite3.Cursor):
+    """Create the table of precomputed custom segment proposals per catalog cluster."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cluster_proposals (
+            cluster_key TEXT PRIMARY KEY,
+            members_fingerprint TEXT NOT NULL,
+            proposals TEXT NOT NULL,
+            generated_at REAL NOT NULL
+        )
+    """)
+
+
+def get_catalog_versions(cursor: sqlite3.Cursor) -> Dict[str, int]:
+    """Return the current change counter for each versioned catalog table."""
+    cursor.execute("SELECT table_name, version FROM catalog_versions")
+    return {row[0]: row[1] for row in cursor.fetchall()}
+
+
+def create_segments_fts(cursor: sqlite3.Cursor) -> bool:
+    """Create the FTS5 index over signal_segments and its sync triggers.
+    
+    Returns False if this SQLite build does not ship FTS5, in which case
+    discovery falls back to LIKE matching.
+    """
+    try:
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {SEGMENTS_FTS_TABLE} USING fts5(
+                name,
+                description,
+                content='signal_segments',
+                content_rowid='rowid',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        print(f"FTS5 not available, keyword search will use LIKE matching: {e}")
+        return False
+    
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS signal_segments_fts_insert
+        AFTER INSERT ON signal_segments BEGIN
+            INSERT INTO {SEGMENTS_FTS_TABLE} (rowid, name, description)
+            VALUES (new.rowid, new.name, new.description);
+        END
+    """)
+    
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS signal_segments_fts_delete
+        AFTER DELETE ON signal_segments BEGIN
+            INSERT INTO {SEGMENTS_FTS_TABLE} ({SEGMENTS_FTS_TABLE}, rowid, name, description)
+            VALUES ('delete', old.rowid, old.name, old.description);
+        END
+    """)
+    
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS signal_segments_fts_update
+        AFTER UPDATE OF name, description ON signal_segments BEGIN
+            INSERT INTO {SEGMENTS_FTS_TABLE} ({SEGMENTS_FTS_TABLE}, rowid, name, description)
+            VALUES ('delete', old.rowid, old.name, old.description);
+            INSERT INTO {SEGMENTS_FTS_TABLE} (rowid, name, description)
+            VALUES (new.rowid, new.name, new.description);
+        END
+    """)
+    
+    return True
+
+
+def has_segments_fts(cursor: sqlite3.Cursor) -> bool:
+    """Check whether the signal_segments full-text index exists."""
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (SEGMENTS_FTS_TABLE,)
+    )
+    return cursor.fetchone() is not None
+
+
+def rebuild_segments_fts(cursor: sqlite3.Cursor):
+    """Rebuild the full-text index from the signal_segments table."""
+    if has_segments_fts(cursor):
+        cursor.execute(f"INSERT INTO {SEGMENTS_FTS_TABLE} ({SEGMENTS_FTS_TABLE}) VALUES ('rebuild')")
+
+
+def build_fts_match_query(text: str) -> Optional[str]:
+    """Turn a free-text signal spec into an FTS5 MATCH expression.
+    
+    Each word becomes a quoted prefix term and terms are OR-ed together, which
+    mirrors the old per-word LIKE matching while letting BM25 rank the hits.
+    Returns None if the text has no searchable words.
+    """
+    words = []
+    for word in re.findall(r"\w+", text.lower()):
+        if word not in words:
+            words.append(word)
     
+    if not words:
+        return None
+    
+    return " OR ".join(f'"{word}"*' for word in words)
+
 
 
 def insert_sample_data(cursor: sqlite3.Cursor):
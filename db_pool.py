@@ -0,0 +1,148 @@
+"""Pool of reusable SQLite connections for the request path.
+
+Opening a connection and re-issuing pragmas on every request is a large
+share of a cheap request's cost. The pool keeps a few idle connections per
+thread (sqlite3 connections must stay on the thread that made them), so a
+request reuses a warm connection along with its page cache and compiled
+statement cache. Pooled connections are handed out as usual: close()
+returns the connection to the pool instead of closing it, so callers need
+no changes.
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+
+DEFAULT_PRAGMAS: Dict[str, object] = {
+    "synchronous": "NORMAL",
+    "cache_size": -16000,  # KiB, i.e. 16 MB of page cache per connection
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY",
+}
+
+
+class PooledConnection(sqlite3.Connection):
+    """A connection whose close() hands it back to its pool."""
+
+    _pool: Optional["ConnectionPool"] = None
+    _idle = False
+    _returned_at = 0.0
+
+    def close(self):
+        pool = self._pool
+        if pool is None:
+            super().close()
+        elif not self._idle:
+            pool._release(self)
+
+    def discard(self):
+        """Really close the connection."""
+        self._pool = None
+        super().close()
+
+
+class ConnectionPool:
+    """Per-thread pool of SQLite connections with tuned pragmas and health checks.
+
+    Each thread keeps up to max_idle_per_thread idle connections; nested
+    acquisitions on one thread get separate connections, so their
+    transactions stay independent. A connection idle for longer than
+    health_check_seconds is checked with a trivial query before reuse and
+    replaced if it fails; connections are also replaced after max_uses
+    acquisitions. Uncommitted work is rolled back when a connection is
+    returned.
+    """
+
+    def __init__(self, db_path: str, timeout: float = 30.0, max_idle_per_thread: int = 2,
+                 health_check_seconds: float = 30.0, max_uses: int = 10000,
+                 cached_statements: int = 256, pragmas: Optional[Dict[str, object]] = None):
+        self.db_path = db_path
+        self.timeout = timeout
+        self.max_idle_per_thread = max_idle_per_thread
+        self.health_check_seconds = health_check_seconds
+        self.max_uses = max_uses
+        self.cached_statements = cached_statements
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._wal_ready = False
+        self.opened = 0
+        self.reused = 0
+
+    def _idle_connections(self) -> list:
+        idle = getattr(self._local, "idle", None)
+        if idle is None:
+            idle = self._local.idle = []
+        return idle
+
+    def _open(self) -> PooledConnection:
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, factory=PooledConnection,
+                               cached_statements=self.cached_statements)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {int(self.timeout * 1000)}")
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        if not self._wal_ready:
+            # Persistent for the database file, so only needed once
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._wal_ready = True
+        conn._pool = self
+        conn._uses = 0
+        with self._lock:
+            self.opened += 1
+        return conn
+
+    def _healthy(self, conn: PooledConnection) -> bool:
+        if conn._uses >= self.max_uses:
+            return False
+        if time.monotonic() - conn._returned_at < self.health_check_seconds:
+            return True
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def connect(self) -> PooledConnection:
+        """A connection for the calling thread; close() returns it to the pool."""
+        idle = self._idle_connections()
+        while idle:
+            conn = idle.pop()
+            if self._healthy(conn):
+                conn._idle = False
+                conn._uses += 1
+                with self._lock:
+                    self.reused += 1
+                return conn
+            conn.discard()
+        conn = self._open()
+        conn._uses = 1
+        return conn
+
+    def _release(self, conn: PooledConnection):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            conn.discard()
+            return
+        idle = self._idle_connections()
+        if len(idle) >= self.max_idle_per_thread:
+            conn.discard()
+            return
+        conn._idle = True
+        conn._returned_at = time.monotonic()
+        idle.append(conn)
+
+    def close_idle(self):
+        """Close the calling thread's idle connections."""
+        idle = self._idle_connections()
+        while idle:
+            idle.pop().discard()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"opened": self.opened, "reused": self.reused}
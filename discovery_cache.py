@@ -0,0 +1,91 @@
+"""Cache of get_signals results for repeated discovery requests."""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+def normalize_spec(signal_spec: str) -> str:
+    """Case- and whitespace-insensitive form of a signal spec."""
+    return " ".join((signal_spec or "").lower().split())
+
+
+def discovery_cache_key(signal_spec: str, deliver_to: Any, filters: Any,
+                        max_results: Optional[int], principal_access_level: str,
+                        principal_id: Optional[str]) -> str:
+    """Canonical key for a discovery request.
+
+    Platform lists, countries and filter lists are sorted so that requests
+    differing only in ordering share an entry. principal_id is part of the key
+    because custom pricing and adapter accounts are per principal.
+    """
+    platforms = deliver_to.platforms
+    if platforms != "all":
+        platforms = sorted({(p.platform, p.account or "") for p in platforms})
+
+    canonical_filters = None
+    if filters:
+        canonical_filters = {
+            name: sorted(value) if isinstance(value, list) else value
+            for name, value in filters.model_dump().items()
+            if value is not None
+        }
+
+    return json.dumps([
+        normalize_spec(signal_spec),
+        platforms,
+        sorted(country.upper() for country in deliver_to.countries),
+        canonical_filters,
+        max_results,
+        principal_access_level,
+        principal_id,
+    ], sort_keys=True)
+
+
+class DiscoveryCache:
+    """Size-bounded LRU cache with TTL, tagged with the catalog version.
+
+    An entry is only served while the catalog version it was computed against
+    is still current, so any write to the versioned catalog tables invalidates
+    every cached result at once.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Any, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, version: Any) -> Optional[Any]:
+        """Return the cached value for key if it is fresh and version matches."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, stored_version, value = entry
+                if stored_version == version and time.monotonic() - stored_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, version: Any, value: Any):
+        """Store value for key, evicting the least recently used entries."""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
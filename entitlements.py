@@ -0,0 +1,181 @@
+"""Per-principal entitlement and pricing cache."""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Callable
+
+from columnar import ACCESS_LEVEL_CATALOGS
+from database import get_catalog_versions
+
+
+# Tables whose changes make cached entitlements stale
+ENTITLEMENT_TABLES = ("principals", "principal_segment_access")
+
+
+class PrincipalEntitlements:
+    """Access level and custom CPMs of one principal."""
+
+    __slots__ = ("principal_id", "access_level", "known", "custom_cpms")
+
+    def __init__(self, principal_id: Optional[str], access_level: str = "public", known: bool = False,
+                 custom_cpms: Optional[Dict[str, float]] = None):
+        self.principal_id = principal_id
+        self.access_level = access_level
+        self.known = known
+        self.custom_cpms = custom_cpms or {}
+
+    def can_access(self, catalog_access: str) -> bool:
+        """Whether segments in the given catalog are visible at this access level."""
+        return catalog_access in ACCESS_LEVEL_CATALOGS.get(self.access_level, ("public",))
+
+    def price(self, segment_id: str, base_cpm: Optional[float]) -> Optional[float]:
+        """CPM this principal pays for a segment."""
+        return self.custom_cpms.get(segment_id, base_cpm)
+
+
+PUBLIC_ENTITLEMENTS = PrincipalEntitlements(None)
+
+
+class EntitlementCache:
+    """Bounded LRU of PrincipalEntitlements loaded from SQLite.
+
+    Unknown principals are cached too (as public), so repeated lookups of an
+    unregistered principal_id do not hit the database. Entries are dropped by
+    invalidate() - wired to catalog version changes of the entitlement
+    tables - and, as a safety net, after ttl_seconds.
+
+    Without a CatalogStore to report version changes, set
+    version_check_seconds: lookups then read the entitlement tables'
+    catalog_versions counters at most that often and invalidate on a change.
+    connect() returns a connection for the caller's thread, such as a
+    pooled one.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], max_entries: int = 10000,
+                 ttl_seconds: float = 600, version_check_seconds: float = 0):
+        self.connect = connect
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version_check_seconds = version_check_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0  # bumped by invalidate() so in-flight loads are not stored
+        self._versions: Optional[Dict[str, int]] = None
+        self._checked_at = float("-inf")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = self.connect()
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def get(self, principal_id: Optional[str]) -> PrincipalEntitlements:
+        """Entitlements for principal_id, loading them on a miss."""
+        if not principal_id:
+            return PUBLIC_ENTITLEMENTS
+        if self.version_check_seconds > 0:
+            self._check_versions()
+
+        with self._lock:
+            entry = self._entries.get(principal_id)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl_seconds:
+                self._entries.move_to_end(principal_id)
+                return entry[1]
+            generation = self._generation
+
+        conn = self._connect()
+        try:
+            entitlements = self._load(conn.cursor(), principal_id)
+        finally:
+            conn.close()
+        self._store(principal_id, entitlements, generation)
+        return entitlements
+
+    def _store(self, principal_id: str, entitlements: PrincipalEntitlements, generation: int):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[principal_id] = (time.monotonic(), entitlements)
+            self._entries.move_to_end(principal_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _check_versions(self):
+        """Invalidate everything if an entitlement table changed since the last check."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self.version_check_seconds:
+                return
+            # Claimed before the query, so concurrent lookups do not all check
+            self._checked_at = now
+
+        conn = self._connect()
+        try:
+            versions = self._entitlement_versions(conn.cursor())
+        finally:
+            conn.close()
+        with self._lock:
+            previous, self._versions = self._versions, versions
+        if previous is not None and previous != versions:
+            self.invalidate()
+
+    @staticmethod
+    def _entitlement_versions(cursor: sqlite3.Cursor) -> Dict[str, int]:
+        versions = get_catalog_versions(cursor)
+        return {table: versions.get(table) for table in ENTITLEMENT_TABLES}
+
+    @staticmethod
+    def _load(cursor: sqlite3.Cursor, principal_id: str) -> PrincipalEntitlements:
+        cursor.execute("SELECT access_level FROM principals WHERE principal_id = ?", (principal_id,))
+        row = cursor.fetchone()
+        if not row:
+            return PrincipalEntitlements(principal_id)
+
+        cursor.execute("""
+            SELECT signals_agent_segment_id, custom_cpm FROM principal_segment_access
+            WHERE principal_id = ? AND custom_cpm IS NOT NULL
+        """, (principal_id,))
+        custom_cpms = {access['signals_agent_segment_id']: access['custom_cpm'] for access in cursor.fetchall()}
+        return PrincipalEntitlements(principal_id, row['access_level'], True, custom_cpms)
+
+    def warm(self) -> int:
+        """Load every principal (up to max_entries) in two queries; returns the count."""
+        generation = self._generation
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            if self.version_check_seconds > 0:
+                versions = self._entitlement_versions(cursor)
+                with self._lock:
+                    self._versions = versions
+            cursor.execute("SELECT principal_id, access_level FROM principals LIMIT ?", (self.max_entries,))
+            levels = {row['principal_id']: row['access_level'] for row in cursor.fetchall()}
+            cursor.execute("SELECT principal_id, signals_agent_segment_id, custom_cpm "
+                           "FROM principal_segment_access WHERE custom_cpm IS NOT NULL")
+            custom_cpms: Dict[str, Dict[str, float]] = {principal_id: {} for principal_id in levels}
+            for access in cursor.fetchall():
+                if access['principal_id'] in custom_cpms:
+                    custom_cpms[access['principal_id']][access['signals_agent_segment_id']] = access['custom_cpm']
+        finally:
+            conn.close()
+
+        for principal_id, access_level in levels.items():
+            self._store(principal_id, PrincipalEntitlements(
+                principal_id, access_level, True, custom_cpms[principal_id]
+            ), generation)
+        return len(levels)
+
+    def invalidate(self, principal_id: Optional[str] = None):
+        """Drop one principal's entitlements, or all of them."""
+        with self._lock:
+            self._generation += 1
+            if principal_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(principal_id, None)
+
+    def on_catalog_change(self, previous: Dict[str, int], current: Dict[str, int]):
+        """CatalogStore listener: invalidate when an entitlement table changed."""
+        if any(previous.get(table) != current.get(table) for table in ENTITLEMENT_TABLES):
+            self.invalidate()
@@ -0,0 +1,210 @@
+"""Answers to follow-up questions about a previous discovery.
+
+A follow-up ("tell me more about the custom segments") names the context_id
+of an earlier discovery. Instead of running discovery again, it is answered
+from a compact copy of that discovery's result: the ranked signals and the
+custom segment proposals, kept in memory per context and stored with the
+discovery context for other workers and restarts.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+
+CUSTOM_SEGMENTS = "custom_segments"
+SIGNAL_DETAILS = "signal_details"
+
+# Checked in order: a question about custom segments is not a signal question
+_INTENTS = [
+    (CUSTOM_SEGMENTS, re.compile(
+        r"custom (?:segment|signal)|tell me (?:more )?about the custom|what custom"
+        r"|(?:explain|describe) the custom|more about custom"
+    )),
+    (SIGNAL_DETAILS, re.compile(
+        r"tell me about the signal|tell me more about|can you tell me about|(?:explain|describe) the signal"
+        r"|what about the\b.*\bsignal|details about|more information"
+    )),
+]
+
+MAX_DETAILED_SIGNALS = 3
+
+
+def classify_follow_up(query: str) -> Optional[str]:
+    """CUSTOM_SEGMENTS, SIGNAL_DETAILS, or None if query is not a follow-up question."""
+    query_lower = (query or "").lower()
+    for intent, pattern in _INTENTS:
+        if pattern.search(query_lower):
+            return intent
+    return None
+
+
+def compact_discovery_result(signal_spec: str, response: Dict[str, Any]) -> Dict[str, Any]:
+    """The parts of a get_signals response (as JSON) that follow-ups are answered from.
+
+    Signals keep their deployments and pricing as served, and the taxonomy
+    rollups are kept, so the response can be rebuilt exactly from the result.
+    """
+    signals = []
+    for signal in response.get("signals") or []:
+        pending = [d for d in signal.get("deployments", []) if not d.get("is_live")]
+        signals.append({
+            "id": signal["signals_agent_segment_id"],
+            "name": signal["name"],
+            "description": signal.get("description"),
+            "signal_type": signal.get("signal_type"),
+            "data_provider": signal.get("data_provider"),
+            "coverage_percentage": signal.get("coverage_percentage"),
+            "cpm": (signal.get("pricing") or {}).get("cpm"),
+            "platforms": sorted({d["platform"] for d in signal.get("deployments", [])}),
+            "live": [d["platform"] for d in signal.get("deployments", []) if d.get("is_live")],
+            "activation_minutes": max(
+                (d.get("estimated_activation_duration_minutes") or 0 for d in pending), default=None
+            ),
+            "deployments": signal.get("deployments", []),
+            "pricing": signal.get("pricing") or {},
+            "has_coverage_data": signal.get("has_coverage_data"),
+            "has_pricing_data": signal.get("has_pricing_data"),
+        })
+    proposals = [
+        {
+            "id": proposal.get("custom_segment_id"),
+            "name": proposal["proposed_name"],
+            "description": proposal.get("description"),
+            "target_signals": proposal.get("target_signals"),
+            "coverage_percentage": proposal.get("estimated_coverage_percentage"),
+            "cpm": proposal.get("estimated_cpm"),
+            "rationale": proposal.get("creation_rationale"),
+        }
+        for proposal in response.get("custom_segment_proposals") or []
+    ]
+    return {
+        "signal_spec": signal_spec,
+        "signals": signals,
+        "custom_segment_proposals": proposals,
+        "taxonomy": response.get("taxonomy") or [],
+        "refinement_status": response.get("refinement_status"),
+    }
+
+
+class DiscoveryResultStore:
+    """Size-bounded LRU map of context_id to compact discovery result.
+
+    A client may name a conversation with its own context id (the A2A
+    contextId); link() maps it to the discovery context_id, so follow-ups
+    sent with either id find the result.
+    """
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._aliases: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def link(self, alias: str, context_id: str):
+        """Make alias refer to the discovery stored under context_id."""
+        with self._lock:
+            self._aliases[alias] = context_id
+            self._aliases.move_to_end(alias)
+            while len(self._aliases) > self.max_entries:
+                self._aliases.popitem(last=False)
+
+    def resolve(self, context_id: str) -> str:
+        """The discovery context_id that context_id refers to."""
+        with self._lock:
+            return self._aliases.get(context_id, context_id)
+
+    def get(self, context_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            context_id = self._aliases.get(context_id, context_id)
+            result = self._entries.get(context_id)
+            if result is not None:
+                self._entries.move_to_end(context_id)
+            return result
+
+    def put(self, context_id: str, result: Dict[str, Any]):
+        with self._lock:
+            self._entries[context_id] = result
+            self._entries.move_to_end(context_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def _mentioned(items: List[Dict[str, Any]], query: str) -> List[Dict[str, Any]]:
+    """Items whose name or id appears in query."""
+    query_lower = query.lower()
+    return [
+        item for item in items
+        if (item.get("name") and item["name"].lower() in query_lower)
+        or (item.get("id") and item["id"].lower() in query_lower)
+    ]
+
+
+def _format_number(value: Optional[float], template: str) -> str:
+    return template.format(value) if value is not None else "unknown"
+
+
+def describe_signals(result: Dict[str, Any], query: str) -> str:
+    spec = result["signal_spec"]
+    signals = result["signals"]
+    if not signals:
+        return (f"Your previous search for '{spec}' found no signals. "
+                "Try broadening the search terms or the platforms to deliver to.")
+    selected = _mentioned(signals, query) or signals[:MAX_DETAILED_SIGNALS]
+    lines = [f"Based on your previous search for '{spec}', here are details about the signals found:"]
+    for signal in selected:
+        lines.append("")
+        lines.append(f"**{signal['name']}** (ID: {signal['id']})")
+        lines.append(f"• Coverage: {_format_number(signal['coverage_percentage'], '{:g}% of the addressable market')}")
+        lines.append(f"• CPM: {_format_number(signal['cpm'], '${:.2f} per thousand impressions')}")
+        lines.append(f"• Data Provider: {signal['data_provider']}")
+        if signal.get("description"):
+            lines.append(f"• Description: {signal['description']}")
+        if signal["platforms"]:
+            lines.append(f"• Deployment: Available on {', '.join(signal['platforms'])}")
+        if signal["live"]:
+            lines.append(f"• Live now on: {', '.join(signal['live'])}")
+        if signal["activation_minutes"]:
+            lines.append(f"• Activation Time: ~{signal['activation_minutes']} minutes")
+    others = len(signals) - len(selected)
+    if others > 0:
+        lines.append("")
+        lines.append(f"{others} more signal{'s' if others != 1 else ''} matched; ask about one by name for details.")
+    return "\n".join(lines)
+
+
+def describe_custom_segments(result: Dict[str, Any], query: str) -> str:
+    spec = result["signal_spec"]
+    proposals = result["custom_segment_proposals"]
+    if not proposals:
+        if result.get("refinement_status") == "pending":
+            return (f"Custom segment proposals for '{spec}' are still being generated. "
+                    "Ask again in a few seconds.")
+        return (f"No custom segments were proposed for '{spec}'. Custom segments are AI-generated "
+                "audience proposals that combine existing signals; they are offered when a search "
+                "finds existing signals to build on.")
+    selected = _mentioned(proposals, query) or proposals
+    lines = [f"Custom segments proposed for '{spec}':"]
+    for proposal in selected:
+        lines.append("")
+        lines.append(f"**{proposal['name']}**" + (f" (ID: {proposal['id']})" if proposal.get("id") else ""))
+        if proposal.get("description"):
+            lines.append(f"• Description: {proposal['description']}")
+        lines.append(f"• Estimated coverage: {_format_number(proposal['coverage_percentage'], '{:g}%')}")
+        lines.append(f"• Estimated CPM: {_format_number(proposal['cpm'], '${:.2f}')}")
+        if proposal.get("target_signals"):
+            lines.append(f"• Built from: {proposal['target_signals']}")
+        if proposal.get("rationale"):
+            lines.append(f"• Rationale: {proposal['rationale']}")
+    lines.append("")
+    lines.append("These segments don't exist yet; activate one with its ID and it will be "
+                 "created and deployed to your chosen platform.")
+    return "\n".join(lines)
+
+
+def answer_follow_up(intent: str, result: Dict[str, Any], query: str) -> str:
+    """Text answer to a follow-up question from a stored discovery result."""
+    if intent == CUSTOM_SEGMENTS:
+        return describe_custom_segments(result, query)
+    return describe_signals(result, query)
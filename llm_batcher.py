@@ -0,0 +1,171 @@
+"""Micro-batching of concurrent ranking requests into one LLM call."""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Optional
+
+from llm_metrics import attribute_calls, current_call_logs
+from prompt_builder import build_batch_ranking_prompt
+from ranking import Ranker, LLMRanker, apply_rankings
+
+
+logger = logging.getLogger(__name__)
+
+
+BATCH_RANKING_PROMPT_TEMPLATE = """
+    You are an expert signals targeting analyst. Several clients have requested signals at once;
+    rank the segments below separately for each request. Consider all signal types (audience,
+    contextual, geographical, temporal, environmental, bidding) - a client may benefit from several.
+
+    Segments, one per line (pipe-separated, header first, # is the row number):
+{segment_table}
+
+    Requests (each may only use the listed rows):
+{queries}
+
+    For each request, rank its rows by relevance (most relevant first), keep at most its top N,
+    and give a brief explanation of why each selected segment matches.
+
+    Return a JSON object with one key per request:
+    {{
+      "Q1": [
+        {{"segment_id": "segment_id", "relevance_score": 0.95, "match_reason": "Brief explanation"}}
+      ]
+    }}
+
+    Only include segments with at least some relevance; use an empty array when none are relevant.
+    """
+
+
+class RankingJob:
+    """One caller's ranking request waiting in the batch window."""
+
+    __slots__ = ("signal_spec", "segments", "max_results", "future", "call_logs")
+
+    def __init__(self, signal_spec: str, segments: List[Dict[str, Any]], max_results: int):
+        self.signal_spec = signal_spec
+        self.segments = segments
+        self.max_results = max_results
+        self.future: Future = Future()
+        # The submitting request's LLM call logs; the shared call is recorded in each
+        self.call_logs = current_call_logs()
+
+
+class BatchingLLMRanker(Ranker):
+    """LLM ranker that merges requests arriving within a short window.
+
+    A dispatcher thread takes the first waiting job, collects whatever else
+    arrives within window_seconds (up to max_batch_size) and sends the batch
+    as one multi-query prompt; the reply is split per query and resolves each
+    caller's future. A batch of one uses the regular single-query prompt, so
+    lone requests keep their LLM response cache hits.
+    """
+
+    name = "AI"
+
+    def __init__(self, generate: Callable[[str], Any], window_seconds: float = 0.005,
+                 max_batch_size: int = 8, max_concurrent_batches: int = 4,
+                 token_budget: int = 6000, description_chars: int = 160):
+        self.generate = generate
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+        self.token_budget = token_budget
+        self.description_chars = description_chars
+        self.single = LLMRanker(generate, token_budget=token_budget, description_chars=description_chars)
+        self._queue: "queue.Queue[Optional[RankingJob]]" = queue.Queue()
+        # Batches run on their own pool so callers blocked in rank() can never
+        # starve the calls they are waiting for
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_batches, thread_name_prefix="llm-batch")
+        self._dispatcher: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stopped = False
+
+    def rank(self, signal_spec: str, segments: List[Dict[str, Any]], max_results: int) -> List[Dict[str, Any]]:
+        if not segments:
+            return []
+        return self.submit(signal_spec, segments, max_results).result()
+
+    def submit(self, signal_spec: str, segments: List[Dict[str, Any]], max_results: int) -> Future:
+        """Queue a ranking request; the future resolves to the ranked segments.
+
+        Raises RuntimeError once the ranker has been stopped.
+        """
+        job = RankingJob(signal_spec, segments, max_results)
+        with self._start_lock:
+            if self._stopped:
+                raise RuntimeError("batching ranker is stopped")
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name="llm-batcher", daemon=True)
+                self._dispatcher.start()
+            self._queue.put(job)
+        return job.future
+
+    def _dispatch(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            batch = [job]
+            deadline = time.monotonic() + self.window_seconds
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    job = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if job is None:
+                    self._send(batch)
+                    return
+                batch.append(job)
+            self._send(batch)
+
+    def _send(self, batch: List[RankingJob]):
+        try:
+            self._executor.submit(self._execute, batch)
+        except RuntimeError as e:
+            # The executor was shut down by stop() before this batch went out
+            for job in batch:
+                job.future.set_exception(e)
+
+    def _execute(self, batch: List[RankingJob]):
+        try:
+            if len(batch) == 1:
+                job = batch[0]
+                with attribute_calls([job.call_logs]):
+                    job.future.set_result(self.single.rank(job.signal_spec, job.segments, job.max_results))
+                return
+
+            prompt = build_batch_ranking_prompt(
+                BATCH_RANKING_PROMPT_TEMPLATE,
+                [(job.signal_spec, job.segments, job.max_results) for job in batch],
+                token_budget=self.token_budget, description_chars=self.description_chars
+            )
+            logger.debug("Batched ranking prompt: %d queries, ~%d tokens", len(batch), prompt.token_count)
+            with attribute_calls([job.call_logs for job in batch], batch_size=len(batch)):
+                reply = self.generate(prompt.text)
+            if not isinstance(reply, dict):
+                raise ValueError("batched ranking reply is not a JSON object")
+
+            for i, (job, segments) in enumerate(zip(batch, prompt.query_segments), 1):
+                rankings = reply.get(f"Q{i}") or []
+                job.future.set_result(apply_rankings(rankings, segments)[:job.max_results])
+        except Exception as e:
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_exception(e)
+
+    def stop(self):
+        """Stop the dispatcher after the queued jobs have been sent; later submits are refused."""
+        with self._start_lock:
+            self._stopped = True
+            dispatcher = self._dispatcher
+            if dispatcher is not None:
+                self._queue.put(None)
+        if dispatcher is not None:
+            dispatcher.join(timeout=5)
+        self._executor.shutdown(wait=False)
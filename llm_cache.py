@@ -0,0 +1,135 @@
+"""Content-addressed cache of LLM responses.
+
+Responses are keyed on a hash of the model name and the exact prompt and
+stored in SQLite, so every worker process shares them and they survive
+restarts. A small in-process LRU sits in front to skip the database for hot
+prompts.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Callable
+
+from database import create_llm_cache_table
+
+
+# Expired and over-capacity rows are pruned once every this many writes
+PRUNE_EVERY_WRITES = 50
+
+
+def llm_cache_key(model_name: str, prompt: str) -> str:
+    """Stable key for a (model, prompt) pair."""
+    return hashlib.sha256(f"{model_name}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """SQLite-backed LLM response cache with TTL, size cap and an LRU front.
+
+    connect() returns a connection for the caller's thread, such as a pooled
+    one; the cache closes it after each operation.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], ttl_seconds: float = 86400,
+                 max_entries: int = 10000, memory_entries: int = 256):
+        self.connect = connect
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._table_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = self.connect()
+        if not self._table_ready:
+            create_llm_cache_table(conn.cursor())
+            conn.commit()
+            self._table_ready = True
+        return conn
+
+    def _remember(self, key: str, created_at: float, response: str):
+        with self._lock:
+            self._memory[key] = (created_at, response)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, model_name: str, prompt: str) -> Optional[str]:
+        """Cached response text for this prompt, or None."""
+        key = llm_cache_key(model_name, prompt)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[0] < self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    return entry[1]
+                del self._memory[key]
+
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT response, created_at FROM llm_cache WHERE cache_key = ? AND created_at > ?",
+                    (key, now - self.ttl_seconds)
+                ).fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"LLM cache read failed: {e}")
+            return None
+
+        if row is None:
+            return None
+        self._remember(key, row[1], row[0])
+        return row[0]
+
+    def put(self, model_name: str, prompt: str, response: str):
+        """Store a response; failures are logged and otherwise ignored."""
+        key = llm_cache_key(model_name, prompt)
+        now = time.time()
+        self._remember(key, now, response)
+
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % PRUNE_EVERY_WRITES == 0
+
+        try:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (cache_key, model, response, created_at) VALUES (?, ?, ?, ?)",
+                    (key, model_name, response, now)
+                )
+                if prune:
+                    self._prune(conn, now)
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"LLM cache write failed: {e}")
+
+    def _prune(self, conn: sqlite3.Connection, now: float):
+        """Drop expired rows, then the oldest rows beyond max_entries."""
+        conn.execute("DELETE FROM llm_cache WHERE created_at <= ?", (now - self.ttl_seconds,))
+        conn.execute("""
+            DELETE FROM llm_cache WHERE created_at <= (
+                SELECT created_at FROM llm_cache ORDER BY created_at DESC LIMIT 1 OFFSET ?
+            )
+        """, (self.max_entries,))
+
+    def clear(self):
+        """Remove every cached response."""
+        with self._lock:
+            self._memory.clear()
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM llm_cache")
+            conn.commit()
+        finally:
+            conn.close()
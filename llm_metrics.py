@@ -0,0 +1,201 @@
+"""Instrumentation of LLM calls: latency and size histograms, outcomes, per-request call logs."""
+
+import contextvars
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Iterator
+
+
+# ok: parsed and non-empty; empty: no content or an empty JSON value;
+# parse_error: reply was not JSON; transport_error: the API call raised;
+# cache_hit: served from the LLM response cache without calling the model;
+# circuit_open: refused by the circuit breaker without calling the model
+OUTCOMES = ("ok", "empty", "parse_error", "transport_error", "cache_hit", "circuit_open")
+
+# Outcomes that never reach the model, kept out of latency and size histograms
+NOT_CALLED = ("cache_hit", "circuit_open")
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+
+class Histogram:
+    """Fixed-bucket histogram; bucket i counts values <= buckets[i]."""
+
+    def __init__(self, buckets: tuple):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> List[tuple]:
+        """(upper bound, count of values <= bound) pairs, ending with +Inf."""
+        pairs = []
+        total = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            total += n
+            pairs.append((bound, total))
+        return pairs
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile, None if empty."""
+        if not self.count:
+            return None
+        for bound, total in self.cumulative():
+            if total >= q * self.count:
+                return bound
+        return float("inf")
+
+
+class _CallScope:
+    """Call logs that LLM calls in the current context are appended to."""
+
+    __slots__ = ("logs", "labels")
+
+    def __init__(self, logs: tuple, labels: Dict[str, Any]):
+        self.logs = logs
+        self.labels = labels
+
+
+_scope: contextvars.ContextVar = contextvars.ContextVar("llm_call_scope", default=None)
+
+
+@contextmanager
+def collect_calls() -> Iterator[List[Dict[str, Any]]]:
+    """Collect the LLM calls made in this context into a list.
+
+    Work submitted to executors joins the log when it runs under
+    contextvars.copy_context(); see also attribute_calls.
+    """
+    calls: List[Dict[str, Any]] = []
+    token = _scope.set(_CallScope((calls,), {}))
+    try:
+        yield calls
+    finally:
+        _scope.reset(token)
+
+
+def current_call_logs() -> tuple:
+    """The call logs of the current context, to hand to another thread."""
+    scope = _scope.get()
+    return scope.logs if scope is not None else ()
+
+
+@contextmanager
+def attribute_calls(log_groups, **labels):
+    """Append calls made in this block to the logs of several contexts.
+
+    log_groups holds current_call_logs() results captured in each context;
+    calls are tagged with labels. Used where one call serves several
+    requests, e.g. a batched ranking.
+    """
+    merged = tuple(log for group in log_groups for log in group)
+    token = _scope.set(_CallScope(merged, labels))
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+class LLMMetrics:
+    """Thread-safe aggregate of LLM call outcomes, latencies and sizes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls: Dict[tuple, int] = {}
+        self.latency: Dict[str, Histogram] = {}
+        self.prompt_tokens: Dict[str, Histogram] = {}
+        self.response_tokens: Dict[str, int] = {}
+        self.prompt_chars: Dict[str, int] = {}
+        self.response_chars: Dict[str, int] = {}
+
+    def record(self, stage: str, outcome: str, latency_seconds: float, prompt_chars: int,
+               prompt_tokens: int, response_chars: int = 0, response_tokens: int = 0,
+               error: Optional[str] = None) -> Dict[str, Any]:
+        """Record one call and append it to the current context's call logs.
+
+        Cache hits and refused calls are counted but kept out of the
+        histograms, which describe time spent in the model.
+        """
+        scope = _scope.get()
+        call = {
+            "stage": stage,
+            "outcome": outcome,
+            "latency_ms": round(latency_seconds * 1000, 1),
+            "prompt_tokens": prompt_tokens,
+            "response_tokens": response_tokens,
+        }
+        if error:
+            call["error"] = error
+        if scope is not None:
+            call.update(scope.labels)
+
+        with self._lock:
+            self.calls[(stage, outcome)] = self.calls.get((stage, outcome), 0) + 1
+            self.prompt_chars[stage] = self.prompt_chars.get(stage, 0) + prompt_chars
+            self.response_chars[stage] = self.response_chars.get(stage, 0) + response_chars
+            if outcome not in NOT_CALLED:
+                self.latency.setdefault(stage, Histogram(LATENCY_BUCKETS)).observe(latency_seconds)
+                self.prompt_tokens.setdefault(stage, Histogram(TOKEN_BUCKETS)).observe(prompt_tokens)
+                self.response_tokens[stage] = self.response_tokens.get(stage, 0) + response_tokens
+
+        if scope is not None:
+            for log in scope.logs:
+                log.append(call)
+        return call
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-stage totals, outcome counts and latency quantiles."""
+        with self._lock:
+            stages = sorted({stage for stage, _ in self.calls})
+            result = {}
+            for stage in stages:
+                latency = self.latency.get(stage)
+                result[stage] = {
+                    "outcomes": {outcome: self.calls.get((stage, outcome), 0) for outcome in OUTCOMES},
+                    "latency_p50_seconds": latency.quantile(0.5) if latency else None,
+                    "latency_p95_seconds": latency.quantile(0.95) if latency else None,
+                    "latency_sum_seconds": round(latency.sum, 3) if latency else 0.0,
+                    "prompt_chars": self.prompt_chars.get(stage, 0),
+                    "response_chars": self.response_chars.get(stage, 0),
+                    "response_tokens": self.response_tokens.get(stage, 0),
+                }
+            return result
+
+    def prometheus(self) -> str:
+        """Metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP llm_calls_total LLM calls by stage and outcome.",
+            "# TYPE llm_calls_total counter",
+        ]
+        with self._lock:
+            for (stage, outcome), n in sorted(self.calls.items()):
+                lines.append(f'llm_calls_total{{stage="{stage}",outcome="{outcome}"}} {n}')
+            for name, help_text, histograms in (
+                ("llm_call_latency_seconds", "Model call latency, cache hits excluded.", self.latency),
+                ("llm_prompt_tokens", "Prompt size in tokens per model call.", self.prompt_tokens),
+            ):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for stage, histogram in sorted(histograms.items()):
+                    for bound, total in histogram.cumulative():
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        lines.append(f'{name}_bucket{{stage="{stage}",le="{le}"}} {total}')
+                    lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum:g}')
+                    lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+            for name, help_text, totals in (
+                ("llm_response_tokens_total", "Response tokens returned by the model.", self.response_tokens),
+                ("llm_prompt_chars_total", "Prompt characters sent, cache hits included.", self.prompt_chars),
+                ("llm_response_chars_total", "Response characters received, cache hits included.", self.response_chars),
+            ):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for stage, total in sorted(totals.items()):
+                    lines.append(f'{name}{{stage="{stage}"}} {total}')
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,251 @@
+"""Deterministic local stand-in for Gemini, for offline load and latency tests.
+
+Like a Gemini model, the stand-in has generate_content(prompt) returning a
+reply with .text and usage_metadata. It answers ranking, batch ranking and
+proposal prompts with schema-valid JSON derived from the prompt itself,
+after a simulated latency, and can inject failures.
+Latency and failures are drawn from a generator seeded by the seed, the
+prompt and how many times the prompt was seen, so a benchmark replays
+identically regardless of thread scheduling.
+"""
+
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import List, Dict, Any, Optional
+
+from prompt_builder import SEGMENT_TABLE_HEADER, TOKEN_PATTERN, estimate_tokens, prescore_segments
+
+
+SPEC_PATTERN = re.compile(r'(?:requested signals for|looking for): "(.*)"')
+TOP_PATTERN = re.compile(r"Select the top (\d+)")
+QUERY_PATTERN = re.compile(r'^\s*Q(\d+): "(.*)" \(top (\d+); rows ([\d,\-]+|none)\)\s*$', re.MULTILINE)
+NAMES_PATTERN = re.compile(r"existing Peer39 segments:\s*(\[.*?\])", re.DOTALL)
+
+
+class UsageMetadata:
+    """Token counts in the shape of Gemini's usage_metadata."""
+
+    def __init__(self, prompt_token_count: int, candidates_token_count: int):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+
+
+class StandInReply:
+    """A reply from the stand-in; reading .text raises ValueError for blocked replies."""
+
+    def __init__(self, text: Optional[str], prompt: str):
+        self._text = text
+        self.usage_metadata = UsageMetadata(estimate_tokens(prompt), estimate_tokens(text or ""))
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            raise ValueError("Reply has no candidate text (simulated block)")
+        return self._text
+
+
+def _parse_rows(prompt: str, numbered: bool) -> Dict[str, Dict[str, Any]]:
+    """Segment table rows of a ranking prompt, keyed by id (or row number when numbered)."""
+    header = ("#|" if numbered else "") + SEGMENT_TABLE_HEADER
+    lines = prompt.splitlines()
+    try:
+        start = [line.strip() for line in lines].index(header) + 1
+    except ValueError:
+        return {}
+    rows = {}
+    for line in lines[start:]:
+        cells = line.strip().split("|")
+        if len(cells) != len(header.split("|")):
+            break
+        if numbered:
+            number, cells = cells[0], cells[1:]
+        segment_id, name, description, coverage, cpm = cells
+        segment = {"id": segment_id, "name": name, "description": description,
+                   "coverage_percentage": float(coverage) if coverage else None}
+        rows[number if numbered else segment_id] = segment
+    return rows
+
+
+def _expand_ranges(ranges: str) -> List[str]:
+    """Row numbers from a compressed list, e.g. "1-3,7" -> ["1", "2", "3", "7"]."""
+    if ranges == "none":
+        return []
+    numbers = []
+    for part in ranges.split(","):
+        first, _, last = part.partition("-")
+        numbers.extend(str(n) for n in range(int(first), int(last or first) + 1))
+    return numbers
+
+
+def _rank(signal_spec: str, segments: List[Dict[str, Any]], max_results: int) -> List[Dict[str, Any]]:
+    """Rankings for segments, scored by how many spec words their name and description match."""
+    words = set(TOKEN_PATTERN.findall(signal_spec.lower()))
+    rankings = []
+    for segment in prescore_segments(signal_spec, segments)[:max_results]:
+        text = f"{segment['name']} {segment['description']}".lower()
+        matched = sorted(word for word in words if word in text)
+        score = len(matched) / len(words) if words else 0.0
+        rankings.append({
+            "segment_id": segment["id"],
+            "relevance_score": round(max(score, 0.05), 2),
+            "match_reason": (f"Matches {', '.join(matched)}" if matched
+                             else "Closest available segment for this request"),
+        })
+    return rankings
+
+
+def _proposals(signal_spec: str, existing_names: List[str]) -> List[Dict[str, Any]]:
+    """Two custom segment proposals named after the spec."""
+    topic = " ".join(word.capitalize() for word in TOKEN_PATTERN.findall(signal_spec)[:4]) or "Custom"
+    basis = f"complements {len(existing_names)} existing segment{'s' if len(existing_names) != 1 else ''}"
+    return [
+        {
+            "proposed_name": f"{topic} Enthusiasts",
+            "description": f"Pages and contexts strongly associated with {signal_spec}",
+            "target_signals": "Contextual keywords and page categories",
+            "estimated_coverage_percentage": 2.5,
+            "estimated_cpm": 6.5,
+            "creation_rationale": f"Narrow contextual match for the request; {basis}",
+        },
+        {
+            "proposed_name": f"{topic} In-Market Intent",
+            "description": f"Recent research and purchase-intent content around {signal_spec}",
+            "target_signals": "Recency-weighted contextual intent signals",
+            "estimated_coverage_percentage": 1.2,
+            "estimated_cpm": 8.0,
+            "creation_rationale": f"Intent layer on top of the topical match; {basis}",
+        },
+    ]
+
+
+def stand_in_reply(prompt: str) -> Any:
+    """The JSON a well-behaved model would return for one of the agent's prompts."""
+    queries = QUERY_PATTERN.findall(prompt)
+    if queries:
+        rows = _parse_rows(prompt, numbered=True)
+        return {
+            f"Q{number}": _rank(spec, [rows[n] for n in _expand_ranges(ranges) if n in rows], int(top))
+            for number, spec, top, ranges in queries
+        }
+
+    spec_match = SPEC_PATTERN.search(prompt)
+    signal_spec = spec_match.group(1) if spec_match else ""
+    if '"proposed_name"' in prompt:
+        names_match = NAMES_PATTERN.search(prompt)
+        try:
+            existing_names = json.loads(names_match.group(1)) if names_match else []
+        except ValueError:
+            existing_names = []
+        return _proposals(signal_spec, existing_names)
+
+    top_match = TOP_PATTERN.search(prompt)
+    rows = _parse_rows(prompt, numbered=False)
+    return _rank(signal_spec, list(rows.values()), int(top_match.group(1)) if top_match else 10)
+
+
+class LatencyDistribution:
+    """Simulated model latency in seconds.
+
+    distribution is "fixed" (median_ms), "uniform" (min_ms..max_ms) or
+    "lognormal" (median_ms with sigma, the spread of log latency); samples
+    are capped at max_ms when it is set.
+    """
+
+    def __init__(self, distribution: str = "lognormal", median_ms: float = 800, sigma: float = 0.5,
+                 min_ms: float = 0, max_ms: Optional[float] = None):
+        if distribution not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        self.distribution = distribution
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+
+    def sample(self, rng: random.Random) -> float:
+        if self.distribution == "fixed":
+            ms = self.median_ms
+        elif self.distribution == "uniform":
+            ms = rng.uniform(self.min_ms, self.max_ms if self.max_ms is not None else self.median_ms * 2)
+        else:
+            ms = math.exp(rng.gauss(math.log(max(self.median_ms, 1e-3)), self.sigma))
+        if self.max_ms is not None:
+            ms = min(ms, self.max_ms)
+        return max(ms, 0.0) / 1000.0
+
+
+class LocalStandInBackend:
+    """Deterministic stand-in for Gemini with simulated latency and failure injection.
+
+    Each call first sleeps for a latency sample, then fails with the
+    configured probabilities: failure_rate raises ConnectionError,
+    timeout_rate sleeps timeout_seconds and raises TimeoutError,
+    empty_rate returns a reply whose .text raises ValueError (like a
+    blocked Gemini reply) and malformed_rate returns text that is not JSON.
+    """
+
+    model_name = "local-stand-in"
+
+    def __init__(self, seed: int = 0, latency: Optional[LatencyDistribution] = None,
+                 failure_rate: float = 0.0, timeout_rate: float = 0.0, timeout_seconds: float = 30.0,
+                 empty_rate: float = 0.0, malformed_rate: float = 0.0, sleep=time.sleep):
+        self.seed = seed
+        self.latency = latency or LatencyDistribution()
+        self.failure_rate = failure_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self.empty_rate = empty_rate
+        self.malformed_rate = malformed_rate
+        self.sleep = sleep
+        self._seen: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def _rng(self, prompt: str) -> random.Random:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        with self._lock:
+            occurrence = self._seen[digest]
+            self._seen[digest] += 1
+        return random.Random(f"{self.seed}:{digest}:{occurrence}")
+
+    def generate_content(self, prompt: str) -> StandInReply:
+        rng = self._rng(prompt)
+        self.sleep(self.latency.sample(rng))
+        roll = rng.random()
+        if roll < self.failure_rate:
+            raise ConnectionError("Injected stand-in failure")
+        roll -= self.failure_rate
+        if roll < self.timeout_rate:
+            self.sleep(self.timeout_seconds)
+            raise TimeoutError("Injected stand-in timeout")
+        roll -= self.timeout_rate
+        if roll < self.empty_rate:
+            return StandInReply(None, prompt)
+        roll -= self.empty_rate
+        if roll < self.malformed_rate:
+            return StandInReply('```json\n[{"segment_id": ', prompt)
+        return StandInReply(f"```json\n{json.dumps(stand_in_reply(prompt))}\n```", prompt)
+
+
+def create_stand_in_backend(settings: Dict[str, Any]) -> LocalStandInBackend:
+    """Create the stand-in from the llm.stand_in config section."""
+    latency = settings.get("latency", {})
+    return LocalStandInBackend(
+        seed=settings.get("seed", 0),
+        latency=LatencyDistribution(
+            distribution=latency.get("distribution", "lognormal"),
+            median_ms=latency.get("median_ms", 800),
+            sigma=latency.get("sigma", 0.5),
+            min_ms=latency.get("min_ms", 0),
+            max_ms=latency.get("max_ms")
+        ),
+        failure_rate=settings.get("failure_rate", 0.0),
+        timeout_rate=settings.get("timeout_rate", 0.0),
+        timeout_seconds=settings.get("timeout_seconds", 30.0),
+        empty_rate=settings.get("empty_rate", 0.0),
+        malformed_rate=settings.get("malformed_rate", 0.0)
+    )
@@ -1,51 +1,90 @@
 """Main MCP server implementation for the Signals Activation Protocol."""
 
+import atexit
 import json
 import sqlite3
 import sys
 import os
-import random
-import string
+import time
+import contextvars
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 
 import google.generativeai as genai
 from fastmcp import FastMCP
 from rich.console import Console
 
-from database import init_db
+from db_pool import ConnectionPool
+from context_writer import ContextWriter
+from context_retention import ContextRetention, new_context_id
+from database import init_db, build_fts_match_query, has_segments_fts, get_catalog_versions, SEGMENTS_FTS_TABLE
 from schemas import *
 from adapters.manager import AdapterManager
 from config_loader import load_config
-
-
-# In-memory storage for custom segments and activations
-custom_segments: Dict[str, Dict] = {}
-segment_activations: Dict[str, Dict] = {}
+from catalog import CatalogStore
+from columnar import ColumnarSegments
+from discovery_cache import DiscoveryCache, discovery_cache_key
+from entitlements import EntitlementCache
+from llm_cache import LLMResponseCache
+from custom_segment_store import CustomSegmentStore
+from activation_scheduler import ActivationJob, ActivationScheduler
+from llm_stand_in import create_stand_in_backend
+from ranking import LLMRanker, LocalRanker, TieredRanker
+from llm_batcher import BatchingLLMRanker
+from llm_metrics import LLMMetrics, collect_calls
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from prompt_builder import estimate_tokens
+from progressive import RefinementRegistry
+from follow_up import DiscoveryResultStore, compact_discovery_result
+from proposal_clusters import ClusterProposalStore
+from vector_index import create_embedder
 
 
 def get_db_connection():
-    """Get database connection with row factory."""
-    conn = sqlite3.connect('signals_agent.db', timeout=30.0)
-    conn.row_factory = sqlite3.Row
-    # Enable WAL mode for better concurrent access
-    conn.execute("PRAGMA journal_mode=WAL")
-    return conn
+    """Get a pooled database connection with row factory; close() returns it to the pool."""
+    return db_pool.connect()
 
 
 def generate_context_id() -> str:
-    """Generate a unique context ID in format ctx_<timestamp>_<random>."""
-    timestamp = int(datetime.now().timestamp())
-    random_suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=6))
-    return f"ctx_{timestamp}_{random_suffix}"
+    """Generate a unique, time-ordered context ID: ctx_ + 26 base32 characters."""
+    return new_context_id()
 
 
-def store_discovery_context(context_id: str, query: str, principal_id: Optional[str], 
-                          signal_ids: List[str], search_parameters: Dict[str, Any]) -> None:
-    """Store discovery context in unified contexts table with 7-day expiration."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def write_context(context_id: str, sql: str, params: tuple) -> None:
+    """Write to the contexts table, through the group-commit writer when it is on.
     
+    Queued writes are committed within a few milliseconds; readers of a
+    context call wait_for_context_writes first to see this process's writes.
+    """
+    if context_writer is not None:
+        context_writer.submit(context_id, sql, params)
+        return
+    conn = get_db_connection()
+    try:
+        conn.execute(sql, params)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def wait_for_context_writes(context_id: str) -> None:
+    """Block until writes to context_id queued by this process are committed."""
+    if context_writer is not None and not context_writer.wait_for(context_id):
+        console.print(f"[yellow]Timed out waiting for queued writes to {context_id}[/yellow]")
+
+
+def store_discovery_context(context_id: str, query: str, principal_id: Optional[str],
+                          signal_ids: List[str], search_parameters: Dict[str, Any],
+                          refinement: Optional[Dict[str, Any]] = None,
+                          llm_calls: Optional[List[Dict[str, Any]]] = None,
+                          result: Optional[Dict[str, Any]] = None) -> None:
+    """Store discovery context in unified contexts table with 7-day expiration.
+    
+    result is the compact discovery result that follow-up questions about
+    this context are answered from (see remember_discovery_result).
+    """
     created_at = datetime.now()
     expires_at = created_at + timedelta(days=7)
     
@@ -55,29 +94,151 @@ def store_discovery_context(context_id: str, query: str, principal_id: Optional[
         "signal_ids": signal_ids,
         "search_parameters": search_parameters
     }
-    
-    cursor.execute("""
-        INSERT INTO contexts 
-        (context_id, context_type, parent_context_id, principal_id, metadata, created_at, expires_at)
-        VALUES (?, 'discovery', NULL, ?, ?, ?, ?)
+    if refinement is not None:
+        metadata["refinement"] = refinement
+    if llm_calls is not None:
+        # Gemini calls made for this discovery (stage, outcome, latency, tokens)
+        metadata["llm_calls"] = llm_calls
+    if result is not None:
+        metadata["result"] = result
+    
+    write_context(context_id, f"""
+        INSERT INTO {context_retention.table_for(context_id)} 
+        (context_id, context_type, parent_context_id, principal_id, metadata, created_at, expires_at,
+         created_at_epoch, expires_at_epoch)
+        VALUES (?, 'discovery', NULL, ?, ?, ?, ?, ?, ?)
     """, (
         context_id,
         principal_id,
-        json.dumps(metadata),
+        json.dumps(metadata, separators=(',', ':')),
         created_at.isoformat(),
-        expires_at.isoformat()
+        expires_at.isoformat(),
+        int(created_at.timestamp()),
+        int(expires_at.timestamp())
     ))
+
+
+def remember_discovery_result(signal_spec: str, response: GetSignalsResponse) -> Dict[str, Any]:
+    """Keep the compact result of a discovery for follow-ups; returns it for storing."""
+    result = compact_discovery_result(signal_spec, response.model_dump(mode="json"))
+    discovery_results.put(response.context_id, result)
+    return result
+
+
+def get_discovery_result(context_id: str) -> Optional[Dict[str, Any]]:
+    """Compact result of a discovery, or None if the context is unknown.
     
-    conn.commit()
+    Served from memory; results of discoveries made by another worker or
+    before a restart are read from the stored context once. context_id may
+    also be a client context id linked with link_discovery_context.
+    """
+    resolved = discovery_results.resolve(context_id)
+    result = discovery_results.get(resolved)
+    if result is not None:
+        return result
+
+    conn = get_db_connection()
+    try:
+        if resolved == context_id:
+            row = conn.execute(
+                "SELECT context_id FROM context_aliases WHERE alias = ?", (context_id,)
+            ).fetchone()
+            if row:
+                resolved = row['context_id']
+                discovery_results.link(context_id, resolved)
+        wait_for_context_writes(resolved)
+        row = conn.execute(
+            f"SELECT metadata FROM {context_retention.table_for(resolved)} "
+            "WHERE context_id = ? AND context_type = 'discovery'",
+            (resolved,)
+        ).fetchone()
+    finally:
+        conn.close()
+    result = json.loads(row['metadata']).get("result") if row else None
+    if result is not None:
+        discovery_results.put(resolved, result)
+    return result
+
+
+def link_discovery_context(client_context_id: str, context_id: str) -> None:
+    """Let follow-ups sent under a client's own context id find discovery context_id.
+    
+    The link is stored next to the discovery context, with the same 7-day
+    expiration, so other workers and restarts find it too.
+    """
+    if not client_context_id or client_context_id == context_id:
+        return
+    discovery_results.link(client_context_id, context_id)
+    expires_at = datetime.now() + timedelta(days=7)
+    write_context(context_id, """
+        INSERT OR REPLACE INTO context_aliases (alias, context_id, expires_at_epoch)
+        VALUES (?, ?, ?)
+    """, (client_context_id, context_id, int(expires_at.timestamp())))
+
+
+def store_discovery_refinement(context_id: str, refinement: Dict[str, Any],
+                               signal_ids: Optional[List[str]] = None,
+                               llm_calls: Optional[List[Dict[str, Any]]] = None,
+                               result: Optional[Dict[str, Any]] = None) -> None:
+    """Attach the outcome of a progressive discovery's AI refinement to its context."""
+    wait_for_context_writes(context_id)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    table = context_retention.table_for(context_id)
+    cursor.execute(f"SELECT metadata FROM {table} WHERE context_id = ?", (context_id,))
+    row = cursor.fetchone()
+    conn.close()
+    if row:
+        metadata = json.loads(row['metadata'])
+        metadata["refinement"] = refinement
+        if signal_ids is not None:
+            metadata["signal_ids"] = signal_ids
+        if llm_calls is not None:
+            metadata["llm_calls"] = llm_calls
+        if result is not None:
+            metadata["result"] = result
+        write_context(
+            context_id,
+            f"UPDATE {table} SET metadata = ? WHERE context_id = ?",
+            (json.dumps(metadata, separators=(',', ':')), context_id)
+        )
+
+
+def get_discovery_refinement(context_id: str, timeout: float = 0.0) -> Optional[Dict[str, Any]]:
+    """Refinement state of a discovery context, or None if the context is unknown.
+
+    Waits up to timeout for a refinement running in this process; one started
+    by another worker is read from the stored context without waiting.
+    """
+    refinement = discovery_refinements.wait(context_id, timeout)
+    if refinement is not None:
+        return refinement
+
+    wait_for_context_writes(context_id)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        f"SELECT metadata FROM {context_retention.table_for(context_id)} "
+        "WHERE context_id = ? AND context_type = 'discovery'",
+        (context_id,)
+    )
+    row = cursor.fetchone()
     conn.close()
+    if not row:
+        return None
+    metadata = json.loads(row['metadata'])
+    refinement = metadata.get("refinement", {"status": "not_requested"})
+    if refinement["status"] == "completed" and "response" not in refinement and metadata.get("result"):
+        # Only the compact result is stored; the response is rebuilt from it
+        response = discovery_response_from_result(context_id, metadata["result"])
+        refinement = dict(refinement, response=response.model_dump(mode="json"))
+    return refinement
 
 
 def store_activation_context(parent_context_id: Optional[str], signal_id: str, 
                            platform: str, account: Optional[str]) -> str:
     """Store activation context in unified contexts table, optionally linking to discovery."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     # Generate new context ID for this activation
     context_id = generate_context_id()
     
@@ -95,27 +256,30 @@ def store_activation_context(parent_context_id: Optional[str], signal_id: str,
     # Get principal from parent context if available
     principal_id = None
     if parent_context_id:
-        cursor.execute("SELECT principal_id FROM contexts WHERE context_id = ?", (parent_context_id,))
-        result = cursor.fetchone()
+        wait_for_context_writes(parent_context_id)
+        conn = get_db_connection()
+        result = conn.execute(f"SELECT principal_id FROM {context_retention.table_for(parent_context_id)} "
+                              "WHERE context_id = ?", (parent_context_id,)).fetchone()
+        conn.close()
         if result:
             principal_id = result['principal_id']
     
-    cursor.execute("""
-        INSERT INTO contexts 
-        (context_id, context_type, parent_context_id, principal_id, metadata, created_at, expires_at)
-        VALUES (?, 'activation', ?, ?, ?, ?, ?)
+    write_context(context_id, f"""
+        INSERT INTO {context_retention.table_for(context_id)} 
+        (context_id, context_type, parent_context_id, principal_id, metadata, created_at, expires_at,
+         created_at_epoch, expires_at_epoch)
+        VALUES (?, 'activation', ?, ?, ?, ?, ?, ?, ?)
     """, (
         context_id,
         parent_context_id,
         principal_id,
         json.dumps(metadata),
         created_at.isoformat(),
-        expires_at.isoformat()
+        expires_at.isoformat(),
+        int(created_at.timestamp()),
+        int(expires_at.timestamp())
     ))
     
-    conn.commit()
-    conn.close()
-    
     return context_id
 
 
@@ -191,88 +355,89 @@ def generate_discovery_message(signal_spec: str, signals: List[SignalResponse],
     return " ".join(message_parts)
 
 
-def rank_signals_with_ai(signal_spec: str, segments: List[Dict], max_results: int = 10) -> List[Dict]:
-    """Use Gemini to intelligently rank signals based on the specification."""
-    if not segments:
-        return []
-    
-    # Prepare segment data for AI analysis
-    segment_data = []
-    for segment in segments:
-        segment_data.append({
-            "id": segment["id"],
-            "name": segment["name"], 
-            "description": segment["description"],
-            "coverage_percentage": segment["coverage_percentage"],
-            "cpm": segment["base_cpm"]
-        })
-    
-    prompt = f"""
-    You are an expert signals targeting analyst. A client has requested signals for: "{signal_spec}"
-    
-    Here are available signal segments from various providers, including different signal types:
-    - Audience signals: demographic/behavioral targeting
-    - Contextual signals: content-based targeting
-    - Geographical signals: location-based targeting
-    - Temporal signals: time-based targeting
-    - Environmental signals: weather/events/conditions
-    - Bidding signals: custom bidding strategies
-    
-    Available segments:
-    {json.dumps(segment_data, indent=2)}
-    
-    Please:
-    1. Rank these segments by relevance to the client's request (most relevant first)
-    2. Consider all signal types - the client may benefit from multiple types
-    3. Select the top {max_results} most relevant segments
-    4. For each selected segment, provide a brief explanation of why it matches the request
-    
-    Return your response as a JSON array with this structure:
-    [
-      {{
-        "segment_id": "segment_id",
-        "relevance_score": 0.95,
-        "match_reason": "Brief explanation of why this segment matches the request"
-      }}
-    ]
-    
-    Only include segments that have at least some relevance. If none are relevant, return an empty array.
+def usage_tokens(response: Any, field: str, fallback_text: str) -> int:
+    """Token count from Gemini's usage metadata, estimated from text if it is missing."""
+    count = getattr(getattr(response, 'usage_metadata', None), field, None)
+    return count if isinstance(count, int) else estimate_tokens(fallback_text)
+
+
+def generate_json(prompt: str, stage: str = "llm") -> Any:
+    """Send a prompt to Gemini and parse the JSON in its reply.
+    
+    Replies are served from the LLM response cache when the same prompt was
+    answered before; only replies that parse are cached. Every call is
+    recorded in llm_metrics under stage, with its outcome, latency and sizes.
+    Model calls go through the circuit breaker: CircuitOpenError is raised
+    at once while it is open, and transport errors and latency feed it.
     """
+    started = time.monotonic()
+    if llm_cache is not None:
+        cached = llm_cache.get(LLM_MODEL_NAME, prompt)
+        if cached is not None:
+            llm_metrics.record(stage, "cache_hit", time.monotonic() - started, len(prompt),
+                               estimate_tokens(prompt), len(cached), estimate_tokens(cached))
+            return json.loads(cached)
+    
+    if llm_breaker is not None and not llm_breaker.allow():
+        llm_metrics.record(stage, "circuit_open", time.monotonic() - started, len(prompt), estimate_tokens(prompt))
+        raise CircuitOpenError("Gemini circuit is open")
     
     try:
         response = model.generate_content(prompt)
-        clean_json_str = response.text.strip().replace("```json", "").replace("```", "").strip()
-        ai_rankings = json.loads(clean_json_str)
-        
-        # Reorder segments based on AI ranking
-        ranked_segments = []
-        for ranking in ai_rankings:
-            segment_id = ranking.get("segment_id")
-            match_reason = ranking.get("match_reason", "Relevant to your query")
-            
-            # Find the matching segment
-            for segment in segments:
-                if segment["id"] == segment_id:
-                    # Add the match reason to the segment
-                    segment_copy = segment.copy()
-                    segment_copy["match_reason"] = match_reason
-                    ranked_segments.append(segment_copy)
-                    break
-        
-        return ranked_segments
-        
     except Exception as e:
-        console.print(f"[yellow]AI ranking failed ({e}), using basic text matching[/yellow]")
-        # Fallback to basic text matching
-        return segments[:max_results]
+        latency = time.monotonic() - started
+        if llm_breaker is not None:
+            llm_breaker.record_failure(latency)
+        llm_metrics.record(stage, "transport_error", latency, len(prompt),
+                           estimate_tokens(prompt), error=type(e).__name__)
+        raise
+    latency = time.monotonic() - started
+    if llm_breaker is not None:
+        llm_breaker.record_success(latency)
+    prompt_tokens = usage_tokens(response, 'prompt_token_count', prompt)
+    
+    try:
+        text = response.text
+    except ValueError as e:
+        # No candidate text, e.g. the reply was blocked
+        llm_metrics.record(stage, "empty", latency, len(prompt), prompt_tokens, error=type(e).__name__)
+        raise
+    response_tokens = usage_tokens(response, 'candidates_token_count', text)
+    
+    clean_json_str = text.strip().replace("```json", "").replace("```", "").strip()
+    try:
+        result = json.loads(clean_json_str)
+    except ValueError as e:
+        llm_metrics.record(stage, "parse_error", latency, len(prompt), prompt_tokens,
+                           len(text), response_tokens, error=type(e).__name__)
+        raise
+    llm_metrics.record(stage, "ok" if result else "empty", latency, len(prompt), prompt_tokens,
+                       len(text), response_tokens)
+    if llm_cache is not None:
+        llm_cache.put(LLM_MODEL_NAME, prompt, clean_json_str)
+    return result
 
 
-def generate_custom_segment_proposals(signal_spec: str, existing_segments: List[Dict]) -> List[Dict]:
-    """Use Gemini to propose custom segments that could be created for this query."""
-    
-    existing_names = [seg["name"] for seg in existing_segments]
-    
-    prompt = f"""
+def rank_signals_with_ai(signal_spec: str, segments: List[Dict], max_results: int = 10,
+                         budget_seconds: Optional[float] = None) -> Tuple[List[Dict], bool]:
+    """Rank signals with Gemini, using the local ranking if it misses the latency budget.
+
+    Returns the ranked segments and whether the local ranking was used instead.
+    """
+    if not llm_available():
+        # Gemini is failing or slow: rank locally instead of waiting on it
+        return local_ranker.rank(signal_spec, segments, max_results), True
+    return signal_ranker.rank_with_tier(signal_spec, segments, max_results, budget_seconds)
+
+
+def llm_available() -> bool:
+    """False while the Gemini circuit breaker is open."""
+    return llm_breaker is None or not llm_breaker.is_open()
+
+
+def custom_proposals_prompt(signal_spec: str, existing_names: List[str]) -> str:
+    """Prompt asking Gemini for custom segments to complement existing_names."""
+    return f"""
     You are a contextual signal targeting expert. A client is looking for: "{signal_spec}"
     
     We found these existing Peer39 segments:
@@ -299,11 +464,16 @@ def generate_custom_segment_proposals(signal_spec: str, existing_segments: List[
     
     Focus on specific, impactful segments that deliver measurable results.
     """
+
+
+def generate_custom_segment_proposals(signal_spec: str, existing_segments: List[Dict]) -> List[Dict]:
+    """Use Gemini to propose custom segments that could be created for this query."""
+    
+    existing_names = [seg["name"] for seg in existing_segments]
+    prompt = custom_proposals_prompt(signal_spec, existing_names)
     
     try:
-        response = model.generate_content(prompt)
-        clean_json_str = response.text.strip().replace("```json", "").replace("```", "").strip()
-        proposals = json.loads(clean_json_str)
+        proposals = generate_json(prompt, stage="proposals")
         return proposals
         
     except Exception as e:
@@ -311,17 +481,655 @@ def generate_custom_segment_proposals(signal_spec: str, existing_segments: List[
         return []
 
 
+def start_custom_proposals(signal_spec: str, segments: List[Dict]) -> Optional[Future]:
+    """Future for a discovery's custom segment proposals, or None if there are none to make.
+    
+    Proposals precomputed for the candidates' catalog cluster resolve at once;
+    otherwise Gemini is asked on llm_executor, unless its circuit is open.
+    """
+    if not segments:
+        return None
+    if proposal_store is not None:
+        precomputed = proposal_store.lookup(segments)
+        if precomputed is not None:
+            future = Future()
+            future.set_result(precomputed)
+            return future
+    if not llm_available():
+        return None
+    return llm_executor.submit(
+        contextvars.copy_context().run, generate_custom_segment_proposals, signal_spec, segments
+    )
+
+
+def wait_for_llm(future: Future, started: float, timeout: float, fallback: Any, stage: str) -> Any:
+    """Result of an LLM stage submitted at started, or fallback once timeout has passed."""
+    try:
+        return future.result(timeout=max(0.0, started + timeout - time.monotonic()))
+    except FutureTimeoutError:
+        console.print(f"[yellow]{stage} timed out after {timeout}s[/yellow]")
+        return fallback
+
+
+def requested_platforms(deliver_to: DeliverySpecification) -> Optional[List[tuple]]:
+    """(platform, account) pairs requested by deliver_to, or None for "all"."""
+    if isinstance(deliver_to.platforms, str) and deliver_to.platforms == "all":
+        return None
+    
+    requested = []
+    for p in deliver_to.platforms:
+        if hasattr(p, 'platform'):  # PlatformSpecification object
+            requested.append((p.platform, p.account))
+        elif isinstance(p, dict):  # Legacy dict format
+            requested.append((p.get('platform'), p.get('account')))
+        else:  # String format
+            requested.append((p, None))
+    return requested
+
+
+def deployment_matches(platform: str, account: Optional[str], requested: Optional[List[tuple]]) -> bool:
+    """Whether a deployment on platform/account can deliver to the requested platforms.
+    
+    A requested account is served by platform-wide deployments and by
+    deployments on that account.
+    """
+    if requested is None:
+        return True
+    return any(
+        platform == requested_platform and (requested_account is None or account in (None, requested_account))
+        for requested_platform, requested_account in requested
+    )
+
+
+def search_segments_db(cursor: sqlite3.Cursor, signal_spec: str, principal_access_level: str,
+                       filters: Optional[SignalFilters], limit: int,
+                       platforms: Optional[List[tuple]] = None) -> List[Dict]:
+    """Query signal_segments directly for discovery candidates.
+    
+    platforms (see requested_platforms) restricts candidates to segments with
+    a deployment that can deliver there, before the limit is applied.
+    """
+    # Build query based on principal access level
+    if principal_access_level == 'public':
+        catalog_filter = "s.catalog_access = 'public'"
+    elif principal_access_level == 'personalized':
+        catalog_filter = "s.catalog_access IN ('public', 'personalized')"
+    else:  # private
+        catalog_filter = "s.catalog_access IN ('public', 'personalized', 'private')"
+    
+    # Keyword retrieval goes through the FTS5 index (BM25-ranked) when it is
+    # available; otherwise fall back to per-word LIKE matching.
+    match_query = build_fts_match_query(signal_spec) if signal_spec else None
+    use_fts = match_query is not None and has_segments_fts(cursor)
+    
+    if use_fts:
+        query = f"""
+            SELECT s.* FROM {SEGMENTS_FTS_TABLE}
+            JOIN signal_segments s ON s.rowid = {SEGMENTS_FTS_TABLE}.rowid
+            WHERE {SEGMENTS_FTS_TABLE} MATCH ? AND {catalog_filter}
+        """
+        params = [match_query]
+    else:
+        query = f"""
+            SELECT s.* FROM signal_segments s
+            WHERE {catalog_filter}
+        """
+        params = []
+    
+    if filters:
+        if filters.catalog_types:
+            placeholders = ','.join('?' * len(filters.catalog_types))
+            query += f" AND s.signal_type IN ({placeholders})"
+            params.extend(filters.catalog_types)
+        
+        if filters.data_providers:
+            placeholders = ','.join('?' * len(filters.data_providers))
+            query += f" AND s.data_provider IN ({placeholders})"
+            params.extend(filters.data_providers)
+        
+        if filters.max_cpm:
+            query += " AND s.base_cpm <= ?"
+            params.append(filters.max_cpm)
+        
+        if filters.min_coverage_percentage:
+            query += " AND s.coverage_percentage >= ?"
+            params.append(filters.min_coverage_percentage)
+    
+    if platforms is not None:
+        # Semijoin on platform_deployments, served by its
+        # (signals_agent_segment_id, platform, account) unique index
+        platform_conditions = []
+        for platform, account in platforms:
+            if account is None:
+                platform_conditions.append("d.platform = ?")
+                params.append(platform)
+            else:
+                platform_conditions.append("(d.platform = ? AND (d.account IS NULL OR d.account = ?))")
+                params.extend([platform, account])
+        query += f"""
+            AND EXISTS (
+                SELECT 1 FROM platform_deployments d
+                WHERE d.signals_agent_segment_id = s.id
+                AND ({' OR '.join(platform_conditions) or '0'})
+            )
+        """
+    
+    if use_fts:
+        # Name matches weigh more than description matches
+        query += f" ORDER BY bm25({SEGMENTS_FTS_TABLE}, 10.0, 1.0) LIMIT ?"
+    else:
+        if signal_spec:
+            # Split the spec into individual words for better matching
+            words = signal_spec.lower().split()
+            word_conditions = []
+            for word in words:
+                word_conditions.append("(LOWER(s.name) LIKE ? OR LOWER(s.description) LIKE ?)")
+                word_pattern = f"%{word}%"
+                params.extend([word_pattern, word_pattern])
+            
+            if word_conditions:
+                # Use OR to match any of the words
+                query += " AND (" + " OR ".join(word_conditions) + ")"
+        
+        query += " ORDER BY s.coverage_percentage DESC LIMIT ?"
+    params.append(limit)
+    
+    cursor.execute(query, params)
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def fetch_deployments(cursor: sqlite3.Cursor, segment_ids: List[str]) -> Dict[str, List[Dict]]:
+    """Platform deployments for a set of segments in one query, grouped by segment."""
+    deployments: Dict[str, List[Dict]] = {segment_id: [] for segment_id in segment_ids}
+    if not segment_ids:
+        return deployments
+    
+    placeholders = ','.join('?' * len(segment_ids))
+    cursor.execute(f"""
+        SELECT * FROM platform_deployments 
+        WHERE signals_agent_segment_id IN ({placeholders})
+        ORDER BY id
+    """, segment_ids)
+    for row in cursor.fetchall():
+        deployments[row['signals_agent_segment_id']].append(dict(row))
+    return deployments
+
+
+def assemble_signals(ranked_segments: List[Dict], platforms: Optional[List[tuple]], snapshot,
+                     cursor: sqlite3.Cursor, entitlements) -> List[SignalResponse]:
+    """Signal responses, with deployments and principal pricing, for ranked segments."""
+    # Deployments for all ranked database segments are fetched up front, so
+    # assembly takes a fixed number of round trips
+    db_segment_ids = list(dict.fromkeys(s['id'] for s in ranked_segments if not s.get('platform')))
+    if snapshot is not None:
+        deployments_by_segment = {
+            segment_id: snapshot.get_deployments(segment_id) for segment_id in db_segment_ids
+        }
+    else:
+        deployments_by_segment = fetch_deployments(cursor, db_segment_ids)
+
+    signals = []
+    for segment in ranked_segments:
+        platform_deployments = []
+
+        # Handle platform adapter segments differently than database segments
+        if segment.get('platform'):
+            # This is a platform adapter segment
+            platform_name = segment['platform']
+            account_id = segment.get('account_id')
+
+            # Check if this platform was requested
+            if deployment_matches(platform_name, account_id, platforms):
+                # Create a deployment record for the platform segment
+                platform_deployments = [PlatformDeployment(
+                    signals_agent_segment_id=segment['id'],
+                    platform=platform_name,
+                    account=account_id,
+                    decisioning_platform_segment_id=segment.get('platform_segment_id', segment['id']),
+                    scope="account-specific" if account_id else "platform-wide",
+                    is_live=True,  # Platform adapter segments are assumed live
+                    deployed_at=datetime.now().isoformat(),
+                    estimated_activation_duration_minutes=15
+                )]
+        else:
+            # This is a database segment - filter its prefetched deployments
+            platform_deployments = [
+                PlatformDeployment(**dep) for dep in deployments_by_segment.get(segment['id'], [])
+                if deployment_matches(dep['platform'], dep.get('account'), platforms)
+            ]
+
+        if platform_deployments:
+            # Custom pricing for this principal only applies to database segments
+            cpm = segment['base_cpm']
+            if not segment.get('platform'):
+                cpm = entitlements.price(segment['id'], cpm)
+
+            signal = SignalResponse(
+                signals_agent_segment_id=segment['id'],
+                name=segment['name'],
+                description=segment['description'],
+                signal_type=segment.get('signal_type', segment.get('audience_type', 'audience')),
+                data_provider=segment['data_provider'],
+                coverage_percentage=segment['coverage_percentage'],
+                deployments=platform_deployments,
+                pricing=PricingModel(
+                    cpm=cpm,
+                    revenue_share_percentage=segment['revenue_share_percentage']
+                ),
+                has_coverage_data=segment.get('has_coverage_data', True),  # Database segments have coverage
+                has_pricing_data=segment.get('has_pricing_data', True)  # Database segments have pricing
+            )
+            signals.append(signal)
+    return signals
+
+
+def register_custom_proposals(proposal_data: List[Dict]) -> List[CustomSegmentProposal]:
+    """Register LLM proposals as activatable custom segments."""
+    segments = [
+        {
+            "name": proposal['proposed_name'],
+            "description": f"Custom segment: {proposal.get('target_signals', proposal.get('target_audience', ''))}",
+            "signal_type": "custom",
+            "data_provider": "Custom AI Generated",
+            "coverage_percentage": proposal['estimated_coverage_percentage'],
+            "base_cpm": proposal['estimated_cpm'],
+            "revenue_share_percentage": 0.0,
+            "catalog_access": "personalized",
+            "creation_rationale": proposal['creation_rationale'],
+            "created_at": datetime.now().isoformat()
+        }
+        for proposal in proposal_data
+    ]
+
+    # Stored for later activation; identical proposals share one id
+    custom_ids = custom_segment_store.add(segments)
+    return [
+        CustomSegmentProposal(**proposal, custom_segment_id=custom_id)
+        for proposal, custom_id in zip(proposal_data, custom_ids)
+    ]
+
+
+def build_discovery_response(context_id: str, signal_spec: str, signals: List[SignalResponse],
+                             custom_proposals: List[CustomSegmentProposal],
+                             taxonomy_summaries: List[TaxonomyNodeSummary],
+                             refinement_status: Optional[str] = None) -> GetSignalsResponse:
+    """GetSignalsResponse with its summary message and clarification hint."""
+    # Generate human-readable message
+    message = generate_discovery_message(signal_spec, signals, custom_proposals)
+
+    # Check if clarification might help
+    clarification_needed = None
+    if len(signals) < 3 and not custom_proposals:
+        clarification_needed = "Consider being more specific about your target audience characteristics, such as demographics, interests, or behaviors."
+    elif len(signals) == 0:
+        clarification_needed = "No matching signals found. Try broadening your search terms or checking available platforms."
+
+    return GetSignalsResponse(
+        message=message,
+        context_id=context_id,
+        signals=signals,
+        custom_segment_proposals=custom_proposals if custom_proposals else None,
+        taxonomy=taxonomy_summaries if taxonomy_summaries else None,
+        refinement_status=refinement_status,
+        clarification_needed=clarification_needed
+    )
+
+
+def discovery_response_from_result(context_id: str, result: Dict[str, Any]) -> GetSignalsResponse:
+    """GetSignalsResponse rebuilt from a compact discovery result.
+
+    Stored refinements keep only their status next to the compact result,
+    which holds everything the original response was built from.
+    """
+    signals = [
+        SignalResponse(
+            signals_agent_segment_id=signal["id"],
+            name=signal["name"],
+            description=signal.get("description") or "",
+            signal_type=signal.get("signal_type") or "marketplace",
+            data_provider=signal.get("data_provider") or "",
+            coverage_percentage=signal.get("coverage_percentage"),
+            deployments=[PlatformDeployment(**deployment) for deployment in signal["deployments"]],
+            pricing=PricingModel(**signal["pricing"]),
+            has_coverage_data=signal.get("has_coverage_data"),
+            has_pricing_data=signal.get("has_pricing_data")
+        )
+        for signal in result["signals"]
+    ]
+    proposals = [
+        CustomSegmentProposal(
+            proposed_name=proposal["name"],
+            description=proposal.get("description") or "",
+            target_signals=proposal.get("target_signals") or "",
+            estimated_coverage_percentage=proposal.get("coverage_percentage") or 0.0,
+            estimated_cpm=proposal.get("cpm") or 0.0,
+            creation_rationale=proposal.get("rationale") or "",
+            custom_segment_id=proposal.get("id")
+        )
+        for proposal in result["custom_segment_proposals"]
+    ]
+    taxonomy_summaries = [TaxonomyNodeSummary(**summary) for summary in result.get("taxonomy") or []]
+    return build_discovery_response(
+        context_id, result["signal_spec"], signals, proposals, taxonomy_summaries, result.get("refinement_status")
+    )
+
+
+def refine_discovery(context_id: str, signal_spec: str, segments: List[Dict], max_results: int,
+                     platforms: Optional[List[tuple]], snapshot, entitlements,
+                     taxonomy_summaries: List[TaxonomyNodeSummary],
+                     cache_key: Optional[str] = None, cache_version: Optional[tuple] = None) -> None:
+    """Phase two of a progressive discovery: AI ranking and custom proposals.
+
+    The refined response is stored under context_id and handed to waiting
+    subscribers. Ranking gets the longer refinement budget before the local
+    order is kept.
+    """
+    with collect_calls() as llm_calls:
+        refinement = run_refinement(
+            context_id, signal_spec, segments, max_results, platforms, snapshot, entitlements,
+            taxonomy_summaries, cache_key, cache_version, llm_calls
+        )
+    discovery_refinements.finish(context_id, refinement)
+
+
+def run_refinement(context_id: str, signal_spec: str, segments: List[Dict], max_results: int,
+                   platforms: Optional[List[tuple]], snapshot, entitlements,
+                   taxonomy_summaries: List[TaxonomyNodeSummary], cache_key: Optional[str],
+                   cache_version: Optional[tuple], llm_calls: List[Dict]) -> Dict[str, Any]:
+    """Body of refine_discovery; returns the refinement for waiting subscribers."""
+    try:
+        llm_started = time.monotonic()
+        proposals_future = start_custom_proposals(signal_spec, segments[:max_results])
+        ranked_segments, fell_back = rank_signals_with_ai(
+            signal_spec, segments, max_results,
+            budget_seconds=progressive_config.get('refinement_budget_seconds', 30)
+        )
+
+        conn = get_db_connection()
+        try:
+            signals = assemble_signals(ranked_segments, platforms, snapshot, conn.cursor(), entitlements)
+        finally:
+            conn.close()
+
+        custom_proposals = []
+        if signals and proposals_future:
+            custom_proposals = register_custom_proposals(wait_for_llm(
+                proposals_future, llm_started, llm_config.get('proposals_timeout_seconds', 20),
+                [], "Custom segment proposal generation"
+            ))
+
+        response = build_discovery_response(
+            context_id, signal_spec, signals, custom_proposals, taxonomy_summaries,
+            refinement_status="completed"
+        )
+        result = remember_discovery_result(signal_spec, response)
+        store_discovery_refinement(
+            context_id, {"status": "completed"}, [signal.signals_agent_segment_id for signal in signals],
+            llm_calls, result
+        )
+        refinement = {"status": "completed", "response": response.model_dump(mode="json")}
+        if cache_key and not fell_back:
+            discovery_cache.put(cache_key, cache_version, response)
+    except Exception as e:
+        console.print(f"[red]AI refinement of {context_id} failed: {e}[/red]")
+        refinement = {"status": "failed", "error": str(e)}
+        try:
+            store_discovery_refinement(context_id, refinement, llm_calls=llm_calls)
+        except sqlite3.Error:
+            pass
+    return refinement
+
+
+def mark_deployment_live(job: ActivationJob, deployed_at: Optional[str] = None):
+    """Record a catalog segment activation as live on its platform/account."""
+    conn = get_db_connection()
+    try:
+        conn.execute("""
+            UPDATE platform_deployments 
+            SET is_live = 1, deployed_at = ?
+            WHERE signals_agent_segment_id = ? AND platform = ? AND account IS ?
+        """, (deployed_at or datetime.now().isoformat(), job.segment_id, job.platform, job.account))
+        conn.commit()
+    finally:
+        conn.close()
+    if catalog_store:
+        catalog_store.notify_write()
+    console.print(f"[bold green]Signal {job.segment_id} is now live on {job.platform}[/bold green]")
+
+
+def advance_activation(job: ActivationJob) -> Optional[float]:
+    """Advance a due activation; returns seconds until the next check, or None once it is finished.
+    
+    Catalog segments on platforms with an adapter are live when the platform
+    says so; other activations are simulated and complete when due.
+    """
+    if job.kind == "custom":
+        activation_key = f"{job.segment_id}_{job.platform}_{job.account or 'default'}"
+        activation = custom_segment_store.get_activation(activation_key)
+        if activation is not None and activation.get('status') == 'activating':
+            activation['status'] = 'deployed'
+            activation['deployed_at'] = datetime.now().isoformat()
+            custom_segment_store.put_activation(activation_key, job.segment_id, activation)
+            console.print(f"[bold green]Custom segment '{job.segment_id}' is now live on {job.platform}[/bold green]")
+        return None
+    
+    if not adapter_manager.get_adapter(job.platform):
+        mark_deployment_live(job)
+        return None
+    
+    status = adapter_manager.check_segment_status(job.platform, job.platform_segment_id, job.account or "")
+    if status.get('is_live'):
+        mark_deployment_live(job, status.get('deployed_at'))
+        return None
+    if status.get('status') in ('failed', 'not_found'):
+        # Drop the deployment so the segment can be activated again
+        console.print(f"[red]Activation of {job.segment_id} on {job.platform} failed: "
+                      f"{status.get('error_message', status['status'])}[/red]")
+        conn = get_db_connection()
+        try:
+            conn.execute("""
+                DELETE FROM platform_deployments
+                WHERE signals_agent_segment_id = ? AND platform = ? AND account IS ? AND is_live = 0
+            """, (job.segment_id, job.platform, job.account))
+            conn.commit()
+        finally:
+            conn.close()
+        if catalog_store:
+            catalog_store.notify_write()
+        return None
+    return activation_config.get('status_poll_seconds', 60)
+
+
 # --- Application Setup ---
 config = load_config()
 # init_db() moved to if __name__ == "__main__" section
 
-# Initialize Gemini
-genai.configure(api_key=config.get("gemini_api_key", "your-api-key-here"))
-model = genai.GenerativeModel('gemini-2.0-flash-exp')
+# Reusable connections for the request path, WAL mode and tuned pragmas
+db_pool_config = config.get('database', {}).get('pool', {})
+db_pool = ConnectionPool(
+    'signals_agent.db',
+    max_idle_per_thread=db_pool_config.get('max_idle_per_thread', 2),
+    health_check_seconds=db_pool_config.get('health_check_seconds', 30),
+    max_uses=db_pool_config.get('max_uses', 10000),
+    cached_statements=db_pool_config.get('cached_statements', 256),
+    pragmas=db_pool_config.get('pragmas')
+)
+
+# Context writes are queued and committed in groups by one writer thread;
+# queued writes are flushed at exit
+context_writes_config = config.get('context_writes', {})
+context_writer = ContextWriter(
+    get_db_connection,
+    max_batch_rows=context_writes_config.get('max_batch_rows', 256),
+    max_delay_ms=context_writes_config.get('max_delay_ms', 2),
+    queue_size=context_writes_config.get('queue_size', 10000)
+) if context_writes_config.get('enabled', True) else None
+if context_writer:
+    atexit.register(context_writer.close)
+
+# Expired contexts are purged in small batches by a background thread; with
+# partition_days set, contexts are stored in a table per period and a fully
+# expired period is dropped whole
+context_retention_config = config.get('context_retention', {})
+context_retention = ContextRetention(
+    get_db_connection,
+    batch_size=context_retention_config.get('batch_size', 500),
+    pause_seconds=context_retention_config.get('pause_seconds', 0.01),
+    partition_days=context_retention_config.get('partition_days', 0)
+)
+
+# Initialize the LLM backend: Gemini, or the local stand-in for offline
+# load and latency tests
+llm_config = config.get('llm', {})
+llm_backend = llm_config.get('backend', 'gemini')
+if llm_backend == 'gemini':
+    genai.configure(api_key=config.get("gemini_api_key", "your-api-key-here"))
+    LLM_MODEL_NAME = 'gemini-2.0-flash-exp'
+    model = genai.GenerativeModel(LLM_MODEL_NAME)
+elif llm_backend == 'local':
+    model = create_stand_in_backend(llm_config.get('stand_in', {}))
+    LLM_MODEL_NAME = model.model_name
+else:
+    raise ValueError(f"Unknown LLM backend: {llm_backend}")
+
+# Worker threads for LLM calls, so independent calls can overlap
+llm_executor = ThreadPoolExecutor(max_workers=llm_config.get('max_workers', 8), thread_name_prefix="llm")
+
+# Latency, size and outcome of every Gemini call, exposed at /metrics
+llm_metrics = LLMMetrics()
+
+# Shared by ranking and proposals: while Gemini is failing or slow, ranking
+# is local and proposals are skipped instead of every request paying timeouts
+breaker_config = llm_config.get('circuit_breaker', {})
+llm_breaker = CircuitBreaker(
+    "Gemini",
+    window_size=breaker_config.get('window_size', 20),
+    min_calls=breaker_config.get('min_calls', 5),
+    failure_rate_threshold=breaker_config.get('failure_rate_threshold', 0.5),
+    slow_call_seconds=breaker_config.get('slow_call_seconds', 8),
+    slow_call_rate_threshold=breaker_config.get('slow_call_rate_threshold', 0.5),
+    open_seconds=breaker_config.get('open_seconds', 30),
+    half_open_probes=breaker_config.get('half_open_probes', 1)
+) if breaker_config.get('enabled', True) else None
+
+# AI-generated custom segments, shared by all worker processes so any of
+# them can activate a proposal
+custom_segments_config = config.get('custom_segments', {})
+custom_segment_store = CustomSegmentStore(
+    get_db_connection,
+    ttl_seconds=custom_segments_config.get('ttl_seconds', 7 * 86400),
+    max_entries=custom_segments_config.get('max_entries', 100000),
+    memory_entries=custom_segments_config.get('memory_entries', 1024)
+)
+
+# Persistent cache of Gemini replies, shared by all worker processes
+llm_cache_config = config.get('llm_cache', {})
+llm_cache = LLMResponseCache(
+    get_db_connection,
+    ttl_seconds=llm_cache_config.get('ttl_seconds', 86400),
+    max_entries=llm_cache_config.get('max_entries', 10000),
+    memory_entries=llm_cache_config.get('memory_entries', 256)
+) if llm_cache_config.get('enabled', True) else None
+
+# Gemini ranking with the local ranker as the deadline fallback tier. With
+# batching on, rankings requested within a few ms share one Gemini call.
+batching_config = llm_config.get('batching', {})
+if batching_config.get('enabled', True):
+    llm_ranker = BatchingLLMRanker(
+        partial(generate_json, stage="ranking"),
+        window_seconds=batching_config.get('window_ms', 5) / 1000.0,
+        max_batch_size=batching_config.get('max_batch_size', 8),
+        max_concurrent_batches=batching_config.get('max_concurrent_batches', 4),
+        token_budget=llm_config.get('prompt_token_budget', 6000),
+        description_chars=llm_config.get('prompt_description_chars', 160)
+    )
+else:
+    llm_ranker = LLMRanker(
+        partial(generate_json, stage="ranking"),
+        token_budget=llm_config.get('prompt_token_budget', 6000),
+        description_chars=llm_config.get('prompt_description_chars', 160)
+    )
+local_ranker = LocalRanker()
+signal_ranker = TieredRanker(
+    llm_ranker,
+    local_ranker,
+    executor=llm_executor,
+    budget_seconds=llm_config.get('ranking_budget_seconds', 8)
+)
+
+# Progressive discovery: AI refinements run on their own pool, so they never
+# hold the llm workers their own calls are queued on
+progressive_config = config.get('progressive', {})
+refinement_executor = ThreadPoolExecutor(
+    max_workers=progressive_config.get('max_workers', 4), thread_name_prefix="refine"
+)
+discovery_refinements = RefinementRegistry(
+    max_entries=progressive_config.get('max_tracked', 1000),
+    ttl_seconds=progressive_config.get('ttl_seconds', 600)
+)
+
+# Compact discovery results by context_id, for answering follow-up questions
+follow_up_config = config.get('follow_ups', {})
+discovery_results = DiscoveryResultStore(max_entries=follow_up_config.get('max_entries', 5000))
+
+# Custom segment proposals precomputed per taxonomy cluster of the catalog,
+# served at query time instead of a Gemini call per discovery
+proposal_clusters_config = config.get('proposal_clusters', {})
+proposal_store = ClusterProposalStore(
+    get_db_connection,
+    lambda label, names: generate_json(custom_proposals_prompt(label, names), stage="cluster_proposals"),
+    taxonomy_depth=proposal_clusters_config.get('taxonomy_depth', 1),
+    ttl_seconds=proposal_clusters_config.get('ttl_seconds', 604800),
+    max_members_in_prompt=proposal_clusters_config.get('max_members_in_prompt', 20),
+    max_clusters_per_run=proposal_clusters_config.get('max_clusters_per_run', 50),
+    refresh_on_read=proposal_clusters_config.get('refresh_on_read', True)
+) if proposal_clusters_config.get('enabled', True) else None
 
 # Initialize platform adapters
 adapter_manager = AdapterManager(config)
 
+# In-memory catalog snapshot for discovery (loaded lazily on first request)
+catalog_config = config.get('catalog', {})
+semantic_config = catalog_config.get('semantic', {})
+taxonomy_config = catalog_config.get('taxonomy', {})
+catalog_store = CatalogStore(
+    'signals_agent.db',
+    refresh_interval_seconds=catalog_config.get('refresh_interval_seconds', 2.0),
+    embedder=create_embedder(semantic_config) if semantic_config.get('enabled', True) else None,
+    embeddings_path=semantic_config.get('embeddings_path'),
+    approximate_threshold=semantic_config.get('approximate_threshold')
+) if catalog_config.get('enabled', True) else None
+
+# Per-principal access level and custom CPMs, invalidated on catalog changes:
+# reported by the catalog store, or checked by the cache itself without one
+entitlements_config = config.get('entitlements', {})
+entitlement_cache = EntitlementCache(
+    get_db_connection,
+    max_entries=entitlements_config.get('max_entries', 10000),
+    ttl_seconds=entitlements_config.get('ttl_seconds', 600),
+    version_check_seconds=0 if catalog_store else entitlements_config.get('version_check_seconds', 5)
+)
+if catalog_store:
+    catalog_store.add_listener(entitlement_cache.on_catalog_change)
+
+# Cache of discovery results, invalidated whenever the catalog version changes
+discovery_cache_config = config.get('discovery_cache', {})
+discovery_cache = DiscoveryCache(
+    max_entries=discovery_cache_config.get('max_entries', 1000),
+    ttl_seconds=discovery_cache_config.get('ttl_seconds', 300)
+) if discovery_cache_config.get('enabled', True) else None
+
+# Pending activations, advanced in the background when due
+activation_config = config.get('activations', {})
+activation_scheduler = ActivationScheduler(
+    get_db_connection,
+    advance_activation,
+    max_workers=activation_config.get('max_workers', 4),
+    claim_seconds=activation_config.get('claim_seconds', 120),
+    reload_seconds=activation_config.get('reload_seconds', 60),
+    retry_seconds=activation_config.get('retry_seconds', 30)
+)
+
 mcp = FastMCP(name="SignalsActivationAgent")
 console = Console()
 
@@ -430,70 +1238,133 @@ def get_signals(
         List of matching signals with deployment status, pricing, and AI-generated
         match explanations. Also includes custom segment proposals when relevant.
     """
-    
+    return discover_signals(signal_spec, deliver_to, filters, max_results, principal_id)
+
+
+def discover_signals(
+    signal_spec: str,
+    deliver_to: DeliverySpecification,
+    filters: Optional[SignalFilters] = None,
+    max_results: Optional[int] = 10,
+    principal_id: Optional[str] = None,
+    progressive: bool = False
+) -> GetSignalsResponse:
+    """Signal discovery behind get_signals.
+
+    With progressive, the locally ranked signals are returned right away with
+    refinement_status "pending"; the AI ranking and custom proposals are then
+    produced in the background and stored under the returned context_id (see
+    refine_discovery and get_discovery_refinement). The Gemini calls made
+    are stored with the discovery context.
+    """
+    with collect_calls() as llm_calls:
+        return run_discovery(signal_spec, deliver_to, filters, max_results, principal_id, progressive, llm_calls)
+
+
+def run_discovery(signal_spec: str, deliver_to: DeliverySpecification, filters: Optional[SignalFilters],
+                  max_results: Optional[int], principal_id: Optional[str], progressive: bool,
+                  llm_calls: List[Dict[str, Any]]) -> GetSignalsResponse:
+    """Body of discover_signals; LLM calls made in this context land in llm_calls."""
+    discovery_started = time.monotonic()
     conn = get_db_connection()
     cursor = conn.cursor()
     
     # Determine catalog access based on principal
-    principal_access_level = 'public'  # Default
-    if principal_id:
-        cursor.execute("SELECT access_level FROM principals WHERE principal_id = ?", (principal_id,))
-        principal_row = cursor.fetchone()
-        if principal_row:
-            principal_access_level = principal_row['access_level']
+    entitlements = entitlement_cache.get(principal_id)
+    principal_access_level = entitlements.access_level
     
-    # Build query based on principal access level
-    if principal_access_level == 'public':
-        catalog_filter = "catalog_access = 'public'"
-    elif principal_access_level == 'personalized':
-        catalog_filter = "catalog_access IN ('public', 'personalized')"
-    else:  # private
-        catalog_filter = "catalog_access IN ('public', 'personalized', 'private')"
-    
-    query = f"""
-        SELECT * FROM signal_segments 
-        WHERE {catalog_filter}
-    """
-    params = []
+    search_parameters = {
+        "signal_spec": signal_spec,
+        "deliver_to": deliver_to.model_dump(),
+        "filters": filters.model_dump() if filters else None,
+        "max_results": max_results,
+        "principal_id": principal_id
+    }
     
-    if filters:
-        if filters.catalog_types:
-            placeholders = ','.join('?' * len(filters.catalog_types))
-            query += f" AND signal_type IN ({placeholders})"
-            params.extend(filters.catalog_types)
-        
-        if filters.data_providers:
-            placeholders = ','.join('?' * len(filters.data_providers))
-            query += f" AND data_provider IN ({placeholders})"
-            params.extend(filters.data_providers)
-        
-        if filters.max_cpm:
-            query += " AND base_cpm <= ?"
-            params.append(filters.max_cpm)
+    snapshot = catalog_store.snapshot() if catalog_store else None
+
+    # Identical briefs are served from the cache while the catalog is unchanged;
+    # every call still gets its own context_id and discovery context. The
+    # snapshot's versions match the catalog it serves and cost no query.
+    cache_key = cache_version = None
+    if discovery_cache is not None:
+        try:
+            versions = snapshot.versions if snapshot is not None else get_catalog_versions(cursor)
+            cache_version = tuple(sorted(versions.items()))
+            cache_key = discovery_cache_key(
+                signal_spec, deliver_to, filters, max_results, principal_access_level, principal_id
+            )
+        except sqlite3.Error:
+            cache_key = None
+        cached = discovery_cache.get(cache_key, cache_version) if cache_key else None
+        if cached is not None:
+            conn.close()
+            context_id = generate_context_id()
+            signal_ids = [signal.signals_agent_segment_id for signal in cached.signals]
+            response = cached.model_copy(update={
+                "context_id": context_id,
+                "refinement_status": "completed" if progressive else None
+            })
+            # A cached response is already refined, so there is no phase two
+            store_discovery_context(
+                context_id, signal_spec, principal_id, signal_ids, search_parameters,
+                {"status": "completed"} if progressive else None, llm_calls,
+                remember_discovery_result(signal_spec, response)
+            )
+            if progressive:
+                discovery_refinements.finish(
+                    context_id, {"status": "completed", "response": response.model_dump(mode="json")}
+                )
+            return response
+    
+    # Candidate retrieval: in-memory catalog snapshot, or SQL if it is unavailable.
+    # Only segments deliverable to the requested platforms become candidates.
+    platforms = requested_platforms(deliver_to)
+    taxonomy_summaries = []
+    if snapshot is not None:
+        # Access level, filters and deliverability are evaluated as one vectorized mask
+        db_mask = snapshot.filter_mask(principal_access_level, filters)
+        if platforms is not None:
+            db_mask &= snapshot.deliverable_mask(platforms)
+        db_segments = snapshot.search(signal_spec, mask=db_mask, limit=max_results or 10)
         
-        if filters.min_coverage_percentage:
-            query += " AND coverage_percentage >= ?"
-            params.append(filters.min_coverage_percentage)
-    
-    # Apply flexible text matching on name and description
-    if signal_spec:
-        # Split the spec into individual words for better matching
-        words = signal_spec.lower().split()
-        word_conditions = []
-        for word in words:
-            word_conditions.append("(LOWER(name) LIKE ? OR LOWER(description) LIKE ?)")
-            word_pattern = f"%{word}%"
-            params.extend([word_pattern, word_pattern])
+        # Taxonomy expansion: a spec naming a category ("Automotive") pulls in
+        # the segments of its whole subtree, not just names repeating the word
+        if taxonomy_config.get('enabled', True):
+            seen_ids = {segment['id'] for segment in db_segments}
+            taxonomy_segments, taxonomy_nodes = snapshot.taxonomy_search(
+                signal_spec,
+                mask=db_mask,
+                limit=taxonomy_config.get('max_expanded_segments', 100)
+            )
+            for segment in taxonomy_segments:
+                if segment['id'] not in seen_ids:
+                    db_segments.append(segment)
+                    seen_ids.add(segment['id'])
+            for node in taxonomy_nodes:
+                summary = snapshot.taxonomy.summarize(
+                    node, db_mask, depth=taxonomy_config.get('summary_depth', 1)
+                )
+                if summary:
+                    taxonomy_summaries.append(TaxonomyNodeSummary(**summary))
         
-        if word_conditions:
-            # Use OR to match any of the words
-            query += " AND (" + " OR ".join(word_conditions) + ")"
-    
-    query += f" ORDER BY coverage_percentage DESC LIMIT ?"
-    params.append(max_results or 10)
-    
-    cursor.execute(query, params)
-    db_segments = [dict(row) for row in cursor.fetchall()]
+        # Semantic recall stage: add segments that are close in embedding space
+        # but share no keywords with the spec, so the ranker gets to see them
+        if snapshot.vectors is not None:
+            seen_ids = {segment['id'] for segment in db_segments}
+            for segment in snapshot.semantic_search(
+                signal_spec,
+                k=semantic_config.get('top_k', 20),
+                min_similarity=semantic_config.get('min_similarity', 0.15),
+                mask=db_mask
+            ):
+                if segment['id'] not in seen_ids:
+                    db_segments.append(segment)
+                    seen_ids.add(segment['id'])
+    else:
+        db_segments = search_segments_db(
+            cursor, signal_spec, principal_access_level, filters, max_results or 10, platforms
+        )
     
     # Get segments from platform adapters
     platform_segments = []
@@ -507,170 +1378,79 @@ def get_signals(
     except Exception as e:
         console.print(f"[yellow]Platform adapter error: {e}[/yellow]")
     
+    # Adapter segments go through the same access and filter checks
+    if platform_segments:
+        platform_columns = ColumnarSegments(platform_segments)
+        platform_segments = platform_columns.select(
+            platform_segments, platform_columns.mask(principal_access_level, filters)
+        )
+        platform_segments = [
+            segment for segment in platform_segments
+            if deployment_matches(segment['platform'], segment.get('account_id'), platforms)
+        ]
+    
     # Combine database and platform segments
     all_segments = db_segments + platform_segments
     
-    # Use AI to rank segments by relevance to the signal spec
-    ranked_segments = rank_signals_with_ai(signal_spec, all_segments, max_results or 10)
-    
-    signals = []
-    for segment in ranked_segments:
-        platform_deployments = []
-        
-        # Handle platform adapter segments differently than database segments
-        if segment.get('platform'):
-            # This is a platform adapter segment
-            platform_name = segment['platform']
-            account_id = segment.get('account_id')
-            
-            # Check if this platform was requested
-            if isinstance(deliver_to.platforms, str) and deliver_to.platforms == "all":
-                # Include all platforms
-                include_platform = True
-            else:
-                # Check if this platform is in the requested list
-                requested_platforms = set()
-                for p in deliver_to.platforms:
-                    if hasattr(p, 'platform'):  # PlatformSpecification object
-                        requested_platforms.add(p.platform)
-                    elif isinstance(p, dict):  # Legacy dict format
-                        requested_platforms.add(p.get('platform'))
-                    else:  # String format
-                        requested_platforms.add(p)
-                include_platform = platform_name in requested_platforms
-            
-            if include_platform:
-                # Create a deployment record for the platform segment
-                platform_deployments = [PlatformDeployment(
-                    signals_agent_segment_id=segment['id'],
-                    platform=platform_name,
-                    account=account_id,
-                    decisioning_platform_segment_id=segment.get('platform_segment_id', segment['id']),
-                    scope="account-specific" if account_id else "platform-wide",
-                    is_live=True,  # Platform adapter segments are assumed live
-                    deployed_at=datetime.now().isoformat(),
-                    estimated_activation_duration_minutes=15
-                )]
-        else:
-            # This is a database segment - get platform deployments as before
-            cursor.execute("""
-                SELECT * FROM platform_deployments 
-                WHERE signals_agent_segment_id = ?
-            """, (segment['id'],))
-            deployments = [dict(row) for row in cursor.fetchall()]
-            
-            # Filter deployments based on requested platforms
-            if isinstance(deliver_to.platforms, str) and deliver_to.platforms == "all":
-                # Return all deployments
-                platform_deployments = [PlatformDeployment(**dep) for dep in deployments]
-            else:
-                # Filter deployments by requested platforms
-                requested_platforms = set()
-                for p in deliver_to.platforms:
-                    if hasattr(p, 'platform'):  # PlatformSpecification object
-                        requested_platforms.add(p.platform)
-                    elif isinstance(p, dict):  # Legacy dict format
-                        requested_platforms.add(p.get('platform'))
-                    else:  # String format
-                        requested_platforms.add(p)
-                platform_deployments = []
-                
-                for dep in deployments:
-                    if dep['platform'] in requested_platforms:
-                        platform_deployments.append(PlatformDeployment(**dep))
+    if progressive:
+        # Phase one: the local ranking goes out right away; the AI ranking and
+        # proposals follow from a background refinement of the same context
+        ranked_segments = local_ranker.rank(signal_spec, all_segments, max_results or 10)
+        signals = assemble_signals(ranked_segments, platforms, snapshot, cursor, entitlements)
+        conn.close()
         
-        if platform_deployments:
-            # Check for custom pricing for this principal
-            cpm = segment['base_cpm']
-            if principal_id and not segment.get('platform'):
-                # Only check database for custom pricing on database segments
-                cursor.execute("""
-                    SELECT custom_cpm FROM principal_segment_access 
-                    WHERE principal_id = ? AND signals_agent_segment_id = ? AND custom_cpm IS NOT NULL
-                """, (principal_id, segment['id']))
-                custom_pricing = cursor.fetchone()
-                if custom_pricing:
-                    cpm = custom_pricing['custom_cpm']
-            
-            signal = SignalResponse(
-                signals_agent_segment_id=segment['id'],
-                name=segment['name'],
-                description=segment['description'],
-                signal_type=segment.get('signal_type', segment.get('audience_type', 'audience')),
-                data_provider=segment['data_provider'],
-                coverage_percentage=segment['coverage_percentage'],
-                deployments=platform_deployments,
-                pricing=PricingModel(
-                    cpm=cpm,
-                    revenue_share_percentage=segment['revenue_share_percentage']
-                ),
-                has_coverage_data=segment.get('has_coverage_data', True),  # Database segments have coverage
-                has_pricing_data=segment.get('has_pricing_data', True)  # Database segments have pricing
-            )
-            signals.append(signal)
+        context_id = generate_context_id()
+        signal_ids = [signal.signals_agent_segment_id for signal in signals]
+        response = build_discovery_response(
+            context_id, signal_spec, signals, [], taxonomy_summaries, refinement_status="pending"
+        )
+        store_discovery_context(
+            context_id, signal_spec, principal_id, signal_ids, search_parameters, {"status": "pending"}, llm_calls,
+            remember_discovery_result(signal_spec, response)
+        )
+        discovery_refinements.start(context_id)
+        refinement_executor.submit(
+            refine_discovery, context_id, signal_spec, all_segments, max_results or 10,
+            platforms, snapshot, entitlements, taxonomy_summaries, cache_key, cache_version
+        )
+        return response
+    
+    # Use AI to rank segments by relevance to the signal spec
+    # Ranking and custom proposals are independent LLM calls, so they run
+    # concurrently (proposals only need candidate names). Ranking gets what is
+    # left of the request's latency budget before the local ranking is used.
+    llm_started = time.monotonic()
+    proposals_future = start_custom_proposals(signal_spec, all_segments[:max_results or 10])
+    ranked_segments, fell_back = rank_signals_with_ai(
+        signal_spec, all_segments, max_results or 10,
+        budget_seconds=llm_config.get('ranking_budget_seconds', 8) - (llm_started - discovery_started)
+    )
+    signals = assemble_signals(ranked_segments, platforms, snapshot, cursor, entitlements)
     
     # Generate custom segment proposals
     custom_proposals = []
-    if signals:  # Only generate proposals if we found some existing segments
-        proposal_data = generate_custom_segment_proposals(signal_spec, ranked_segments)
-        for proposal in proposal_data:
-            # Generate unique ID for custom segment
-            custom_id = f"custom_{len(custom_segments) + 1}_{hash(proposal['proposed_name']) % 10000}"
-            
-            # Store in memory for later activation
-            custom_segments[custom_id] = {
-                "id": custom_id,
-                "name": proposal['proposed_name'],
-                "description": f"Custom segment: {proposal.get('target_signals', proposal.get('target_audience', ''))}",
-                "signal_type": "custom",
-                "data_provider": "Custom AI Generated",
-                "coverage_percentage": proposal['estimated_coverage_percentage'],
-                "base_cpm": proposal['estimated_cpm'],
-                "revenue_share_percentage": 0.0,
-                "catalog_access": "personalized",
-                "creation_rationale": proposal['creation_rationale'],
-                "created_at": datetime.now().isoformat()
-            }
-            
-            # Add the custom ID to the proposal
-            proposal_with_id = CustomSegmentProposal(
-                **proposal,
-                custom_segment_id=custom_id
-            )
-            custom_proposals.append(proposal_with_id)
+    if signals and proposals_future:  # Only offer proposals if we found some existing segments
+        custom_proposals = register_custom_proposals(wait_for_llm(
+            proposals_future, llm_started, llm_config.get('proposals_timeout_seconds', 20),
+            [], "Custom segment proposal generation"
+        ))
     
     # Generate context ID
     context_id = generate_context_id()
     
-    # Store discovery context
-    signal_ids = [signal.signals_agent_segment_id for signal in signals]
-    search_parameters = {
-        "signal_spec": signal_spec,
-        "deliver_to": deliver_to.model_dump(),
-        "filters": filters.model_dump() if filters else None,
-        "max_results": max_results,
-        "principal_id": principal_id
-    }
-    store_discovery_context(context_id, signal_spec, principal_id, signal_ids, search_parameters)
-    
-    # Generate human-readable message
-    message = generate_discovery_message(signal_spec, signals, custom_proposals)
-    
-    # Check if clarification might help
-    clarification_needed = None
-    if len(signals) < 3 and not custom_proposals:
-        clarification_needed = "Consider being more specific about your target audience characteristics, such as demographics, interests, or behaviors."
-    elif len(signals) == 0:
-        clarification_needed = "No matching signals found. Try broadening your search terms or checking available platforms."
-    
     conn.close()
-    return GetSignalsResponse(
-        message=message,
-        context_id=context_id,
-        signals=signals,
-        custom_segment_proposals=custom_proposals if custom_proposals else None,
-        clarification_needed=clarification_needed
+    response = build_discovery_response(context_id, signal_spec, signals, custom_proposals, taxonomy_summaries)
+    
+    # Store discovery context, with the result that follow-ups are answered from
+    signal_ids = [signal.signals_agent_segment_id for signal in signals]
+    store_discovery_context(
+        context_id, signal_spec, principal_id, signal_ids, search_parameters, llm_calls=llm_calls,
+        result=remember_discovery_result(signal_spec, response)
     )
+    # A locally ranked response is not cached, so the next identical brief gets Gemini's ranking
+    if cache_key and not fell_back:
+        discovery_cache.put(cache_key, cache_version, response)
+    return response
 
 
 @mcp.tool
@@ -685,15 +1465,14 @@ def activate_signal(
     
     # Check if this is a custom segment
     if signals_agent_segment_id.startswith("custom_"):
-        if signals_agent_segment_id not in custom_segments:
+        segment = custom_segment_store.get(signals_agent_segment_id)
+        if segment is None:
             raise ValueError(f"Custom segment '{signals_agent_segment_id}' not found")
         
-        segment = custom_segments[signals_agent_segment_id]
-        
         # Check if already activated
         activation_key = f"{signals_agent_segment_id}_{platform}_{account or 'default'}"
-        if activation_key in segment_activations:
-            existing = segment_activations[activation_key]
+        existing = custom_segment_store.get_activation(activation_key)
+        if existing is not None:
             if existing.get('status') == 'deployed':
                 # Already deployed - return current status
                 activation_context_id = store_activation_context(context_id, signals_agent_segment_id, platform, account)
@@ -706,35 +1485,16 @@ def activate_signal(
                     context_id=activation_context_id
                 )
             elif existing.get('status') == 'activating':
-                # Check if enough time has passed to complete the activation
+                # Still activating; the activation scheduler marks it deployed
                 estimated_completion = datetime.fromisoformat(existing['estimated_completion'])
-                if datetime.now() >= estimated_completion:
-                    # Mark as deployed
-                    existing['status'] = 'deployed'
-                    existing['deployed_at'] = datetime.now().isoformat()
-                    segment_activations[activation_key] = existing
-                    
-                    console.print(f"[bold green]Custom segment '{signals_agent_segment_id}' is now live on {platform}[/bold green]")
-                    
-                    activation_context_id = store_activation_context(context_id, signals_agent_segment_id, platform, account)
-                    return ActivateSignalResponse(
-                        message=generate_activation_message(segment['name'], platform, "deployed"),
-                        decisioning_platform_segment_id=existing['decisioning_platform_segment_id'],
-                        estimated_activation_duration_minutes=0,
-                        status="deployed",
-                        deployed_at=datetime.now(),
-                        context_id=activation_context_id
-                    )
-                else:
-                    # Still activating
-                    remaining_minutes = int((estimated_completion - datetime.now()).total_seconds() / 60)
-                    return ActivateSignalResponse(
-                        message=generate_activation_message(segment['name'], platform, "activating", remaining_minutes),
-                        decisioning_platform_segment_id=existing['decisioning_platform_segment_id'],
-                        estimated_activation_duration_minutes=remaining_minutes,
-                        status="activating",
-                        context_id=existing.get('activation_context_id', context_id)
-                    )
+                remaining_minutes = max(0, int((estimated_completion - datetime.now()).total_seconds() / 60))
+                return ActivateSignalResponse(
+                    message=generate_activation_message(segment['name'], platform, "activating", remaining_minutes),
+                    decisioning_platform_segment_id=existing['decisioning_platform_segment_id'],
+                    estimated_activation_duration_minutes=remaining_minutes,
+                    status="activating",
+                    context_id=existing.get('activation_context_id', context_id)
+                )
         
         # Generate platform segment ID
         account_suffix = f"_{account}" if account else ""
@@ -744,7 +1504,7 @@ def activate_signal(
         activation_duration = 120  # Custom segments take longer to create
         
         # Store activation record
-        segment_activations[activation_key] = {
+        activation = {
             "signals_agent_segment_id": signals_agent_segment_id,
             "platform": platform,
             "account": account,
@@ -753,6 +1513,9 @@ def activate_signal(
             "activation_started_at": datetime.now().isoformat(),
             "estimated_completion": (datetime.now() + timedelta(minutes=activation_duration)).isoformat()
         }
+        custom_segment_store.put_activation(activation_key, signals_agent_segment_id, activation)
+        activation_scheduler.schedule("custom", signals_agent_segment_id, platform, account,
+                                      decisioning_platform_segment_id, activation_duration * 60)
         
         console.print(f"[bold cyan]Creating and activating custom segment '{segment['name']}' on {platform}[/bold cyan]")
         console.print(f"[dim]This involves building the segment from scratch, estimated duration: {activation_duration} minutes[/dim]")
@@ -780,17 +1543,9 @@ def activate_signal(
         raise ValueError(f"Signal segment '{signals_agent_segment_id}' not found")
     
     # Check principal access if specified
-    if principal_id:
-        cursor.execute("SELECT access_level FROM principals WHERE principal_id = ?", (principal_id,))
-        principal_row = cursor.fetchone()
-        if principal_row:
-            principal_access_level = principal_row['access_level']
-            
-            # Check if principal can access this segment
-            if segment['catalog_access'] == 'private' and principal_access_level != 'private':
-                raise ValueError(f"Principal '{principal_id}' does not have access to private segment '{signals_agent_segment_id}'")
-            elif segment['catalog_access'] == 'personalized' and principal_access_level == 'public':
-                raise ValueError(f"Principal '{principal_id}' does not have access to personalized segment '{signals_agent_segment_id}'")
+    entitlements = entitlement_cache.get(principal_id)
+    if entitlements.known and not entitlements.can_access(segment['catalog_access']):
+        raise ValueError(f"Principal '{principal_id}' does not have access to {segment['catalog_access']} segment '{signals_agent_segment_id}'")
     
     # Check if already activated
     cursor.execute("""
@@ -812,23 +1567,18 @@ def activate_signal(
                 deployed_at=datetime.fromisoformat(existing['deployed_at']) if existing['deployed_at'] else None,
                 context_id=activation_context_id
             )
-        else:
-            # Still activating - for demo purposes, immediately mark as deployed
-            cursor.execute("""
-                UPDATE platform_deployments 
-                SET is_live = 1, deployed_at = ?
-                WHERE signals_agent_segment_id = ? AND platform = ? AND account IS ?
-            """, (datetime.now().isoformat(), signals_agent_segment_id, platform, account))
-            conn.commit()
+        job = activation_scheduler.get(signals_agent_segment_id, platform, account)
+        if job is not None:
+            # Still activating; the activation scheduler marks it live
             conn.close()
-            
+            estimated_completion = job.created_at + existing['estimated_activation_duration_minutes'] * 60
+            remaining_minutes = max(0, int((estimated_completion - time.time()) / 60))
             activation_context_id = store_activation_context(context_id, signals_agent_segment_id, platform, account)
             return ActivateSignalResponse(
-                message=generate_activation_message(segment['name'], platform, "deployed"),
+                message=generate_activation_message(segment['name'], platform, "activating", remaining_minutes),
                 decisioning_platform_segment_id=existing['decisioning_platform_segment_id'],
-                estimated_activation_duration_minutes=0,
-                status="deployed",
-                deployed_at=datetime.now(),
+                estimated_activation_duration_minutes=remaining_minutes,
+                status="activating",
                 context_id=activation_context_id
             )
     
@@ -861,6 +1611,16 @@ def activate_signal(
     
     conn.commit()
     conn.close()
+    if catalog_store:
+        catalog_store.notify_write()
+    
+    # Platforms with an adapter are polled for the segment going live;
+    # elsewhere the activation completes after its estimated duration
+    first_check = activation_duration * 60
+    if adapter_manager.get_adapter(platform):
+        first_check = min(first_check, activation_config.get('status_poll_seconds', 60))
+    activation_scheduler.schedule("catalog", signals_agent_segment_id, platform, account,
+                                  decisioning_platform_segment_id, first_check)
     
     console.print(f"[bold green]Activating signal {signals_agent_segment_id} on {platform}[/bold green]")
     
@@ -877,4 +1637,10 @@ def activate_signal(
 
 if __name__ == "__main__":
     init_db()
+    entitlement_cache.warm()
+    activation_scheduler.start()
+    if proposal_store:
+        proposal_store.start(proposal_clusters_config.get('refresh_interval_seconds', 3600))
+    if context_retention_config.get('enabled', True):
+        context_retention.start(context_retention_config.get('interval_seconds', 300))
     mcp.run()
\ No newline at end of file
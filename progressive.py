@@ -0,0 +1,80 @@
+"""Tracking of background AI refinements for progressive discovery."""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+
+PENDING = {"status": "pending"}
+
+
+class Refinement:
+    """One context's refinement: pending until finish() stores its outcome."""
+
+    __slots__ = ("result", "finished_at", "_done")
+
+    def __init__(self):
+        self.result: Dict[str, Any] = PENDING
+        self.finished_at: Optional[float] = None
+        self._done = threading.Event()
+
+    def finish(self, result: Dict[str, Any]):
+        self.result = result
+        self.finished_at = time.monotonic()
+        self._done.set()
+
+    def wait(self, timeout: float) -> Dict[str, Any]:
+        self._done.wait(max(0.0, timeout))
+        return self.result
+
+
+class RefinementRegistry:
+    """Bounded in-process registry of refinements, for waiting subscribers.
+
+    The stored discovery context is the durable copy; this registry only lets
+    subscribers in the same process be woken the moment a refinement finishes.
+    Finished entries are dropped after ttl_seconds and the oldest entries once
+    max_entries is exceeded.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Refinement]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, context_id: str) -> Refinement:
+        """Register a pending refinement for context_id."""
+        refinement = Refinement()
+        with self._lock:
+            self._entries[context_id] = refinement
+            self._entries.move_to_end(context_id)
+            self._expire()
+        return refinement
+
+    def finish(self, context_id: str, result: Dict[str, Any]):
+        """Store the outcome of a refinement and wake its subscribers."""
+        with self._lock:
+            refinement = self._entries.get(context_id)
+            if refinement is None:
+                refinement = self._entries[context_id] = Refinement()
+                self._expire()
+        refinement.finish(result)
+
+    def wait(self, context_id: str, timeout: float = 0.0) -> Optional[Dict[str, Any]]:
+        """The refinement outcome, {"status": "pending"} if still running after
+        timeout, or None if context_id is not tracked by this process."""
+        with self._lock:
+            refinement = self._entries.get(context_id)
+        if refinement is None:
+            return None
+        return refinement.wait(timeout)
+
+    def _expire(self):
+        now = time.monotonic()
+        for context_id in [cid for cid, r in self._entries.items()
+                           if r.finished_at is not None and now - r.finished_at > self.ttl_seconds]:
+            del self._entries[context_id]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -0,0 +1,178 @@
+"""Compact, token-budgeted prompt construction for LLM ranking."""
+
+import math
+import re
+from typing import List, Dict, Any, Optional
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Rough characters-per-token ratio for English text and short identifiers
+CHARS_PER_TOKEN = 4
+
+SEGMENT_TABLE_HEADER = "id|name|description|coverage_pct|cpm"
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count without calling the model's tokenizer."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _cell(value: Any, max_chars: Optional[int] = None) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:g}"
+    text = " ".join(str(value).replace("|", "/").split())
+    if max_chars and len(text) > max_chars:
+        text = text[:max_chars - 1].rstrip() + "…"
+    return text
+
+
+def segment_row(segment: Dict[str, Any], description_chars: int) -> str:
+    """One pipe-separated table row for a segment."""
+    return "|".join([
+        _cell(segment.get("id")),
+        _cell(segment.get("name")),
+        _cell(segment.get("description"), description_chars),
+        _cell(segment.get("coverage_percentage")),
+        _cell(segment.get("base_cpm")),
+    ])
+
+
+def prescore_segments(signal_spec: str, segments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Order segments by local relevance to the spec.
+
+    Spec words matched (as prefixes) in the name count twice as much as words
+    matched in the description; semantic similarity from the recall stage is
+    added on top and coverage breaks ties. The sort is stable, so equally
+    scored segments keep their retrieval order.
+    """
+    words = set(TOKEN_PATTERN.findall((signal_spec or "").lower()))
+
+    def score(segment: Dict[str, Any]) -> tuple:
+        name_tokens = TOKEN_PATTERN.findall((segment.get("name") or "").lower())
+        description_tokens = TOKEN_PATTERN.findall((segment.get("description") or "").lower())
+        total = 0.0
+        for word in words:
+            if any(token.startswith(word) for token in name_tokens):
+                total += 2.0
+            elif any(token.startswith(word) for token in description_tokens):
+                total += 1.0
+        total += segment.get("semantic_similarity") or 0.0
+        return (-total, -(segment.get("coverage_percentage") or 0.0))
+
+    return sorted(segments, key=score)
+
+
+class RankingPrompt:
+    """A built prompt plus what went into it."""
+
+    def __init__(self, text: str, segments: List[Dict[str, Any]], dropped: int):
+        self.text = text
+        self.segments = segments
+        self.dropped = dropped
+        self.token_count = estimate_tokens(text)
+
+
+def build_ranking_prompt(template: str, signal_spec: str, segments: List[Dict[str, Any]],
+                         max_results: int, token_budget: int = 6000,
+                         description_chars: int = 160) -> RankingPrompt:
+    """Fill template with a compact segment table that fits the token budget.
+
+    template must contain {signal_spec}, {max_results} and {segment_table}.
+    Segments are pre-scored and added best first until the budget is reached;
+    at least one segment is always included.
+    """
+    base = template.format(signal_spec=signal_spec, max_results=max_results, segment_table="")
+    remaining = token_budget - estimate_tokens(base) - estimate_tokens(SEGMENT_TABLE_HEADER + "\n")
+
+    included = []
+    rows = [SEGMENT_TABLE_HEADER]
+    for segment in prescore_segments(signal_spec, segments):
+        row = segment_row(segment, description_chars)
+        cost = estimate_tokens(row + "\n")
+        if included and cost > remaining:
+            break
+        rows.append(row)
+        included.append(segment)
+        remaining -= cost
+
+    text = template.format(signal_spec=signal_spec, max_results=max_results, segment_table="\n".join(rows))
+    return RankingPrompt(text, included, len(segments) - len(included))
+
+
+def _row_ranges(rows: List[int]) -> str:
+    """Compress sorted row numbers into ranges, e.g. [1, 2, 3, 7] -> "1-3,7"."""
+    ranges = []
+    start = previous = rows[0]
+    for row in rows[1:] + [None]:
+        if row is not None and row == previous + 1:
+            previous = row
+            continue
+        ranges.append(f"{start}-{previous}" if previous > start else str(start))
+        if row is not None:
+            start = previous = row
+    return ",".join(ranges)
+
+
+class BatchRankingPrompt:
+    """A multi-query prompt plus the segments each query was shown."""
+
+    def __init__(self, text: str, query_segments: List[List[Dict[str, Any]]]):
+        self.text = text
+        self.query_segments = query_segments
+        self.token_count = estimate_tokens(text)
+
+
+def build_batch_ranking_prompt(template: str, queries: List[tuple], token_budget: int = 6000,
+                               description_chars: int = 160) -> BatchRankingPrompt:
+    """One prompt ranking several (signal_spec, segments, max_results) queries.
+
+    Candidates are merged into a single numbered table shared by all queries,
+    filled round-robin from each query's pre-scored list so every query gets
+    its best candidates in before the budget runs out. Each query lists the
+    rows it may choose from. template must contain {segment_table} and
+    {queries}.
+    """
+    base_tokens = estimate_tokens(template.format(segment_table="", queries=""))
+    query_lines_tokens = sum(estimate_tokens(f'Q{i}: "{spec}" (top {n}; rows )') + 8
+                             for i, (spec, _, n) in enumerate(queries, 1))
+    remaining = token_budget - base_tokens - query_lines_tokens - estimate_tokens("#|" + SEGMENT_TABLE_HEADER)
+
+    ranked = [prescore_segments(spec, segments) for spec, segments, _ in queries]
+    row_numbers: Dict[str, int] = {}
+    rows = ["#|" + SEGMENT_TABLE_HEADER]
+    query_rows: List[List[int]] = [[] for _ in queries]
+    query_segments: List[List[Dict[str, Any]]] = [[] for _ in queries]
+
+    position = 0
+    exhausted = False
+    while not exhausted:
+        exhausted = True
+        for q, candidates in enumerate(ranked):
+            if position >= len(candidates):
+                continue
+            exhausted = False
+            segment = candidates[position]
+            row = row_numbers.get(segment["id"])
+            if row is None:
+                line = f"{len(row_numbers) + 1}|{segment_row(segment, description_chars)}"
+                cost = estimate_tokens(line + "\n")
+                if row_numbers and cost > remaining:
+                    continue
+                remaining -= cost
+                row = row_numbers[segment["id"]] = len(row_numbers) + 1
+                rows.append(line)
+            if row not in query_rows[q]:
+                query_rows[q].append(row)
+                query_segments[q].append(segment)
+        position += 1
+
+    query_lines = []
+    for i, ((spec, _, max_results), numbers) in enumerate(zip(queries, query_rows), 1):
+        allowed = _row_ranges(sorted(numbers)) if numbers else "none"
+        query_lines.append(f'Q{i}: "{spec}" (top {max_results}; rows {allowed})')
+
+    text = template.format(segment_table="\n".join(rows), queries="\n".join(query_lines))
+    return BatchRankingPrompt(text, query_segments)
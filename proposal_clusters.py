@@ -0,0 +1,234 @@
+"""Precomputed custom segment proposals per catalog cluster.
+
+Similar briefs get near-identical proposals, so instead of asking the LLM on
+every discovery the catalog is clustered by taxonomy node (the first
+taxonomy_depth levels of the segment name) and proposals are generated per
+cluster by a background job. At query time the nearest cluster is the one
+holding most of the top-ranked candidates, and its stored proposals are
+served without an LLM call. Stale clusters are refreshed in the background.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Callable
+
+from database import create_cluster_proposals_table
+from taxonomy import taxonomy_path, TAXONOMY_SEPARATOR
+
+
+def cluster_key(name: str, depth: int = 1) -> str:
+    """Cluster of a segment: its taxonomy path cut to depth levels."""
+    path = taxonomy_path(name) or [name or ""]
+    return f" {TAXONOMY_SEPARATOR} ".join(path[:depth])
+
+
+def members_fingerprint(segment_ids: List[str]) -> str:
+    """Hash of a cluster's membership, to notice when it changes."""
+    return hashlib.sha1("\n".join(sorted(segment_ids)).encode("utf-8")).hexdigest()
+
+
+def nearest_cluster(segments: List[Dict[str, Any]], depth: int = 1) -> Optional[str]:
+    """Cluster holding most of the ranked candidates, weighting rank i by 1/(i+1)."""
+    votes: Dict[str, float] = defaultdict(float)
+    for i, segment in enumerate(segments):
+        votes[cluster_key(segment.get("name"), depth)] += 1.0 / (i + 1)
+    if not votes:
+        return None
+    return max(votes, key=votes.get)
+
+
+class ClusterProposalStore:
+    """Stored proposals per cluster, with background generation and refresh.
+
+    connect() opens a connection for the caller's thread.
+    generate(cluster_label, member_names) returns the proposals for a
+    cluster and raises on failure, in which case older proposals are kept.
+    Entries older than ttl_seconds, or whose cluster membership changed
+    since they were generated, are stale: they are still served, and a
+    refresh is queued when refresh_on_read is set.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], generate: Callable[[str, List[str]], List[Dict[str, Any]]],
+                 taxonomy_depth: int = 1, ttl_seconds: float = 7 * 86400,
+                 max_members_in_prompt: int = 20, max_clusters_per_run: int = 50,
+                 refresh_on_read: bool = True, max_workers: int = 2):
+        self.connect = connect
+        self.generate = generate
+        self.taxonomy_depth = taxonomy_depth
+        self.ttl_seconds = ttl_seconds
+        self.max_members_in_prompt = max_members_in_prompt
+        self.max_clusters_per_run = max_clusters_per_run
+        self.refresh_on_read = refresh_on_read
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._members: Dict[str, List[Dict[str, Any]]] = {}
+        self._inflight: set = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cluster-proposals")
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = self.connect()
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            if self._entries is not None:
+                return self._entries
+        entries = {}
+        conn = self._connect()
+        try:
+            create_cluster_proposals_table(conn.cursor())
+            conn.commit()
+            for row in conn.execute("SELECT * FROM cluster_proposals"):
+                entries[row["cluster_key"]] = {
+                    "proposals": json.loads(row["proposals"]),
+                    "fingerprint": row["members_fingerprint"],
+                    "generated_at": row["generated_at"],
+                }
+        finally:
+            conn.close()
+        with self._lock:
+            if self._entries is None:
+                self._entries = entries
+            return self._entries
+
+    def _is_stale(self, key: str, entry: Dict[str, Any]) -> bool:
+        if time.time() - entry["generated_at"] > self.ttl_seconds:
+            return True
+        members = self._members.get(key)
+        return members is not None and members_fingerprint([m["id"] for m in members]) != entry["fingerprint"]
+
+    def lookup(self, segments: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """Stored proposals for the nearest cluster of the ranked candidates, or None.
+
+        A missing cluster is queued for generation so later briefs hit it.
+        """
+        key = nearest_cluster(segments, self.taxonomy_depth)
+        if key is None:
+            return None
+        try:
+            entry = self._load().get(key)
+        except sqlite3.Error as e:
+            print(f"Cluster proposals unavailable: {e}")
+            return None
+
+        if entry is None:
+            members = self._members.get(key) or [
+                s for s in segments if cluster_key(s.get("name"), self.taxonomy_depth) == key
+            ]
+            self._queue(key, members)
+            return None
+        if self.refresh_on_read and self._is_stale(key, entry):
+            self._queue(key, self._members.get(key) or [
+                s for s in segments if cluster_key(s.get("name"), self.taxonomy_depth) == key
+            ])
+        return entry["proposals"]
+
+    def _queue(self, key: str, members: List[Dict[str, Any]]):
+        with self._lock:
+            if key in self._inflight:
+                return
+            self._inflight.add(key)
+        self._executor.submit(self._generate_cluster, key, members)
+
+    def _generate_cluster(self, key: str, members: List[Dict[str, Any]]) -> bool:
+        try:
+            names = [m.get("name") or "" for m in members[:self.max_members_in_prompt]]
+            proposals = self.generate(key, names)
+            if not isinstance(proposals, list):
+                raise ValueError("proposals reply is not a JSON array")
+            self.put(key, proposals, members_fingerprint([m["id"] for m in members]))
+            return True
+        except Exception as e:
+            print(f"Proposal generation for cluster '{key}' failed: {e}")
+            return False
+        finally:
+            with self._lock:
+                self._inflight.discard(key)
+
+    def put(self, key: str, proposals: List[Dict[str, Any]], fingerprint: str):
+        """Store proposals for a cluster."""
+        entries = self._load()
+        generated_at = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO cluster_proposals "
+                "(cluster_key, members_fingerprint, proposals, generated_at) VALUES (?, ?, ?, ?)",
+                (key, fingerprint, json.dumps(proposals), generated_at)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        with self._lock:
+            entries[key] = {"proposals": proposals, "fingerprint": fingerprint, "generated_at": generated_at}
+
+    def clusters(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Current catalog clusters (key -> member segments with id and name)."""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT id, name FROM signal_segments ORDER BY id").fetchall()
+        finally:
+            conn.close()
+        clusters: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for row in rows:
+            clusters[cluster_key(row["name"], self.taxonomy_depth)].append({"id": row["id"], "name": row["name"]})
+        return dict(clusters)
+
+    def refresh_all(self) -> int:
+        """Recluster the catalog and generate proposals for missing or stale clusters.
+
+        At most max_clusters_per_run clusters are generated per run, largest
+        first; returns how many were generated.
+        """
+        clusters = self.clusters()
+        entries = self._load()
+        with self._lock:
+            self._members = clusters
+        due = [
+            key for key in sorted(clusters, key=lambda k: -len(clusters[k]))
+            if key not in entries or self._is_stale(key, entries[key])
+        ][:self.max_clusters_per_run]
+
+        generated = 0
+        for key in due:
+            if self._stop.is_set():
+                break
+            with self._lock:
+                if key in self._inflight:
+                    continue
+                self._inflight.add(key)
+            generated += self._generate_cluster(key, clusters[key])
+        if due:
+            print(f"Cluster proposals: generated {generated} of {len(due)} due clusters ({len(clusters)} total)")
+        return generated
+
+    def start(self, interval_seconds: float = 3600):
+        """Run refresh_all now and then every interval_seconds on a daemon thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                try:
+                    self.refresh_all()
+                except Exception as e:
+                    print(f"Cluster proposal refresh failed: {e}")
+                self._stop.wait(interval_seconds)
+
+        self._thread = threading.Thread(target=run, name="cluster-proposals-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -0,0 +1,151 @@
+"""Signal rankers: local scoring, LLM ranking and a deadline-driven tier."""
+
+import contextvars
+import logging
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor, TimeoutError as FutureTimeoutError
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+from prompt_builder import build_ranking_prompt, prescore_segments
+
+
+logger = logging.getLogger(__name__)
+
+
+RANKING_PROMPT_TEMPLATE = """
+    You are an expert signals targeting analyst. A client has requested signals for: "{signal_spec}"
+
+    Here are available signal segments from various providers, including different signal types:
+    - Audience signals: demographic/behavioral targeting
+    - Contextual signals: content-based targeting
+    - Geographical signals: location-based targeting
+    - Temporal signals: time-based targeting
+    - Environmental signals: weather/events/conditions
+    - Bidding signals: custom bidding strategies
+
+    Available segments, one per line (pipe-separated, header first):
+{segment_table}
+
+    Please:
+    1. Rank these segments by relevance to the client's request (most relevant first)
+    2. Consider all signal types - the client may benefit from multiple types
+    3. Select the top {max_results} most relevant segments
+    4. For each selected segment, provide a brief explanation of why it matches the request
+
+    Return your response as a JSON array with this structure:
+    [
+      {{
+        "segment_id": "segment_id",
+        "relevance_score": 0.95,
+        "match_reason": "Brief explanation of why this segment matches the request"
+      }}
+    ]
+
+    Only include segments that have at least some relevance. If none are relevant, return an empty array.
+    """
+
+
+def apply_rankings(rankings: List[Dict[str, Any]], segments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Reorder segments as the LLM ranked them, attaching each match reason.
+
+    Ids the LLM invents or that are not among segments are ignored; the first
+    segment wins for duplicate ids.
+    """
+    segments_by_id = {segment["id"]: segment for segment in reversed(segments)}
+    ranked_segments = []
+    for ranking in rankings:
+        segment = segments_by_id.get(ranking.get("segment_id"))
+        if segment is not None:
+            segment_copy = segment.copy()
+            segment_copy["match_reason"] = ranking.get("match_reason", "Relevant to your query")
+            ranked_segments.append(segment_copy)
+    return ranked_segments
+
+
+class Ranker(ABC):
+    """Orders candidate segments by relevance to a signal spec."""
+
+    name = "ranker"
+
+    @abstractmethod
+    def rank(self, signal_spec: str, segments: List[Dict[str, Any]], max_results: int) -> List[Dict[str, Any]]:
+        """Return up to max_results segments, most relevant first."""
+
+
+class LocalRanker(Ranker):
+    """In-process ranking by keyword matches, semantic similarity and coverage."""
+
+    name = "local"
+
+    def rank(self, signal_spec: str, segments: List[Dict[str, Any]], max_results: int) -> List[Dict[str, Any]]:
+        return prescore_segments(signal_spec, segments)[:max_results]
+
+
+class LLMRanker(Ranker):
+    """Ranking by an LLM over a compact, token-budgeted prompt.
+
+    generate sends a prompt and returns the parsed JSON reply; errors are
+    raised so a TieredRanker can fall back.
+    """
+
+    name = "AI"
+
+    def __init__(self, generate: Callable[[str], Any], token_budget: int = 6000,
+                 description_chars: int = 160, template: str = RANKING_PROMPT_TEMPLATE):
+        self.generate = generate
+        self.token_budget = token_budget
+        self.description_chars = description_chars
+        self.template = template
+
+    def rank(self, signal_spec: str, segments: List[Dict[str, Any]], max_results: int) -> List[Dict[str, Any]]:
+        if not segments:
+            return []
+
+        prompt = build_ranking_prompt(
+            self.template, signal_spec, segments, max_results,
+            token_budget=self.token_budget, description_chars=self.description_chars
+        )
+        logger.debug("Ranking prompt: %d segments, ~%d tokens (%d over budget)",
+                     len(prompt.segments), prompt.token_count, prompt.dropped)
+
+        return apply_rankings(self.generate(prompt.text), prompt.segments)
+
+
+class TieredRanker(Ranker):
+    """Runs the primary ranker under a latency budget, falling back to a local tier.
+
+    The primary runs on executor; if it fails or has not answered within the
+    budget the fallback ranking is returned. A late primary call keeps running
+    in the background, so an LLM reply still lands in the response cache for
+    the next identical request.
+    """
+
+    def __init__(self, primary: Ranker, fallback: Ranker, executor: Executor, budget_seconds: float = 8.0):
+        self.primary = primary
+        self.fallback = fallback
+        self.executor = executor
+        self.budget_seconds = budget_seconds
+        self.name = f"{primary.name}+{fallback.name}"
+
+    def rank(self, signal_spec: str, segments: List[Dict[str, Any]], max_results: int,
+             budget_seconds: Optional[float] = None) -> List[Dict[str, Any]]:
+        return self.rank_with_tier(signal_spec, segments, max_results, budget_seconds)[0]
+
+    def rank_with_tier(self, signal_spec: str, segments: List[Dict[str, Any]], max_results: int,
+                       budget_seconds: Optional[float] = None) -> Tuple[List[Dict[str, Any]], bool]:
+        """Ranked segments and whether the fallback tier produced them."""
+        if not segments:
+            return [], False
+
+        budget = self.budget_seconds if budget_seconds is None else max(0.0, budget_seconds)
+        # The caller's context goes along, so its LLM call log sees the call
+        future = self.executor.submit(
+            contextvars.copy_context().run, self.primary.rank, signal_spec, segments, max_results
+        )
+        try:
+            return future.result(timeout=budget), False
+        except FutureTimeoutError:
+            print(f"{self.primary.name} ranking missed its {budget:.1f}s budget, using {self.fallback.name} ranking")
+        except Exception as e:
+            print(f"{self.primary.name} ranking failed ({e}), using {self.fallback.name} ranking")
+        return self.fallback.rank(signal_spec, segments, max_results), True
@@ -122,6 +122,17 @@ class CustomSegmentProposal(BaseModel):
     custom_segment_id: Optional[str] = None  # ID for activation
 
 
+class TaxonomyNodeSummary(BaseModel):
+    """Rollup of the matching segments under one taxonomy node."""
+    path: str
+    segment_count: int
+    min_coverage_percentage: Optional[float] = None
+    max_coverage_percentage: Optional[float] = None
+    min_cpm: Optional[float] = None
+    max_cpm: Optional[float] = None
+    children: List["TaxonomyNodeSummary"] = []
+
+
 class GetSignalsResponse(BaseModel):
     """Response from get_signals."""
     message: str = Field(
@@ -130,10 +141,19 @@ class GetSignalsResponse(BaseModel):
     )
     context_id: str = Field(
         ...,
-        description="Unique identifier for this discovery session (format: ctx_<timestamp>_<random>)"
+        description="Unique identifier for this discovery session (format: ctx_ followed by 26 time-ordered base32 characters)"
     )
     signals: List[SignalResponse]
     custom_segment_proposals: Optional[List[CustomSegmentProposal]] = None
+    taxonomy: Optional[List[TaxonomyNodeSummary]] = Field(
+        None,
+        description="Taxonomy nodes matched by the spec, with segment counts and coverage/CPM ranges"
+    )
+    refinement_status: Optional[str] = Field(
+        None,
+        description="Progressive discovery only: 'pending' while the AI ranking and proposals are "
+                    "being produced, 'completed' once they are stored under the context_id"
+    )
     clarification_needed: Optional[str] = Field(
         None,
         description="Indicates if additional clarification would improve results"
@@ -0,0 +1,245 @@
+"""Taxonomy trie over hierarchical segment names.
+
+Peer39 / Index Exchange segment names encode a hierarchy with ':' separators
+("Automotive : Manufacturers : BMW"). The trie turns that into nodes with
+coverage/CPM rollups and cached subtree row arrays: resolving "Automotive"
+to all of its segments costs one dict lookup per path level plus the cached
+array of its subtree.
+"""
+
+import re
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+
+TAXONOMY_SEPARATOR = ":"
+LABEL_TOKEN_PATTERN = re.compile(r"\w+")
+
+# Longest label (in words) matched against a query, e.g. "arts and entertainment"
+MAX_LABEL_WORDS = 4
+
+
+def taxonomy_path(name: str) -> List[str]:
+    """Split a segment name into its taxonomy path."""
+    return [part.strip() for part in (name or "").split(TAXONOMY_SEPARATOR) if part.strip()]
+
+
+def normalize_label(label: str) -> str:
+    """Lowercase word form of a label used for lookups."""
+    return " ".join(LABEL_TOKEN_PATTERN.findall(label.lower()))
+
+
+class TaxonomyNode:
+    """One node of the taxonomy with its cached subtree rows.
+
+    A node is never changed once its trie is published; a trie made by
+    TaxonomyTrie.copy() replaces the nodes on the paths it changes.
+    """
+
+    __slots__ = ("label", "path", "depth", "children", "rows", "_subtree")
+
+    def __init__(self, label: str, path: List[str]):
+        self.label = label
+        self.path = path
+        self.depth = len(path)
+        self.children: Dict[str, "TaxonomyNode"] = {}
+        self.rows: List[int] = []  # segments named exactly by this node's path
+        self._subtree: Optional[np.ndarray] = None
+
+    @property
+    def path_name(self) -> str:
+        return f" {TAXONOMY_SEPARATOR} ".join(self.path)
+
+    def child_nodes(self) -> List["TaxonomyNode"]:
+        """Children in label order."""
+        return [child for _, child in sorted(self.children.items())]
+
+    def subtree(self) -> np.ndarray:
+        """Rows of the whole subtree, computed once."""
+        if self._subtree is None:
+            parts = [np.array(self.rows, dtype=np.int64)] + [child.subtree() for child in self.child_nodes()]
+            self._subtree = np.concatenate(parts)
+        return self._subtree
+
+    @property
+    def segment_count(self) -> int:
+        return len(self.subtree())
+
+
+def _range(values: np.ndarray):
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return None, None
+    return float(values.min()), float(values.max())
+
+
+class TaxonomyTrie:
+    """Trie of segment name paths with per-node coverage and CPM rollups.
+
+    Rows are indices into the arrays the trie was built from (the catalog
+    snapshot order), so masks from the columnar view apply directly. A
+    published trie is never changed: copy() shares every node, and add and
+    remove on the copy replace the nodes along the changed path, so an
+    update costs one pass down its path and readers of the old trie keep
+    seeing the old rows.
+    """
+
+    def __init__(self, names: List[str], coverage: np.ndarray, cpm: np.ndarray):
+        self.root = TaxonomyNode("", [])
+        self.coverage = coverage
+        self.cpm = cpm
+        self.labels: Dict[str, List[TaxonomyNode]] = {}
+        self._owned = None  # nodes this copy may change; None while building
+
+        for row, name in enumerate(names):
+            self._path_to(name)[-1].rows.append(row)
+
+    def copy(self, coverage: np.ndarray, cpm: np.ndarray) -> "TaxonomyTrie":
+        """Trie sharing this one's nodes, over new coverage/CPM arrays, to apply changes to."""
+        trie = TaxonomyTrie([], coverage, cpm)
+        trie.root = self.root
+        trie.labels = dict(self.labels)
+        trie._owned = set()
+        return trie
+
+    def _own(self, node: TaxonomyNode, key: Optional[str]) -> TaxonomyNode:
+        """Return a copy of node this trie can change, swapping it into labels."""
+        if self._owned is None or node in self._owned:
+            return node
+        copied = TaxonomyNode(node.label, node.path)
+        copied.children = dict(node.children)
+        copied.rows = list(node.rows)
+        self._owned.add(copied)
+        if key is not None:
+            self.labels[key] = [copied if other is node else other for other in self.labels[key]]
+        return copied
+
+    def _path_to(self, name: str) -> List[TaxonomyNode]:
+        """Changeable nodes from the root down to name's node, creating missing ones."""
+        node = self.root = self._own(self.root, None)
+        path = [node]
+        for label in taxonomy_path(name):
+            key = normalize_label(label)
+            child = node.children.get(key)
+            if child is None:
+                child = TaxonomyNode(label, node.path + [label])
+                if self._owned is not None:
+                    self._owned.add(child)
+                # Kept in path order so matches do not depend on the order segments arrived in
+                self.labels[key] = sorted(self.labels.get(key, []) + [child],
+                                          key=lambda other: [normalize_label(part) for part in other.path])
+            else:
+                child = self._own(child, key)
+            node.children[key] = child
+            node = child
+            path.append(node)
+        return path
+
+    def add(self, row: int, name: str):
+        """Add a segment row under its name's path."""
+        self._path_to(name)[-1].rows.append(row)
+
+    def remove(self, row: int, name: str):
+        """Remove a segment row; nodes left without segments are pruned."""
+        node = self.find(taxonomy_path(name))
+        if node is None or row not in node.rows:
+            return
+        path = self._path_to(name)
+        node = path.pop()
+        node.rows = [other for other in node.rows if other != row]
+        while path and not node.rows and not node.children:
+            key = normalize_label(node.label)
+            del path[-1].children[key]
+            remaining = [other for other in self.labels.get(key, []) if other is not node]
+            if remaining:
+                self.labels[key] = remaining
+            else:
+                self.labels.pop(key, None)
+            node = path.pop()
+
+    def find(self, path) -> Optional[TaxonomyNode]:
+        """Look up a node by path ("A : B" or ["A", "B"]) in O(depth)."""
+        parts = taxonomy_path(path) if isinstance(path, str) else path
+        node = self.root
+        for label in parts:
+            node = node.children.get(normalize_label(label))
+            if node is None:
+                return None
+        return node
+
+    def find_prefix(self, prefix: str) -> List[TaxonomyNode]:
+        """Nodes whose path starts with prefix; the last level may be partial."""
+        parts = taxonomy_path(prefix)
+        if not parts:
+            return self.root.child_nodes()
+        parent = self.find(parts[:-1])
+        if parent is None:
+            return []
+        fragment = normalize_label(parts[-1])
+        return [child for key, child in sorted(parent.children.items()) if key.startswith(fragment)]
+
+    def subtree_rows(self, node: TaxonomyNode, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Rows of every segment in node's subtree, optionally masked.
+
+        Rows added after the mask was computed are not in it and are skipped.
+        """
+        rows = node.subtree()
+        if mask is not None:
+            rows = rows[rows < len(mask)]
+            rows = rows[mask[rows]]
+        return rows
+
+    def expand(self, node: TaxonomyNode) -> List[TaxonomyNode]:
+        """Direct children of a matched node."""
+        return node.child_nodes()
+
+    def match(self, text: str) -> List[TaxonomyNode]:
+        """Nodes whose label appears in text, outermost first.
+
+        Nodes under another matched node are dropped since the ancestor's
+        subtree already covers them.
+        """
+        words = LABEL_TOKEN_PATTERN.findall((text or "").lower())
+        matched: List[TaxonomyNode] = []
+        for size in range(min(MAX_LABEL_WORDS, len(words)), 0, -1):
+            for i in range(len(words) - size + 1):
+                matched.extend(self.labels.get(" ".join(words[i:i + size]), []))
+
+        matched.sort(key=lambda node: node.depth)
+        outermost: List[TaxonomyNode] = []
+        for node in matched:
+            if any(node is other or node.path[:other.depth] == other.path for other in outermost):
+                continue
+            outermost.append(node)
+        return outermost
+
+    def summarize(self, node: TaxonomyNode, mask: Optional[np.ndarray] = None,
+                  depth: int = 1) -> Optional[Dict[str, Any]]:
+        """Compact rollup of a node and its children down to depth levels.
+
+        With a mask, counts and ranges only cover visible segments and empty
+        branches are left out.
+        """
+        rows = self.subtree_rows(node, mask)
+        if not len(rows):
+            return None
+
+        min_coverage, max_coverage = _range(self.coverage[rows])
+        min_cpm, max_cpm = _range(self.cpm[rows])
+        children = []
+        if depth > 0:
+            for child in node.child_nodes():
+                summary = self.summarize(child, mask, depth - 1)
+                if summary:
+                    children.append(summary)
+
+        return {
+            "path": node.path_name,
+            "segment_count": int(len(rows)),
+            "min_coverage_percentage": min_coverage,
+            "max_coverage_percentage": max_coverage,
+            "min_cpm": min_cpm,
+            "max_cpm": max_cpm,
+            "children": children,
+        }
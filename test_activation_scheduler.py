@@ -0,0 +1,119 @@
+"""Tests for the background activation scheduler."""
+
+import os
+import tempfile
+import time
+import unittest
+
+from activation_scheduler import ActivationScheduler
+from db_pool import ConnectionPool
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestActivationScheduler(unittest.TestCase):
+    """Test due-time ordering, polling, retries, persistence and claims."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, 'activations.db')
+        self.pool = ConnectionPool(self.db_path)
+        self.clock = FakeClock()
+        self.advanced = []
+        self.replies = {}
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def advance(self, job):
+        self.advanced.append(job.segment_id)
+        reply = self.replies.get(job.segment_id)
+        if isinstance(reply, list):
+            reply = reply.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    def scheduler(self, **kwargs):
+        return ActivationScheduler(self.pool.connect, self.advance, clock=self.clock, **kwargs)
+
+    def run_due(self, scheduler):
+        for future in scheduler.run_due():
+            future.result()
+
+    def test_jobs_run_only_when_due(self):
+        scheduler = self.scheduler()
+        scheduler.schedule("catalog", "late", "openx", None, "openx_late", 600)
+        scheduler.schedule("custom", "early", "openx", "acct", "openx_early_acct", 60)
+        self.run_due(scheduler)
+        self.assertEqual(self.advanced, [])
+
+        self.clock.now += 60
+        self.run_due(scheduler)
+        self.assertEqual(self.advanced, ["early"])
+        self.assertIsNone(scheduler.get("early", "openx", "acct"))
+        self.assertEqual(scheduler.get("late", "openx", None).due_at, 1600)
+        self.assertEqual(scheduler.pending(), 1)
+
+    def test_polling_and_retry_backoff(self):
+        scheduler = self.scheduler(retry_seconds=10)
+        self.replies["seg"] = [30, RuntimeError("platform down"), RuntimeError("platform down"), None]
+        scheduler.schedule("catalog", "seg", "liveramp", None, "lr_seg", 0)
+
+        for step in [0, 30, 10, 20]:
+            self.clock.now += step
+            self.run_due(scheduler)
+        self.assertEqual(len(self.advanced), 4)
+        self.assertIsNone(scheduler.get("seg", "liveramp", None))
+
+    def test_pending_jobs_survive_restart(self):
+        self.scheduler().schedule("catalog", "seg", "openx", None, "openx_seg", 60)
+        self.clock.now += 60
+        restarted = self.scheduler()
+        restarted.reload()
+        self.run_due(restarted)
+        self.assertEqual(self.advanced, ["seg"])
+
+    def test_periodic_reload_reads_only_jobs_due_before_the_next_one(self):
+        other = self.scheduler()
+        other.schedule("catalog", "soon", "openx", None, "openx_soon", 30)
+        other.schedule("catalog", "later", "openx", None, "openx_later", 3600)
+        scheduler = self.scheduler()
+        scheduler.reload(until=self.clock.now + 60)
+        self.assertEqual(scheduler.pending(), 1)
+
+        self.clock.now += 3600
+        scheduler.reload(until=self.clock.now + 60)
+        self.run_due(scheduler)
+        self.assertEqual(sorted(self.advanced), ["later", "soon"])
+
+    def test_claimed_job_runs_once_across_schedulers(self):
+        first = self.scheduler()
+        first.schedule("catalog", "seg", "openx", None, "openx_seg", 0)
+        second = self.scheduler()
+        second.reload()
+        self.assertIsNotNone(second._claim("seg|openx|", self.clock.now))
+        self.run_due(first)
+        self.assertEqual(self.advanced, [])
+
+    def test_timer_thread_wakes_for_new_jobs(self):
+        scheduler = ActivationScheduler(self.pool.connect, self.advance)
+        scheduler.start()
+        try:
+            scheduler.schedule("custom", "seg", "openx", None, "openx_seg", 0.05)
+            deadline = time.monotonic() + 5
+            while not self.advanced and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            scheduler.stop()
+        self.assertEqual(self.advanced, ["seg"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,186 @@
+"""Tests for the in-memory catalog snapshot."""
+
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from datetime import datetime
+
+from catalog import CatalogSnapshot, CatalogStore
+from database import create_tables, insert_sample_data
+from schemas import SignalFilters
+
+
+class TestCatalogSnapshot(unittest.TestCase):
+    """Test inverted-index search and incremental snapshot updates."""
+
+    def setUp(self):
+        self.snapshot = CatalogSnapshot({
+            'auto': {'id': 'auto', 'name': 'Luxury Automotive', 'description': 'Car buyers',
+                     'coverage_percentage': 10.0},
+            'sports': {'id': 'sports', 'name': 'Sports Fans', 'description': 'Luxury seating buyers',
+                       'coverage_percentage': 40.0},
+        }, {})
+
+    def test_search_ranks_name_matches_above_description_matches(self):
+        results = self.snapshot.search("luxury")
+        self.assertEqual([s['id'] for s in results], ['auto', 'sports'])
+
+    def test_search_matches_word_prefixes(self):
+        self.assertEqual([s['id'] for s in self.snapshot.search("auto")], ['auto'])
+
+    def test_search_without_text_orders_by_coverage(self):
+        self.assertEqual([s['id'] for s in self.snapshot.search("")], ['sports', 'auto'])
+
+    def test_apply_changes_keeps_rows_and_leaves_old_snapshot_alone(self):
+        updated = self.snapshot.apply_changes(
+            [{'id': 'sports', 'name': 'Golf Fans', 'description': 'Golfers', 'coverage_percentage': 5.0},
+             {'id': 'news', 'name': 'News Readers', 'description': 'Daily news', 'coverage_percentage': 20.0}],
+            ['auto']
+        )
+        self.assertEqual([s['id'] for s in updated.search("golf")], ['sports'])
+        self.assertEqual(updated.search("luxury"), [])
+        self.assertEqual([s['id'] for s in updated.search("")], ['news', 'sports'])
+        self.assertNotIn('luxury', updated.vocabulary)
+        # Rows never move: the deleted segment is tombstoned and the new one appended
+        self.assertEqual((updated.positions['news'], updated.count, self.snapshot.count), (2, 3, 2))
+
+        # The published snapshot still answers from the old catalog
+        self.assertEqual(len(self.snapshot.filter_mask('public')), 2)
+        self.assertEqual([s['id'] for s in self.snapshot.search("luxury")], ['auto', 'sports'])
+        self.assertEqual(self.snapshot.search("golf"), [])
+        self.assertEqual(self.snapshot.columns.coverage_percentage[1], 40.0)
+        self.assertEqual([n.path_name for n in self.snapshot.taxonomy.match("sports fans")], ["Sports Fans"])
+        self.assertIn('luxury', self.snapshot.vocabulary)
+        self.assertNotIn('news', self.snapshot.positions)
+
+        restored = updated.apply_changes(
+            [{'id': 'auto', 'name': 'Luxury Automotive', 'description': 'Car buyers', 'coverage_percentage': 10.0}],
+            []
+        )
+        self.assertEqual(restored.positions['auto'], 0)
+        self.assertEqual([s['id'] for s in restored.search("luxury")], ['auto'])
+
+
+class TestCatalogStore(unittest.TestCase):
+    """Test refreshing the snapshot from SQLite."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, 'catalog.db')
+        conn = sqlite3.connect(self.db_path)
+        create_tables(conn.cursor())
+        insert_sample_data(conn.cursor())
+        conn.commit()
+        conn.close()
+        self.store = CatalogStore(self.db_path, refresh_interval_seconds=0)
+
+    def tearDown(self):
+        self.store.stop()
+        self.tmpdir.cleanup()
+
+    def test_refresh_picks_up_writes_from_other_connections(self):
+        snapshot = self.store.snapshot()
+        self.assertIn('urban_millennials', snapshot.segments)
+
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            "UPDATE signal_segments SET name = 'Urban Anglers', updated_at = ? WHERE id = 'urban_millennials'",
+            (datetime.now().isoformat(),)
+        )
+        conn.execute("DELETE FROM platform_deployments WHERE signals_agent_segment_id = 'urban_millennials'")
+        conn.execute("DELETE FROM signal_segments WHERE id = 'prime_time_viewing'")
+        conn.commit()
+        conn.close()
+
+        refreshed = self.store.refresh()
+        self.assertIsNot(refreshed, snapshot)
+        self.assertEqual([s['id'] for s in refreshed.search("anglers")], ['urban_millennials'])
+        self.assertNotIn('prime_time_viewing', refreshed.segments)
+        self.assertEqual(refreshed.get_deployments('urban_millennials'), [])
+
+    def test_notify_write_refreshes_on_polling_thread(self):
+        store = CatalogStore(self.db_path, refresh_interval_seconds=60)
+        snapshot = store.snapshot()
+        self.assertIn(('the-trade-desk', None), [
+            (d['platform'], d['account']) for d in snapshot.get_deployments('sports_enthusiasts_public')
+        ])
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("DELETE FROM platform_deployments WHERE signals_agent_segment_id = 'sports_enthusiasts_public'")
+        conn.commit()
+        conn.close()
+
+        store.notify_write()
+        deadline = time.monotonic() + 5
+        while store._snapshot is snapshot and time.monotonic() < deadline:
+            time.sleep(0.01)
+        refreshed = store._snapshot
+        store.stop()
+        self.assertIsNot(refreshed, snapshot)
+        self.assertEqual(refreshed.get_deployments('sports_enthusiasts_public'), [])
+        row = refreshed.positions['sports_enthusiasts_public']
+        self.assertFalse(refreshed.deliverable_mask([('the-trade-desk', None)])[row])
+
+    def test_refresh_picks_up_updates_that_leave_updated_at_alone(self):
+        snapshot = self.store.snapshot()
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE signal_segments SET base_cpm = 9.99 WHERE id = 'urban_millennials'")
+        conn.commit()
+        touched = conn.execute("SELECT updated_at FROM signal_segments WHERE id = 'urban_millennials'").fetchone()[0]
+        self.assertGreater(touched, snapshot.segments['urban_millennials']['updated_at'])
+        self.assertEqual(self.store.refresh().segments['urban_millennials']['base_cpm'], 9.99)
+
+        # A write that moves updated_at backwards is not past the watermark; the store reloads fully
+        conn.execute("UPDATE signal_segments SET base_cpm = 1.25, updated_at = '2000-01-01T00:00:00' "
+                     "WHERE id = 'urban_millennials'")
+        conn.commit()
+        conn.close()
+        refreshed = self.store.refresh()
+        self.assertEqual(refreshed.segments['urban_millennials']['base_cpm'], 1.25)
+        self.assertEqual(snapshot.segments['urban_millennials']['base_cpm'], 4.0)
+
+    def test_refresh_without_changes_keeps_snapshot(self):
+        snapshot = self.store.snapshot()
+        self.assertIs(self.store.refresh(), snapshot)
+
+
+class TestCatalogFilterMask(unittest.TestCase):
+    """Test vectorized filtering through the snapshot."""
+
+    def test_mask_limits_keyword_and_browse_results(self):
+        snapshot = CatalogSnapshot({
+            'cheap': {'id': 'cheap', 'name': 'Sports Fans', 'description': '', 'catalog_access': 'public',
+                      'signal_type': 'audience', 'data_provider': 'Polk', 'base_cpm': 2.0,
+                      'coverage_percentage': 10.0},
+            'pricey': {'id': 'pricey', 'name': 'Sports Bettors', 'description': '', 'catalog_access': 'public',
+                       'signal_type': 'audience', 'data_provider': 'Polk', 'base_cpm': 9.0,
+                       'coverage_percentage': 20.0},
+        }, {})
+        mask = snapshot.filter_mask('public', SignalFilters(max_cpm=5.0))
+        self.assertEqual([s['id'] for s in snapshot.search("sports", mask=mask)], ['cheap'])
+        self.assertEqual([s['id'] for s in snapshot.search("", mask=mask)], ['cheap'])
+        self.assertEqual([s['id'] for s in snapshot.search("")], ['pricey', 'cheap'])
+
+    def test_deliverable_mask_matches_platform_and_account(self):
+        snapshot = CatalogSnapshot({
+            'wide': {'id': 'wide', 'name': 'A', 'description': ''},
+            'acct': {'id': 'acct', 'name': 'B', 'description': ''},
+            'none': {'id': 'none', 'name': 'C', 'description': ''},
+        }, {
+            'wide': [{'platform': 'openx', 'account': None}],
+            'acct': [{'platform': 'openx', 'account': '42'}],
+        })
+        self.assertEqual(snapshot.deliverable_mask([('openx', None)]).tolist(), [True, True, False])
+        self.assertEqual(snapshot.deliverable_mask([('openx', '7')]).tolist(), [True, False, False])
+        self.assertEqual(snapshot.deliverable_mask([('openx', '42')]).tolist(), [True, True, False])
+        self.assertEqual(snapshot.deliverable_mask([('pubmatic', None)]).tolist(), [False, False, False])
+
+        updated = snapshot.apply_changes([], [], {'wide': [], 'none': [{'platform': 'openx', 'account': None}]})
+        self.assertEqual(updated.deliverable_mask([('openx', '7')]).tolist(), [False, False, True])
+        self.assertEqual(snapshot.deliverable_mask([('openx', '7')]).tolist(), [True, False, False])
+        self.assertEqual(snapshot.get_deployments('wide'), [{'platform': 'openx', 'account': None}])
+
+
+if __name__ == "__main__":
+    unittest.main()
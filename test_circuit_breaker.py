@@ -0,0 +1,77 @@
+"""Tests for the LLM circuit breaker."""
+
+import unittest
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test tripping on errors and latency, and half-open probing."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(window_size=10, min_calls=4, failure_rate_threshold=0.5,
+                                      slow_call_seconds=2.0, slow_call_rate_threshold=0.75,
+                                      open_seconds=30, clock=self.clock)
+
+    def test_trips_on_error_rate(self):
+        for failed in [False, True, False]:
+            (self.breaker.record_failure if failed else self.breaker.record_success)(0.1)
+        self.assertEqual(self.breaker.state, "closed")
+        self.breaker.record_failure(0.1)
+        self.assertEqual(self.breaker.state, "open")
+        self.assertFalse(self.breaker.allow())
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.call(lambda: "unreachable")
+        self.assertEqual(self.breaker.stats()["rejected"], 2)
+
+    def test_trips_on_slow_calls(self):
+        for _ in range(3):
+            self.breaker.record_success(5.0)
+        self.breaker.record_success(0.1)
+        self.assertEqual(self.breaker.state, "open")
+
+    def test_half_open_probe_closes_or_reopens(self):
+        for _ in range(4):
+            self.breaker.record_failure(0.1)
+        self.clock.now += 30
+        self.assertEqual(self.breaker.state, "half_open")
+        self.assertFalse(self.breaker.is_open())
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())  # one probe at a time
+
+        self.clock.now += 0.1
+        self.breaker.record_failure(0.1)
+        self.assertEqual(self.breaker.state, "open")
+
+        self.clock.now += 30
+        self.assertEqual(self.breaker.call(lambda: "ok"), "ok")
+        self.assertEqual(self.breaker.state, "closed")
+        self.assertEqual(self.breaker.stats()["trips"], 2)
+
+    def test_calls_started_before_probing_are_ignored(self):
+        for _ in range(4):
+            self.breaker.record_failure(0.1)
+        self.clock.now += 31
+        self.breaker.record_failure(5.0)  # admitted before the circuit opened
+        self.assertEqual(self.breaker.state, "half_open")
+
+    def test_stuck_probe_frees_its_slot(self):
+        for _ in range(4):
+            self.breaker.record_failure(0.1)
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.clock.now += 31
+        self.assertTrue(self.breaker.allow())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+"""Tests for vectorized segment filtering."""
+
+import unittest
+
+import numpy as np
+
+from columnar import ColumnarSegments
+from schemas import SignalFilters
+
+
+SEGMENTS = [
+    {'id': 'db_public', 'catalog_access': 'public', 'signal_type': 'audience',
+     'data_provider': 'Polk', 'base_cpm': 3.5, 'coverage_percentage': 45.0},
+    {'id': 'db_personalized', 'catalog_access': 'personalized', 'signal_type': 'audience',
+     'data_provider': 'Experian', 'base_cpm': 8.75, 'coverage_percentage': 12.5},
+    {'id': 'ix_segment', 'catalog_access': 'personalized', 'audience_type': 'marketplace',
+     'data_provider': 'Index Exchange (Peer39)', 'base_cpm': 0.0, 'coverage_percentage': None,
+     'platform': 'index-exchange'},
+]
+
+
+class TestColumnarSegments(unittest.TestCase):
+    """Test the filter mask over DB and adapter segments."""
+
+    def setUp(self):
+        self.columns = ColumnarSegments(SEGMENTS)
+
+    def ids(self, mask):
+        return [SEGMENTS[i]['id'] for i in np.flatnonzero(mask)]
+
+    def test_access_level_gate(self):
+        self.assertEqual(self.ids(self.columns.mask('public')), ['db_public'])
+        self.assertEqual(len(self.ids(self.columns.mask('private'))), 3)
+
+    def test_categorical_filters_use_adapter_signal_type(self):
+        mask = self.columns.mask('personalized', SignalFilters(catalog_types=['marketplace']))
+        self.assertEqual(self.ids(mask), ['ix_segment'])
+        mask = self.columns.mask('personalized', SignalFilters(data_providers=['Polk', 'Unknown']))
+        self.assertEqual(self.ids(mask), ['db_public'])
+
+    def test_unknown_coverage_fails_coverage_filter(self):
+        mask = self.columns.mask('private', SignalFilters(max_cpm=5.0))
+        self.assertEqual(self.ids(mask), ['db_public', 'ix_segment'])
+        mask = self.columns.mask('private', SignalFilters(min_coverage_percentage=10.0))
+        self.assertEqual(self.ids(mask), ['db_public', 'db_personalized'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+"""Tests for context ids and expiry purging."""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime
+
+from context_retention import ContextRetention, new_context_id, context_id_timestamp
+from database import create_contexts_table, create_context_aliases_table
+
+
+DAY = 86400
+NOW = 1_780_000_000
+
+
+class TestContextIds(unittest.TestCase):
+    """Test ordering and timestamp parsing of context ids."""
+
+    def test_ids_are_time_ordered_and_unique(self):
+        ids = [new_context_id(NOW) for _ in range(1000)] + [new_context_id(NOW + 0.001)]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertTrue(all(len(context_id) == 30 for context_id in ids))
+
+    def test_timestamp_of_new_and_legacy_ids(self):
+        self.assertAlmostEqual(context_id_timestamp(new_context_id(NOW + 0.5)), NOW + 0.5, places=3)
+        self.assertEqual(context_id_timestamp("ctx_1700000000_ab12cd"), 1700000000)
+        self.assertIsNone(context_id_timestamp("ctx_test_123"))
+
+
+class TestContextRetention(unittest.TestCase):
+    """Test batched purging and dropping of expired period tables."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, 'contexts.db')
+        conn = self.connect()
+        create_contexts_table(conn.cursor())
+        conn.commit()
+        conn.close()
+        self.now = NOW
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def connect(self):
+        return sqlite3.connect(self.db_path, timeout=30.0)
+
+    def insert(self, table, context_id, created_at, ttl):
+        conn = self.connect()
+        conn.execute(f"""
+            INSERT INTO {table} (context_id, context_type, metadata, created_at, expires_at,
+                                 created_at_epoch, expires_at_epoch)
+            VALUES (?, 'discovery', '{{}}', '', '', ?, ?)
+        """, (context_id, created_at, created_at + ttl))
+        conn.commit()
+        conn.close()
+
+    def count(self, table="contexts"):
+        conn = self.connect()
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_purge_deletes_expired_in_batches(self):
+        retention = ContextRetention(self.connect, batch_size=7, pause_seconds=0, clock=lambda: self.now)
+        for i in range(30):
+            self.insert("contexts", f"ctx_{i}_old", NOW - 10 * DAY, 7 * DAY)
+        for i in range(5):
+            self.insert("contexts", f"ctx_{i}_new", NOW - DAY, 7 * DAY)
+        self.assertEqual(retention.purge_expired(), 30)
+        self.assertEqual(self.count(), 5)
+        self.assertEqual(retention.purge_expired(), 0)
+
+    def test_purge_deletes_expired_aliases(self):
+        conn = self.connect()
+        create_context_aliases_table(conn.cursor())
+        conn.executemany("INSERT INTO context_aliases (alias, context_id, expires_at_epoch) VALUES (?, ?, ?)",
+                         [("client-old", "ctx_1_old", NOW - DAY), ("client-new", "ctx_1_new", NOW + DAY)])
+        conn.commit()
+        conn.close()
+        retention = ContextRetention(self.connect, pause_seconds=0, clock=lambda: self.now)
+        self.assertEqual(retention.purge_expired(), 0)
+        self.assertEqual(self.count("context_aliases"), 1)
+
+    def test_epoch_columns_are_backfilled_on_old_tables(self):
+        legacy_path = os.path.join(self.tmpdir.name, 'legacy.db')
+        conn = sqlite3.connect(legacy_path)
+        conn.execute("""
+            CREATE TABLE contexts (context_id TEXT PRIMARY KEY, context_type TEXT NOT NULL,
+                parent_context_id TEXT, principal_id TEXT, metadata TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'completed', created_at TEXT NOT NULL,
+                completed_at TEXT, expires_at TEXT NOT NULL)
+        """)
+        conn.execute("""
+            INSERT INTO contexts (context_id, context_type, metadata, created_at, expires_at)
+            VALUES ('ctx_1', 'discovery', '{}', '2026-01-01T00:00:00', '2026-01-08T00:00:00.123456')
+        """)
+        create_contexts_table(conn.cursor())
+        row = conn.execute("SELECT created_at_epoch, expires_at_epoch FROM contexts").fetchone()
+        # Local time, as new rows get from datetime.timestamp()
+        created_at = int(datetime.fromisoformat('2026-01-01T00:00:00').timestamp())
+        self.assertEqual(row, (created_at, int(datetime.fromisoformat('2026-01-08T00:00:00.123456').timestamp())))
+        conn.close()
+
+    def test_partitions_route_new_ids_and_drop_when_expired(self):
+        retention = ContextRetention(self.connect, partition_days=7, pause_seconds=0, clock=lambda: self.now)
+        context_id = new_context_id(NOW)
+        table = retention.table_for(context_id)
+        self.assertRegex(table, r"^contexts_\d{8}$")
+        self.assertEqual(retention.table_for("ctx_1700000000_ab12cd"), "contexts")
+        self.insert(table, context_id, NOW, 30 * DAY)
+        self.assertEqual(self.connect().execute(f"PRAGMA foreign_key_list({table})").fetchall(), [])
+
+        self.now = NOW + 8 * DAY  # period over, but the context has not expired
+        self.assertEqual(retention.drop_expired_partitions(), [])
+        self.now = NOW + 31 * DAY
+        self.assertEqual(retention.run_once(), {"deleted": 0, "dropped_tables": 1})
+        self.assertEqual(retention.context_tables(self.connect()), ["contexts"])
+        # A later lookup recreates the (empty) period table rather than failing
+        self.assertEqual(retention.table_for(context_id), table)
+        self.assertEqual(self.count(table), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
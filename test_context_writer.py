@@ -0,0 +1,119 @@
+"""Tests for the group-commit context writer."""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from context_writer import ContextWriter
+
+
+INSERT = "INSERT INTO contexts (context_id, metadata) VALUES (?, ?)"
+
+
+class TestContextWriter(unittest.TestCase):
+    """Test grouping, read-your-writes, error isolation and flush on close."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, 'contexts.db')
+        conn = self.connect()
+        conn.execute("CREATE TABLE contexts (context_id TEXT PRIMARY KEY, metadata TEXT NOT NULL)")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def connect(self):
+        return sqlite3.connect(self.db_path, timeout=30.0)
+
+    def count(self):
+        conn = self.connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM contexts").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_concurrent_writes_share_commits(self):
+        writer = ContextWriter(self.connect, max_delay_ms=20)
+        barrier = threading.Barrier(8)
+
+        def request(i):
+            barrier.wait()
+            for j in range(25):
+                writer.submit(f"ctx_{i}_{j}", INSERT, (f"ctx_{i}_{j}", "{}"))
+
+        threads = [threading.Thread(target=request, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(writer.flush(timeout=10))
+        self.assertEqual(self.count(), 200)
+        stats = writer.stats()
+        self.assertEqual(stats["rows"], 200)
+        self.assertLess(stats["commits"], 50)
+        writer.close()
+
+    def test_read_your_writes(self):
+        writer = ContextWriter(self.connect, max_delay_ms=50)
+        writer.submit("ctx_1", INSERT, ("ctx_1", "{}"))
+        writer.submit("ctx_1", "UPDATE contexts SET metadata = ? WHERE context_id = ?", ('{"v": 2}', "ctx_1"))
+        self.assertTrue(writer.wait_for("ctx_1"))
+        conn = self.connect()
+        self.assertEqual(conn.execute("SELECT metadata FROM contexts").fetchone()[0], '{"v": 2}')
+        conn.close()
+        self.assertTrue(writer.wait_for("ctx_unknown", timeout=0))
+        writer.close()
+
+    def test_failed_write_does_not_drop_its_group(self):
+        writer = ContextWriter(self.connect, max_delay_ms=50)
+        first = writer.submit("a", INSERT, ("a", "{}"))
+        duplicate = writer.submit("a", INSERT, ("a", "{}"))
+        other = writer.submit("b", INSERT, ("b", "{}"))
+        self.assertIsNone(first.result(timeout=5))
+        self.assertIsInstance(duplicate.exception(timeout=5), sqlite3.IntegrityError)
+        self.assertIsNone(other.result(timeout=5))
+        self.assertEqual(self.count(), 2)
+        writer.close()
+
+    def test_close_flushes_queued_writes(self):
+        writer = ContextWriter(self.connect, max_delay_ms=1000, max_batch_rows=1000)
+        for i in range(10):
+            writer.submit(f"ctx_{i}", INSERT, (f"ctx_{i}", "{}"))
+        writer.close()
+        self.assertEqual(self.count(), 10)
+        with self.assertRaises(RuntimeError):
+            writer.submit("late", INSERT, ("late", "{}"))
+
+    def test_write_racing_close_is_committed(self):
+        writer = ContextWriter(self.connect, max_delay_ms=1)
+        writer.submit("ctx_first", INSERT, ("ctx_first", "{}")).result(timeout=5)
+        # Hold a submit between its closed check and its enqueue while close() runs
+        entered = threading.Event()
+        put = writer._queue.put
+
+        def slow_put(item):
+            entered.set()
+            time.sleep(0.1)
+            put(item)
+
+        writer._queue.put = slow_put
+        futures = []
+        submitter = threading.Thread(
+            target=lambda: futures.append(writer.submit("ctx_racing", INSERT, ("ctx_racing", "{}")))
+        )
+        submitter.start()
+        entered.wait(5)
+        writer.close()
+        submitter.join()
+        self.assertIsNone(futures[0].result(timeout=5))
+        self.assertTrue(writer.flush(timeout=1))
+        self.assertEqual(self.count(), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+"""Tests for the persistent custom segment store."""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import custom_segment_store
+from custom_segment_store import CustomSegmentStore, custom_segment_id
+from db_pool import ConnectionPool
+
+
+def segment(name, cpm=5.0, created_at="2025-01-01T00:00:00"):
+    return {"name": name, "description": "Custom segment: contexts", "coverage_percentage": 2.0,
+            "base_cpm": cpm, "created_at": created_at}
+
+
+class TestCustomSegmentStore(unittest.TestCase):
+    """Test dedup, persistence across instances, expiry and activations."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, 'custom.db')
+        self.pool = ConnectionPool(self.db_path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_identical_proposals_share_an_id(self):
+        self.assertEqual(custom_segment_id(segment("Pet  Owners")),
+                         custom_segment_id(segment("pet owners", created_at="2025-06-01T00:00:00")))
+        self.assertNotEqual(custom_segment_id(segment("Pet Owners")), custom_segment_id(segment("Pet Owners", 6.0)))
+
+        store = CustomSegmentStore(self.pool.connect)
+        first = store.add([segment("Pet Owners"), segment("Dog Walkers")])
+        second = store.add([segment("Pet Owners")])
+        self.assertEqual(second[0], first[0])
+        self.assertEqual(len(store), 2)
+        self.assertTrue(first[0].startswith("custom_"))
+
+    def test_visible_to_other_instances(self):
+        segment_id = CustomSegmentStore(self.pool.connect).add([segment("Pet Owners")])[0]
+        other = CustomSegmentStore(self.pool.connect)
+        self.assertEqual(other.get(segment_id)["name"], "Pet Owners")
+        self.assertEqual(other.get(segment_id)["id"], segment_id)
+        self.assertIsNone(other.get("custom_unknown"))
+
+    def test_expiry_spares_activated_segments(self):
+        store = CustomSegmentStore(self.pool.connect, ttl_seconds=60)
+        with patch.object(custom_segment_store.time, "time", return_value=1000.0):
+            stale, activated = store.add([segment("Stale"), segment("Activated")])
+            store.put_activation("key", activated, {"status": "activating"})
+        with patch.object(custom_segment_store.time, "time", return_value=1100.0):
+            self.assertIsNone(store.get(stale))
+            self.assertEqual(store.get(activated)["name"], "Activated")
+            conn = sqlite3.connect(self.db_path)
+            store._prune(conn, 1100.0)
+            conn.commit()
+            conn.close()
+        self.assertEqual(len(store), 1)
+
+    def test_size_cap_and_memory_bound(self):
+        store = CustomSegmentStore(self.pool.connect, max_entries=3, memory_entries=2)
+        for i in range(custom_segment_store.PRUNE_EVERY_WRITES):
+            with patch.object(custom_segment_store.time, "time", return_value=1000.0 + i):
+                store.add([segment(f"Segment {i}")])
+        self.assertEqual(len(store), 3)
+        self.assertEqual(len(store._memory), 2)
+
+    def test_activation_records(self):
+        store = CustomSegmentStore(self.pool.connect)
+        self.assertIsNone(store.get_activation("custom_x_ttd_default"))
+        store.put_activation("custom_x_ttd_default", "custom_x", {"status": "activating"})
+        store.put_activation("custom_x_ttd_default", "custom_x", {"status": "deployed"})
+        self.assertEqual(CustomSegmentStore(self.pool.connect).get_activation("custom_x_ttd_default"),
+                         {"status": "deployed"})
+
+
+if __name__ == "__main__":
+    unittest.main()
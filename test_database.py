@@ -0,0 +1,52 @@
+"""Tests for database schema helpers."""
+
+import sqlite3
+import unittest
+
+from database import (
+    create_tables, insert_sample_data, rebuild_segments_fts,
+    build_fts_match_query, SEGMENTS_FTS_TABLE
+)
+
+
+class TestSegmentsFullTextIndex(unittest.TestCase):
+    """Test the FTS5 index kept in sync with signal_segments."""
+
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.cursor = self.conn.cursor()
+        create_tables(self.cursor)
+        insert_sample_data(self.cursor)
+        rebuild_segments_fts(self.cursor)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def search(self, text):
+        self.cursor.execute(f"""
+            SELECT s.id FROM {SEGMENTS_FTS_TABLE}
+            JOIN signal_segments s ON s.rowid = {SEGMENTS_FTS_TABLE}.rowid
+            WHERE {SEGMENTS_FTS_TABLE} MATCH ?
+            ORDER BY bm25({SEGMENTS_FTS_TABLE}, 10.0, 1.0)
+        """, (build_fts_match_query(text),))
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def test_match_query_quotes_and_prefixes_words(self):
+        self.assertEqual(build_fts_match_query("Luxury cars, luxury"), '"luxury"* OR "cars"*')
+        self.assertIsNone(build_fts_match_query("  --  "))
+
+    def test_prefix_search_ranks_name_matches_first(self):
+        results = self.search("automotive")
+        self.assertEqual(set(results), {'luxury_auto_intenders', 'peer39_luxury_auto'})
+        self.assertIn('sports_enthusiasts_public', self.search("sport"))
+
+    def test_triggers_keep_index_in_sync(self):
+        self.cursor.execute("UPDATE signal_segments SET name = 'Anglers' WHERE id = 'urban_millennials'")
+        self.assertEqual(self.search("anglers"), ['urban_millennials'])
+
+        self.cursor.execute("DELETE FROM signal_segments WHERE id = 'urban_millennials'")
+        self.assertEqual(self.search("anglers"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
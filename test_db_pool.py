@@ -0,0 +1,93 @@
+"""Tests for the SQLite connection pool."""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from db_pool import ConnectionPool
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Test reuse, per-thread isolation, pragmas, rollback and health checks."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, 'pool.db')
+        self.pool = ConnectionPool(self.db_path)
+        conn = self.pool.connect()
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.pool.close_idle()
+        self.tmpdir.cleanup()
+
+    def test_close_returns_connection_for_reuse(self):
+        first = self.pool.connect()
+        first.close()
+        first.close()  # closing twice must not pool it twice
+        second = self.pool.connect()
+        third = self.pool.connect()  # nested use gets its own connection
+        self.assertIs(second, first)
+        self.assertIsNot(third, second)
+        second.close()
+        third.close()
+        self.assertEqual(self.pool.stats(), {"opened": 2, "reused": 2})
+
+    def test_pragmas_and_row_factory(self):
+        conn = self.pool.connect()
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)  # NORMAL
+        self.assertEqual(conn.execute("PRAGMA cache_size").fetchone()[0], -16000)
+        self.assertEqual(conn.execute("PRAGMA busy_timeout").fetchone()[0], 30000)
+        conn.execute("INSERT INTO items (name) VALUES ('a')")
+        conn.commit()
+        self.assertEqual(conn.execute("SELECT name FROM items").fetchone()["name"], "a")
+        conn.close()
+
+    def test_uncommitted_work_is_rolled_back(self):
+        conn = self.pool.connect()
+        conn.execute("INSERT INTO items (name) VALUES ('lost')")
+        conn.row_factory = None
+        conn.close()
+        conn = self.pool.connect()
+        self.assertFalse(conn.in_transaction)
+        self.assertIsInstance(conn.execute("SELECT COUNT(*) AS n FROM items").fetchone(), sqlite3.Row)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM items").fetchone()[0], 0)
+        conn.close()
+
+    def test_connections_stay_on_their_thread(self):
+        conn = self.pool.connect()
+        conn.close()
+        seen = []
+
+        def worker():
+            other = self.pool.connect()
+            seen.append(other)
+            other.execute("SELECT 1").fetchone()
+            other.close()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+        self.assertIsNot(seen[0], conn)
+
+    def test_stale_or_worn_connections_are_replaced(self):
+        pool = ConnectionPool(self.db_path, health_check_seconds=0, max_uses=2)
+        conn = pool.connect()
+        conn.close()
+        self.assertIs(pool.connect(), conn)  # health check passes
+        conn.close()
+        replacement = pool.connect()  # max_uses reached
+        self.assertIsNot(replacement, conn)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+        replacement.close()
+        pool.close_idle()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""Tests for the discovery result cache."""
+
+import sqlite3
+import unittest
+from unittest.mock import patch
+
+from database import create_tables, get_catalog_versions
+from discovery_cache import DiscoveryCache, discovery_cache_key
+from schemas import DeliverySpecification, PlatformSpecification, SignalFilters
+
+
+class TestDiscoveryCacheKey(unittest.TestCase):
+    """Test request canonicalization."""
+
+    def test_equivalent_requests_share_a_key(self):
+        first = discovery_cache_key(
+            "Luxury  car buyers",
+            DeliverySpecification(platforms=[PlatformSpecification(platform="openx"),
+                                             PlatformSpecification(platform="index-exchange", account="1")],
+                                  countries=["us", "CA"]),
+            SignalFilters(data_providers=["Polk", "Experian"]), 10, "public", None
+        )
+        second = discovery_cache_key(
+            "luxury car buyers",
+            DeliverySpecification(platforms=[PlatformSpecification(platform="index-exchange", account="1"),
+                                             PlatformSpecification(platform="openx")],
+                                  countries=["CA", "US"]),
+            SignalFilters(data_providers=["Experian", "Polk"]), 10, "public", None
+        )
+        self.assertEqual(first, second)
+
+    def test_access_level_and_principal_are_part_of_the_key(self):
+        deliver_to = DeliverySpecification(platforms="all")
+        keys = {
+            discovery_cache_key("sports", deliver_to, None, 10, "public", None),
+            discovery_cache_key("sports", deliver_to, None, 10, "private", None),
+            discovery_cache_key("sports", deliver_to, None, 10, "private", "acme_corp"),
+        }
+        self.assertEqual(len(keys), 3)
+
+
+class TestDiscoveryCache(unittest.TestCase):
+    """Test LRU eviction, TTL and version invalidation."""
+
+    def test_lru_eviction(self):
+        cache = DiscoveryCache(max_entries=2)
+        cache.put("a", 1, "A")
+        cache.put("b", 1, "B")
+        cache.get("a", 1)
+        cache.put("c", 1, "C")
+        self.assertEqual(cache.get("a", 1), "A")
+        self.assertIsNone(cache.get("b", 1))
+
+    def test_version_change_invalidates(self):
+        cache = DiscoveryCache()
+        cache.put("a", 1, "A")
+        self.assertIsNone(cache.get("a", 2))
+        self.assertIsNone(cache.get("a", 1))
+
+    def test_entries_expire(self):
+        cache = DiscoveryCache(ttl_seconds=10)
+        with patch("discovery_cache.time.monotonic", return_value=100.0):
+            cache.put("a", 1, "A")
+        with patch("discovery_cache.time.monotonic", return_value=105.0):
+            self.assertEqual(cache.get("a", 1), "A")
+        with patch("discovery_cache.time.monotonic", return_value=111.0):
+            self.assertIsNone(cache.get("a", 1))
+
+    def test_access_grants_bump_catalog_version(self):
+        conn = sqlite3.connect(":memory:")
+        cursor = conn.cursor()
+        create_tables(cursor)
+        before = get_catalog_versions(cursor)
+        cursor.execute("""
+            INSERT INTO principal_segment_access
+            (principal_id, signals_agent_segment_id, access_type, created_at)
+            VALUES ('acme_corp', 'sports', 'granted', '2025-01-01')
+        """)
+        after = get_catalog_versions(cursor)
+        self.assertEqual(after["principal_segment_access"], before["principal_segment_access"] + 1)
+        conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
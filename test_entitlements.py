@@ -0,0 +1,86 @@
+"""Tests for the principal entitlement cache."""
+
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from catalog import CatalogStore
+from database import create_tables, insert_sample_data
+from db_pool import ConnectionPool
+from entitlements import EntitlementCache
+
+
+class TestEntitlementCache(unittest.TestCase):
+    """Test loading, warm-up and invalidation of principal entitlements."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, 'entitlements.db')
+        self.pool = ConnectionPool(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        create_tables(conn.cursor())
+        insert_sample_data(conn.cursor())
+        conn.commit()
+        conn.close()
+        self.cache = EntitlementCache(self.pool.connect)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def execute(self, sql, params=()):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(sql, params)
+        conn.commit()
+        conn.close()
+
+    def test_loads_access_level_grants_and_pricing(self):
+        acme = self.cache.get('acme_corp')
+        self.assertTrue(acme.known)
+        self.assertEqual(acme.access_level, 'personalized')
+        self.assertEqual(acme.price('sports_enthusiasts_public', 3.5), 2.75)
+        self.assertEqual(acme.price('weather_based_targeting', 1.75), 1.75)
+
+    def test_unknown_principal_is_public(self):
+        unknown = self.cache.get('nobody')
+        self.assertFalse(unknown.known)
+        self.assertTrue(unknown.can_access('public'))
+        self.assertFalse(unknown.can_access('personalized'))
+
+    def test_cached_until_invalidated(self):
+        self.cache.get('acme_corp')
+        self.execute("UPDATE principals SET access_level = 'private' WHERE principal_id = 'acme_corp'")
+        self.assertEqual(self.cache.get('acme_corp').access_level, 'personalized')
+        self.cache.invalidate('acme_corp')
+        self.assertEqual(self.cache.get('acme_corp').access_level, 'private')
+
+    def test_warm_loads_every_principal(self):
+        self.assertEqual(self.cache.warm(), 5)
+        self.execute("DELETE FROM principals")
+        self.assertTrue(self.cache.get('auto_manufacturer').can_access('private'))
+
+    def test_catalog_store_changes_invalidate(self):
+        store = CatalogStore(self.db_path, refresh_interval_seconds=0)
+        store.add_listener(self.cache.on_catalog_change)
+        try:
+            store.snapshot()
+            self.assertEqual(self.cache.get('acme_corp').price('luxury_auto_intenders', 8.75), 6.5)
+            self.execute("UPDATE principal_segment_access SET custom_cpm = 2.0 "
+                         "WHERE principal_id = 'acme_corp' AND signals_agent_segment_id = 'luxury_auto_intenders'")
+            store.refresh()
+            self.assertEqual(self.cache.get('acme_corp').price('luxury_auto_intenders', 8.75), 2.0)
+        finally:
+            store.stop()
+
+    def test_version_check_invalidates_without_catalog_store(self):
+        cache = EntitlementCache(self.pool.connect, version_check_seconds=0.01)
+        self.assertEqual(cache.get('acme_corp').price('luxury_auto_intenders', 8.75), 6.5)
+        self.execute("UPDATE principal_segment_access SET custom_cpm = 2.0 "
+                     "WHERE principal_id = 'acme_corp' AND signals_agent_segment_id = 'luxury_auto_intenders'")
+        time.sleep(0.02)
+        self.assertEqual(cache.get('acme_corp').price('luxury_auto_intenders', 8.75), 2.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
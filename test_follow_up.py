@@ -0,0 +1,124 @@
+"""Tests for follow-up answers from stored discovery results."""
+
+import unittest
+
+from follow_up import (
+    CUSTOM_SEGMENTS, SIGNAL_DETAILS, DiscoveryResultStore,
+    classify_follow_up, compact_discovery_result, answer_follow_up
+)
+
+
+def signal(segment_id, name, cpm, live_on=(), pending_on=()):
+    deployments = [
+        {"platform": platform, "is_live": True, "scope": "platform-wide",
+         "estimated_activation_duration_minutes": None}
+        for platform in live_on
+    ] + [
+        {"platform": platform, "is_live": False, "scope": "platform-wide",
+         "estimated_activation_duration_minutes": 60}
+        for platform in pending_on
+    ]
+    return {
+        "signals_agent_segment_id": segment_id,
+        "name": name,
+        "description": f"{name} audience",
+        "signal_type": "marketplace",
+        "data_provider": "Polk",
+        "coverage_percentage": 45.0,
+        "deployments": deployments,
+        "pricing": {"cpm": cpm, "currency": "USD"},
+    }
+
+
+RESPONSE = {
+    "message": "Found 4 signals",
+    "context_id": "ctx_1",
+    "signals": [
+        signal("sports_public", "Sports Enthusiasts - Public", 3.5, live_on=["index-exchange"]),
+        signal("golf_fans", "Golf Fans", 4.0, pending_on=["the-trade-desk"]),
+        signal("runners", "Runners", 2.0),
+        signal("skiers", "Skiers", 2.5),
+    ],
+    "custom_segment_proposals": [{
+        "proposed_name": "Weekend Golfers",
+        "description": "Golf fans active on weekends",
+        "target_signals": "Golf Fans, Sports Enthusiasts",
+        "estimated_coverage_percentage": 8.0,
+        "estimated_cpm": 5.25,
+        "creation_rationale": "Combines golf interest with weekend activity",
+        "custom_segment_id": "custom_abc123",
+    }],
+}
+
+
+class TestFollowUp(unittest.TestCase):
+    """Test intent matching, compaction, answers and the result store."""
+
+    def test_classify_follow_up(self):
+        self.assertEqual(classify_follow_up("Tell me more about the custom segments"), CUSTOM_SEGMENTS)
+        self.assertEqual(classify_follow_up("what custom audiences are there?"), CUSTOM_SEGMENTS)
+        self.assertEqual(classify_follow_up("Can you tell me about Golf Fans?"), SIGNAL_DETAILS)
+        self.assertEqual(classify_follow_up("what about the second signal"), SIGNAL_DETAILS)
+        self.assertIsNone(classify_follow_up("sports audiences in the US"))
+        self.assertIsNone(classify_follow_up(None))
+
+    def test_compact_result_keeps_what_follow_ups_need(self):
+        result = compact_discovery_result("sports fans", RESPONSE)
+        self.assertEqual(result["signal_spec"], "sports fans")
+        self.assertEqual([s["id"] for s in result["signals"]], ["sports_public", "golf_fans", "runners", "skiers"])
+        golf = result["signals"][1]
+        self.assertEqual((golf["cpm"], golf["platforms"], golf["live"], golf["activation_minutes"]),
+                         (4.0, ["the-trade-desk"], [], 60))
+        self.assertEqual(result["custom_segment_proposals"][0]["id"], "custom_abc123")
+        self.assertEqual(golf["deployments"], RESPONSE["signals"][1]["deployments"])
+        self.assertEqual(golf["pricing"], {"cpm": 4.0, "currency": "USD"})
+
+    def test_signal_details_answer(self):
+        result = compact_discovery_result("sports fans", RESPONSE)
+        text = answer_follow_up(SIGNAL_DETAILS, result, "tell me more about golf fans")
+        self.assertIn("**Golf Fans** (ID: golf_fans)", text)
+        self.assertIn("$4.00 per thousand impressions", text)
+        self.assertIn("~60 minutes", text)
+        self.assertNotIn("Sports Enthusiasts", text)
+
+        text = answer_follow_up(SIGNAL_DETAILS, result, "more information please")
+        self.assertIn("Sports Enthusiasts - Public", text)
+        self.assertNotIn("Skiers", text)
+        self.assertIn("1 more signal matched", text)
+
+    def test_custom_segments_answer(self):
+        result = compact_discovery_result("sports fans", RESPONSE)
+        text = answer_follow_up(CUSTOM_SEGMENTS, result, "tell me about the custom segments")
+        self.assertIn("**Weekend Golfers** (ID: custom_abc123)", text)
+        self.assertIn("Estimated CPM: $5.25", text)
+
+        pending = compact_discovery_result("sports fans", dict(RESPONSE, custom_segment_proposals=None,
+                                                               refinement_status="pending"))
+        self.assertIn("still being generated", answer_follow_up(CUSTOM_SEGMENTS, pending, "custom segments?"))
+
+    def test_store_evicts_least_recently_used(self):
+        store = DiscoveryResultStore(max_entries=2)
+        store.put("ctx_a", {"n": 1})
+        store.put("ctx_b", {"n": 2})
+        self.assertEqual(store.get("ctx_a"), {"n": 1})
+        store.put("ctx_c", {"n": 3})
+        self.assertIsNone(store.get("ctx_b"))
+        self.assertEqual(store.get("ctx_a"), {"n": 1})
+
+    def test_client_context_id_follows_the_discovery(self):
+        store = DiscoveryResultStore()
+        store.link("client-ctx", "ctx_1")
+        self.assertEqual(store.resolve("client-ctx"), "ctx_1")
+        self.assertEqual(store.resolve("ctx_other"), "ctx_other")
+
+        store.put("ctx_1", compact_discovery_result("sports fans", dict(RESPONSE, custom_segment_proposals=None,
+                                                                         refinement_status="pending")))
+        self.assertEqual(store.get("client-ctx")["refinement_status"], "pending")
+        # The refined result replaces the first one under the discovery's id
+        store.put("ctx_1", compact_discovery_result("sports fans", RESPONSE))
+        text = answer_follow_up(CUSTOM_SEGMENTS, store.get("client-ctx"), "custom segments?")
+        self.assertIn("Weekend Golfers", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
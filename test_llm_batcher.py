@@ -0,0 +1,80 @@
+"""Tests for micro-batching of ranking requests."""
+
+import unittest
+
+from llm_batcher import BatchingLLMRanker
+from prompt_builder import build_batch_ranking_prompt
+
+
+AUTO = {'id': 'auto', 'name': 'Luxury Auto Intenders', 'description': 'Car buyers',
+        'coverage_percentage': 5.0, 'base_cpm': 8.75}
+WEATHER = {'id': 'weather', 'name': 'Weather Targeting', 'description': 'Rainy days',
+           'coverage_percentage': 50.0, 'base_cpm': 2.0}
+SPORTS = {'id': 'sports', 'name': 'Sports Fans', 'description': 'Game day viewers',
+          'coverage_percentage': 30.0, 'base_cpm': 3.0}
+
+
+class TestBatchPrompt(unittest.TestCase):
+    """Test the shared candidate table."""
+
+    def test_shared_rows_are_listed_once(self):
+        prompt = build_batch_ranking_prompt(
+            "{segment_table}\n{queries}",
+            [("luxury auto", [AUTO, WEATHER], 2), ("sports", [SPORTS, AUTO], 1)]
+        )
+        self.assertEqual(prompt.text.count("|Luxury Auto Intenders|"), 1)
+        self.assertIn('Q1: "luxury auto" (top 2; rows 1,3)', prompt.text)
+        self.assertIn('Q2: "sports" (top 1; rows 1-2)', prompt.text)
+        self.assertEqual([s['id'] for s in prompt.query_segments[1]], ['sports', 'auto'])
+
+
+class TestBatchingLLMRanker(unittest.TestCase):
+    """Test that concurrent requests share one LLM call."""
+
+    def test_concurrent_requests_are_batched_and_fanned_out(self):
+        prompts = []
+
+        def generate(prompt):
+            prompts.append(prompt)
+            return {
+                "Q1": [{"segment_id": "auto", "match_reason": "cars"}],
+                "Q2": [{"segment_id": "sports"}, {"segment_id": "weather"}],
+            }
+
+        ranker = BatchingLLMRanker(generate, window_seconds=0.5, max_batch_size=2)
+        first = ranker.submit("luxury auto", [AUTO, WEATHER], 5)
+        second = ranker.submit("sports", [SPORTS, AUTO], 1)
+        self.assertEqual([(s['id'], s['match_reason']) for s in first.result(5)], [('auto', 'cars')])
+        # weather is not among the second caller's candidates, and it asked for one result
+        self.assertEqual([s['id'] for s in second.result(5)], ['sports'])
+        self.assertEqual(len(prompts), 1)
+        ranker.stop()
+
+    def test_single_request_uses_single_query_prompt(self):
+        def generate(prompt):
+            self.assertNotIn("Q1", prompt)
+            return [{"segment_id": "weather"}]
+
+        ranker = BatchingLLMRanker(generate, window_seconds=0.001)
+        self.assertEqual([s['id'] for s in ranker.rank("rain", [AUTO, WEATHER], 1)], ['weather'])
+        ranker.stop()
+
+    def test_errors_reach_every_caller(self):
+        def generate(prompt):
+            raise ValueError("quota exceeded")
+
+        ranker = BatchingLLMRanker(generate, window_seconds=0.001)
+        with self.assertRaises(ValueError):
+            ranker.rank("rain", [WEATHER], 1)
+        ranker.stop()
+
+    def test_submit_after_stop_is_refused(self):
+        ranker = BatchingLLMRanker(lambda prompt: [{"segment_id": "weather"}], window_seconds=0.001)
+        self.assertEqual([s['id'] for s in ranker.rank("rain", [WEATHER], 1)], ['weather'])
+        ranker.stop()
+        with self.assertRaises(RuntimeError):
+            ranker.submit("rain", [WEATHER], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+"""Tests for the persistent LLM response cache."""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from db_pool import ConnectionPool
+from llm_cache import LLMResponseCache
+
+
+class TestLLMResponseCache(unittest.TestCase):
+    """Test persistence, expiry and size-based eviction."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, 'llm.db')
+        self.pool = ConnectionPool(self.db_path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_responses_survive_a_new_process(self):
+        LLMResponseCache(self.pool.connect).put("gemini", "rank these", '[{"segment_id": "a"}]')
+        cache = LLMResponseCache(self.pool.connect)
+        self.assertEqual(cache.get("gemini", "rank these"), '[{"segment_id": "a"}]')
+        self.assertIsNone(cache.get("other-model", "rank these"))
+        self.assertIsNone(cache.get("gemini", "rank these "))
+
+    def test_entries_expire(self):
+        cache = LLMResponseCache(self.pool.connect, ttl_seconds=60)
+        with patch("llm_cache.time.time", return_value=1000.0):
+            cache.put("gemini", "p", "r")
+        with patch("llm_cache.time.time", return_value=1030.0):
+            self.assertEqual(LLMResponseCache(self.pool.connect, ttl_seconds=60).get("gemini", "p"), "r")
+        with patch("llm_cache.time.time", return_value=1061.0):
+            self.assertIsNone(cache.get("gemini", "p"))
+            self.assertIsNone(LLMResponseCache(self.pool.connect, ttl_seconds=60).get("gemini", "p"))
+
+    def test_prune_keeps_newest_entries(self):
+        cache = LLMResponseCache(self.pool.connect, max_entries=3)
+        for i in range(5):
+            with patch("llm_cache.time.time", return_value=1000.0 + i):
+                cache.put("gemini", f"prompt {i}", f"reply {i}")
+        conn = cache._connect()
+        cache._prune(conn, 1005.0)
+        conn.commit()
+        conn.close()
+
+        conn = sqlite3.connect(self.db_path)
+        responses = sorted(row[0] for row in conn.execute("SELECT response FROM llm_cache"))
+        conn.close()
+        self.assertEqual(responses, ["reply 2", "reply 3", "reply 4"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+"""Tests for LLM call instrumentation."""
+
+import contextvars
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_metrics import Histogram, LLMMetrics, collect_calls, current_call_logs, attribute_calls
+
+
+class TestLLMMetrics(unittest.TestCase):
+    """Test histograms, outcome counts and per-request call logs."""
+
+    def test_histogram_buckets_and_quantiles(self):
+        histogram = Histogram((0.1, 1.0))
+        for value in [0.05, 0.1, 0.5, 3.0]:
+            histogram.observe(value)
+        self.assertEqual(histogram.cumulative(), [(0.1, 2), (1.0, 3), (float("inf"), 4)])
+        self.assertEqual(histogram.quantile(0.5), 0.1)
+        self.assertEqual(histogram.quantile(0.95), float("inf"))
+        self.assertIsNone(Histogram((1.0,)).quantile(0.5))
+
+    def test_outcomes_and_cache_hits(self):
+        metrics = LLMMetrics()
+        metrics.record("ranking", "ok", 0.3, 400, 100, 50, 12)
+        metrics.record("ranking", "cache_hit", 0.001, 400, 100, 50, 12)
+        metrics.record("ranking", "parse_error", 0.2, 400, 100, 9, 3, error="JSONDecodeError")
+
+        ranking = metrics.snapshot()["ranking"]
+        self.assertEqual(ranking["outcomes"]["ok"], 1)
+        self.assertEqual(ranking["outcomes"]["cache_hit"], 1)
+        self.assertEqual(ranking["outcomes"]["parse_error"], 1)
+        self.assertEqual(ranking["prompt_chars"], 1200)
+        # Cache hits stay out of the model latency histogram
+        self.assertEqual(metrics.latency["ranking"].count, 2)
+
+        text = metrics.prometheus()
+        self.assertIn('llm_calls_total{stage="ranking",outcome="ok"} 1', text)
+        self.assertIn('llm_call_latency_seconds_bucket{stage="ranking",le="0.25"} 1', text)
+        self.assertIn('llm_call_latency_seconds_count{stage="ranking"} 2', text)
+
+    def test_call_logs_follow_context_into_threads(self):
+        metrics = LLMMetrics()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            with collect_calls() as first:
+                executor.submit(contextvars.copy_context().run, metrics.record, "proposals", "ok", 0.1, 10, 3).result()
+                first_logs = current_call_logs()
+            with collect_calls() as second:
+                second_logs = current_call_logs()
+
+            def batched_call():
+                with attribute_calls([first_logs, second_logs], batch_size=2):
+                    metrics.record("ranking", "ok", 0.2, 10, 3)
+
+            executor.submit(batched_call).result()
+            # Outside any log, calls are only aggregated
+            executor.submit(metrics.record, "ranking", "ok", 0.2, 10, 3).result()
+
+        self.assertEqual([call["stage"] for call in first], ["proposals", "ranking"])
+        self.assertEqual(second, [first[1]])
+        self.assertEqual(second[0]["batch_size"], 2)
+        self.assertEqual(metrics.snapshot()["ranking"]["outcomes"]["ok"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
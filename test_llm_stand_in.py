@@ -0,0 +1,95 @@
+"""Tests for the local LLM stand-in."""
+
+import json
+import random
+import unittest
+
+from llm_batcher import BATCH_RANKING_PROMPT_TEMPLATE
+from llm_stand_in import LatencyDistribution, LocalStandInBackend, stand_in_reply
+from prompt_builder import build_batch_ranking_prompt, build_ranking_prompt, estimate_tokens
+from ranking import RANKING_PROMPT_TEMPLATE
+
+
+SEGMENTS = [
+    {"id": "auto_lux", "name": "Luxury Automotive", "description": "High-end car shoppers",
+     "coverage_percentage": 3.5, "base_cpm": 6.0},
+    {"id": "sports", "name": "Sports Enthusiasts", "description": "Live sports | scores",
+     "coverage_percentage": 12.0, "base_cpm": 3.0},
+    {"id": "travel", "name": "Travel Planners", "description": "Flights and hotels",
+     "coverage_percentage": 8.0, "base_cpm": 4.0},
+]
+
+
+class TestLLMStandIn(unittest.TestCase):
+    """Test schema-valid replies, seeded latency and failure injection."""
+
+    def backend(self, **kwargs):
+        self.sleeps = []
+        return LocalStandInBackend(latency=LatencyDistribution("lognormal", median_ms=200, sigma=0.5),
+                                   sleep=self.sleeps.append, **kwargs)
+
+    def test_replies_follow_prompt_schemas(self):
+        prompt = build_ranking_prompt(RANKING_PROMPT_TEMPLATE, "luxury cars", SEGMENTS, 2).text
+        rankings = stand_in_reply(prompt)
+        self.assertEqual([r["segment_id"] for r in rankings], ["auto_lux", "sports"])
+        self.assertGreater(rankings[0]["relevance_score"], rankings[1]["relevance_score"])
+
+        batch = build_batch_ranking_prompt(BATCH_RANKING_PROMPT_TEMPLATE, [
+            ("sports", SEGMENTS, 1), ("travel hotels", SEGMENTS[2:], 5)]).text
+        self.assertEqual({q: [r["segment_id"] for r in ranked] for q, ranked in stand_in_reply(batch).items()},
+                         {"Q1": ["sports"], "Q2": ["travel"]})
+
+        proposals = stand_in_reply('A client is looking for: "pet owners"\n'
+                                   'We found these existing Peer39 segments:\n["Pets"]\n'
+                                   'Return your response as a JSON array:\n[{"proposed_name": "..."}]')
+        self.assertEqual(proposals[0]["proposed_name"], "Pet Owners Enthusiasts")
+        self.assertIn("estimated_cpm", proposals[1])
+
+    def test_seeded_and_reproducible(self):
+        prompt = build_ranking_prompt(RANKING_PROMPT_TEMPLATE, "sports", SEGMENTS, 3).text
+        first = self.backend(seed=7)
+        replies = [first.generate_content(prompt).text for _ in range(3)]
+        first_sleeps = self.sleeps
+        second = self.backend(seed=7)
+        self.assertEqual([second.generate_content(prompt).text for _ in range(3)], replies)
+        self.assertEqual(self.sleeps, first_sleeps)
+        self.assertEqual(len(set(first_sleeps)), 3)  # repeats of a prompt draw new latencies
+        self.assertEqual(json.loads(replies[0].strip("`json\n"))[0]["segment_id"], "sports")
+        self.assertEqual(first.generate_content(prompt).usage_metadata.prompt_token_count, estimate_tokens(prompt))
+
+    def test_failure_injection(self):
+        prompt = "anything"
+        with self.assertRaises(ConnectionError):
+            self.backend(failure_rate=1.0).generate_content(prompt)
+        with self.assertRaises(ValueError):
+            _ = self.backend(empty_rate=1.0).generate_content(prompt).text
+        with self.assertRaises(ValueError):
+            json.loads(self.backend(malformed_rate=1.0).generate_content(prompt).text.strip("`json\n"))
+
+        backend = self.backend(timeout_rate=1.0, timeout_seconds=30)
+        with self.assertRaises(TimeoutError):
+            backend.generate_content(prompt)
+        self.assertEqual(self.sleeps[-1], 30)
+
+        backend = self.backend(failure_rate=0.3, seed=1)
+        failures = 0
+        for i in range(200):
+            try:
+                backend.generate_content(f"prompt {i}")
+            except ConnectionError:
+                failures += 1
+        self.assertTrue(40 <= failures <= 80)
+
+    def test_latency_distributions(self):
+        rng = random.Random(0)
+        self.assertEqual(LatencyDistribution("fixed", median_ms=250).sample(rng), 0.25)
+        uniform = [LatencyDistribution("uniform", min_ms=100, max_ms=200).sample(rng) for _ in range(50)]
+        self.assertTrue(all(0.1 <= s <= 0.2 for s in uniform))
+        capped = LatencyDistribution("lognormal", median_ms=1000, sigma=3, max_ms=1500)
+        self.assertLessEqual(max(capped.sample(rng) for _ in range(100)), 1.5)
+        with self.assertRaises(ValueError):
+            LatencyDistribution("pareto")
+
+
+if __name__ == "__main__":
+    unittest.main()
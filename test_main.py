@@ -276,5 +276,76 @@ class TestDatabaseIntegration(unittest.TestCase):
         conn.close()
 
 
+class TestDiscoveryResultRoundTrip(unittest.TestCase):
+    """Test rebuilding a discovery response from its stored compact result."""
+
+    def test_rebuilt_response_matches_original(self):
+        from main import build_discovery_response, discovery_response_from_result
+        from follow_up import compact_discovery_result
+
+        signals = [SignalResponse(
+            signals_agent_segment_id="sports_public",
+            name="Sports Enthusiasts",
+            description="Sports fans",
+            signal_type="audience",
+            data_provider="Polk",
+            coverage_percentage=45.0,
+            deployments=[
+                PlatformDeployment(platform="the-trade-desk", account="omnicom-ttd-main", is_live=True,
+                                   scope="account-specific", decisioning_platform_segment_id="ttd_sports"),
+                PlatformDeployment(platform="index-exchange", is_live=False, scope="platform-wide",
+                                   estimated_activation_duration_minutes=90),
+            ],
+            pricing=PricingModel(cpm=3.5, revenue_share_percentage=15.0),
+            has_coverage_data=True,
+            has_pricing_data=True
+        )]
+        taxonomy = [TaxonomyNodeSummary(path="Sports", segment_count=1, min_cpm=3.5, max_cpm=3.5)]
+        original = build_discovery_response("ctx_1", "sports fans", signals, [], taxonomy, "completed")
+
+        result = json.loads(json.dumps(compact_discovery_result("sports fans", original.model_dump(mode="json"))))
+        rebuilt = discovery_response_from_result("ctx_1", result)
+        self.assertEqual(rebuilt.model_dump(mode="json"), original.model_dump(mode="json"))
+
+
+class TestDiscoveryContextAliases(unittest.TestCase):
+    """Test that client context ids are found by workers that did not link them."""
+
+    def setUp(self):
+        import os
+        import tempfile
+        from database import create_tables
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, 'contexts.db')
+        conn = sqlite3.connect(self.db_path)
+        create_tables(conn.cursor())
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def connect(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def test_alias_survives_a_fresh_result_store(self):
+        import main
+        from follow_up import DiscoveryResultStore
+
+        result = {"signal_spec": "sports fans", "signals": [], "custom_segment_proposals": []}
+        with patch('main.get_db_connection', self.connect), patch('main.context_writer', None), \
+                patch('main.discovery_results', DiscoveryResultStore()):
+            main.store_discovery_context("ctx_1700000000_ab12cd", "sports fans", None, [], {}, result=result)
+            main.link_discovery_context("a2a-conversation-7", "ctx_1700000000_ab12cd")
+
+        # Another worker (or a restart) has nothing in memory
+        with patch('main.get_db_connection', self.connect), patch('main.context_writer', None), \
+                patch('main.discovery_results', DiscoveryResultStore()):
+            self.assertEqual(main.get_discovery_result("a2a-conversation-7"), result)
+            self.assertIsNone(main.get_discovery_result("a2a-conversation-8"))
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
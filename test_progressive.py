@@ -0,0 +1,41 @@
+"""Tests for the progressive discovery refinement registry."""
+
+import threading
+import unittest
+from unittest.mock import patch
+
+from progressive import RefinementRegistry
+
+
+class TestRefinementRegistry(unittest.TestCase):
+    """Test waiting, completion and bounded retention."""
+
+    def test_wait_returns_pending_then_result(self):
+        registry = RefinementRegistry()
+        registry.start("ctx_1")
+        self.assertEqual(registry.wait("ctx_1", 0.01), {"status": "pending"})
+        self.assertIsNone(registry.wait("ctx_unknown"))
+
+        threading.Timer(0.05, registry.finish, ("ctx_1", {"status": "completed"})).start()
+        self.assertEqual(registry.wait("ctx_1", 5), {"status": "completed"})
+
+    def test_finished_entries_expire(self):
+        registry = RefinementRegistry(ttl_seconds=60)
+        with patch("progressive.time.monotonic", return_value=1000.0):
+            registry.start("ctx_old")
+            registry.finish("ctx_old", {"status": "completed"})
+        with patch("progressive.time.monotonic", return_value=1061.0):
+            registry.start("ctx_new")
+        self.assertIsNone(registry.wait("ctx_old"))
+        self.assertEqual(registry.wait("ctx_new"), {"status": "pending"})
+
+    def test_oldest_entries_evicted_over_capacity(self):
+        registry = RefinementRegistry(max_entries=2)
+        for context_id in ["ctx_1", "ctx_2", "ctx_3"]:
+            registry.start(context_id)
+        self.assertIsNone(registry.wait("ctx_1"))
+        self.assertIsNotNone(registry.wait("ctx_3"))
+
+
+if __name__ == "__main__":
+    unittest.main()
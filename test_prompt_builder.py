@@ -0,0 +1,51 @@
+"""Tests for the compact ranking prompt builder."""
+
+import unittest
+
+from prompt_builder import build_ranking_prompt, prescore_segments, segment_row
+
+
+TEMPLATE = "Spec: {signal_spec}\nTop {max_results}\n{segment_table}\nReturn [{{}}]"
+
+SEGMENTS = [
+    {'id': 'weather', 'name': 'Weather Targeting', 'description': 'Rainy days', 'coverage_percentage': 50.0,
+     'base_cpm': 2.0},
+    {'id': 'auto', 'name': 'Luxury Auto Intenders', 'description': 'Car buyers', 'coverage_percentage': 5.0,
+     'base_cpm': 8.75},
+    {'id': 'travel', 'name': 'Travel', 'description': 'Luxury hotel guests', 'coverage_percentage': 10.0,
+     'base_cpm': 4.0},
+]
+
+
+class TestPromptBuilder(unittest.TestCase):
+    """Test pre-scoring, row encoding and the token budget."""
+
+    def test_prescore_prefers_name_matches(self):
+        ranked = prescore_segments("luxury autos", SEGMENTS)
+        self.assertEqual([s['id'] for s in ranked], ['auto', 'travel', 'weather'])
+
+    def test_rows_are_compact_and_escaped(self):
+        row = segment_row({'id': 'x', 'name': 'A | B', 'description': 'word ' * 50,
+                           'coverage_percentage': 12.0, 'base_cpm': None}, description_chars=20)
+        cells = row.split("|")
+        self.assertEqual(len(cells), 5)
+        self.assertEqual(cells[1], "A / B")
+        self.assertLessEqual(len(cells[2]), 20)
+        self.assertEqual(cells[3:], ["12", ""])
+
+    def test_budget_drops_lowest_scored_segments(self):
+        full = build_ranking_prompt(TEMPLATE, "luxury auto", SEGMENTS, 2)
+        self.assertEqual(full.dropped, 0)
+        self.assertIn("Return [{}]", full.text)
+
+        tight = build_ranking_prompt(TEMPLATE, "luxury auto", SEGMENTS, 2, token_budget=full.token_count - 5)
+        self.assertEqual([s['id'] for s in tight.segments], ['auto', 'travel'])
+        self.assertEqual(tight.dropped, 1)
+        self.assertLessEqual(tight.token_count, full.token_count - 5)
+
+        minimal = build_ranking_prompt(TEMPLATE, "luxury auto", SEGMENTS, 2, token_budget=1)
+        self.assertEqual([s['id'] for s in minimal.segments], ['auto'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+"""Tests for precomputed custom segment proposals per catalog cluster."""
+
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from db_pool import ConnectionPool
+from proposal_clusters import ClusterProposalStore, cluster_key, nearest_cluster
+
+
+SEGMENTS = [
+    ("auto_bmw", "Automotive : Manufacturers : BMW"),
+    ("auto_suv", "Automotive : SUVs"),
+    ("travel_air", "Travel : Air Travel"),
+    ("weather", "Weather-Based Targeting"),
+]
+
+
+class TestProposalClusters(unittest.TestCase):
+    """Test clustering, nearest-cluster lookup, persistence and refresh."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, 'clusters.db')
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE signal_segments (id TEXT PRIMARY KEY, name TEXT)")
+        conn.executemany("INSERT INTO signal_segments VALUES (?, ?)", SEGMENTS)
+        conn.commit()
+        conn.close()
+        self.pool = ConnectionPool(self.db_path)
+        self.calls = []
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def generate(self, label, names):
+        self.calls.append((label, sorted(names)))
+        return [{"proposed_name": f"{label} Enthusiasts"}]
+
+    def store(self, **kwargs):
+        return ClusterProposalStore(self.pool.connect, self.generate, **kwargs)
+
+    def wait_for_background(self, store):
+        deadline = time.monotonic() + 5
+        while store._inflight and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_cluster_keys(self):
+        self.assertEqual(cluster_key("Automotive : Manufacturers : BMW"), "Automotive")
+        self.assertEqual(cluster_key("Automotive : Manufacturers : BMW", 2), "Automotive : Manufacturers")
+        self.assertEqual(cluster_key("Weather-Based Targeting"), "Weather-Based Targeting")
+        candidates = [{"name": "Travel : Air Travel"}, {"name": "Automotive : SUVs"},
+                      {"name": "Automotive : Manufacturers : BMW"}]
+        # 1/2 + 1/3 for Automotive beats 1 for Travel
+        self.assertEqual(nearest_cluster(candidates), "Travel")
+        self.assertEqual(nearest_cluster(candidates + [{"name": "Automotive"}] * 2), "Automotive")
+        self.assertIsNone(nearest_cluster([]))
+
+    def test_refresh_all_then_lookup_without_llm(self):
+        store = self.store()
+        self.assertEqual(store.refresh_all(), 3)
+        self.assertIn(("Automotive", ["Automotive : Manufacturers : BMW", "Automotive : SUVs"]), self.calls)
+        self.assertEqual(store.refresh_all(), 0)
+
+        reopened = self.store()
+        proposals = reopened.lookup([{"id": "auto_suv", "name": "Automotive : SUVs"}])
+        self.assertEqual(proposals, [{"proposed_name": "Automotive Enthusiasts"}])
+        self.assertEqual(len(self.calls), 3)
+
+    def test_missing_cluster_is_generated_on_line(self):
+        store = self.store()
+        self.assertIsNone(store.lookup([{"id": "travel_air", "name": "Travel : Air Travel"}]))
+        self.wait_for_background(store)
+        self.assertEqual(store.lookup([{"id": "travel_air", "name": "Travel : Air Travel"}]),
+                         [{"proposed_name": "Travel Enthusiasts"}])
+
+    def test_stale_entry_served_while_refreshing(self):
+        store = self.store(ttl_seconds=0)
+        store.put("Weather-Based Targeting", [{"proposed_name": "old"}], "fingerprint")
+        self.assertEqual(store.lookup([{"id": "weather", "name": "Weather-Based Targeting"}]),
+                         [{"proposed_name": "old"}])
+        self.wait_for_background(store)
+        self.assertEqual(self.calls, [("Weather-Based Targeting", ["Weather-Based Targeting"])])
+
+    def test_failed_generation_keeps_old_proposals(self):
+        def failing(label, names):
+            raise RuntimeError("llm down")
+
+        store = ClusterProposalStore(self.pool.connect, failing, ttl_seconds=0)
+        store.put("Automotive", [{"proposed_name": "old"}], "fingerprint")
+        self.assertEqual(store.refresh_all(), 0)
+        self.assertEqual(store.lookup([{"id": "auto_suv", "name": "Automotive : SUVs"}]),
+                         [{"proposed_name": "old"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
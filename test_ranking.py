@@ -0,0 +1,64 @@
+"""Tests for the signal rankers."""
+
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from ranking import LLMRanker, LocalRanker, TieredRanker
+
+
+SEGMENTS = [
+    {'id': 'weather', 'name': 'Weather Targeting', 'description': 'Rainy days', 'coverage_percentage': 50.0,
+     'base_cpm': 2.0},
+    {'id': 'auto', 'name': 'Luxury Auto Intenders', 'description': 'Car buyers', 'coverage_percentage': 5.0,
+     'base_cpm': 8.75},
+]
+
+
+class TestRankers(unittest.TestCase):
+    """Test the local and LLM tiers and the deadline fallback."""
+
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=2)
+
+    def tearDown(self):
+        self.executor.shutdown(wait=True)
+
+    def test_local_ranker_orders_by_match(self):
+        self.assertEqual([s['id'] for s in LocalRanker().rank("luxury auto", SEGMENTS, 1)], ['auto'])
+
+    def test_llm_ranker_follows_model_order(self):
+        prompts = []
+
+        def generate(prompt):
+            prompts.append(prompt)
+            return [{"segment_id": "weather", "match_reason": "rain"}, {"segment_id": "missing"}]
+
+        ranked = LLMRanker(generate).rank("rainy day shoppers", SEGMENTS, 2)
+        self.assertEqual([(s['id'], s['match_reason']) for s in ranked], [('weather', 'rain')])
+        self.assertIn("auto|Luxury Auto Intenders|Car buyers|5|8.75", prompts[0])
+
+    def test_tiered_ranker_falls_back_after_budget(self):
+        release = threading.Event()
+
+        def slow_generate(prompt):
+            release.wait(5)
+            return [{"segment_id": "weather"}]
+
+        ranker = TieredRanker(LLMRanker(slow_generate), LocalRanker(), self.executor, budget_seconds=0.05)
+        ranked, fell_back = ranker.rank_with_tier("luxury auto", SEGMENTS, 1)
+        self.assertEqual(([s['id'] for s in ranked], fell_back), (['auto'], True))
+        release.set()
+        ranked, fell_back = ranker.rank_with_tier("luxury auto", SEGMENTS, 1, budget_seconds=5)
+        self.assertEqual(([s['id'] for s in ranked], fell_back), (['weather'], False))
+
+    def test_tiered_ranker_falls_back_on_error(self):
+        def failing_generate(prompt):
+            raise ValueError("bad json")
+
+        ranker = TieredRanker(LLMRanker(failing_generate), LocalRanker(), self.executor)
+        self.assertEqual([s['id'] for s in ranker.rank("luxury auto", SEGMENTS, 1)], ['auto'])
+
+
+if __name__ == "__main__":
+    unittest.main()
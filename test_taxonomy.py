@@ -0,0 +1,97 @@
+"""Tests for the taxonomy trie over hierarchical segment names."""
+
+import unittest
+
+import numpy as np
+
+from catalog import CatalogSnapshot
+from taxonomy import TaxonomyTrie, taxonomy_path
+
+
+NAMES = [
+    "Automotive : Manufacturers : BMW",
+    "Automotive : Manufacturers : Audi",
+    "Automotive : Car Shopping",
+    "Travel : Hotels",
+    "Sports Fans",
+]
+COVERAGE = np.array([5.0, 7.0, 20.0, 12.0, 30.0])
+CPM = np.array([3.0, 2.5, 1.0, 4.0, np.nan])
+
+
+class TestTaxonomyTrie(unittest.TestCase):
+    """Test lookups, rollups and subtree resolution."""
+
+    def setUp(self):
+        self.trie = TaxonomyTrie(NAMES, COVERAGE, CPM)
+
+    def test_taxonomy_path_strips_separators(self):
+        self.assertEqual(taxonomy_path("Automotive : Manufacturers:BMW"), ["Automotive", "Manufacturers", "BMW"])
+        self.assertEqual(taxonomy_path(""), [])
+
+    def test_find_and_prefix_lookup(self):
+        self.assertEqual(self.trie.find("automotive : manufacturers").path_name, "Automotive : Manufacturers")
+        self.assertIsNone(self.trie.find("Automotive : Boats"))
+        self.assertEqual([n.label for n in self.trie.find_prefix("Automotive : Man")], ["Manufacturers"])
+
+    def test_rollup_covers_whole_subtree(self):
+        node = self.trie.find("Automotive")
+        summary = self.trie.summarize(node, depth=0)
+        self.assertEqual(node.segment_count, 3)
+        self.assertEqual((summary["min_coverage_percentage"], summary["max_coverage_percentage"]), (5.0, 20.0))
+        self.assertEqual((summary["min_cpm"], summary["max_cpm"]), (1.0, 3.0))
+        self.assertEqual(sorted(self.trie.subtree_rows(node).tolist()), [0, 1, 2])
+
+    def test_subtree_rows_respects_mask(self):
+        mask = np.array([True, False, True, True, True])
+        rows = self.trie.subtree_rows(self.trie.find("Automotive : Manufacturers"), mask)
+        self.assertEqual(rows.tolist(), [0])
+
+    def test_match_keeps_outermost_nodes(self):
+        matched = self.trie.match("automotive manufacturers and hotels")
+        self.assertEqual([n.path_name for n in matched], ["Automotive", "Travel : Hotels"])
+
+    def test_summarize_collapses_children(self):
+        mask = np.array([True, True, False, True, True])
+        summary = self.trie.summarize(self.trie.find("Automotive"), mask, depth=1)
+        self.assertEqual(summary["segment_count"], 2)
+        self.assertEqual([c["path"] for c in summary["children"]], ["Automotive : Manufacturers"])
+        self.assertEqual(summary["children"][0]["children"], [])
+
+    def test_copy_leaves_the_original_unchanged(self):
+        copied = self.trie.copy(COVERAGE, CPM)
+        copied.remove(0, NAMES[0])
+        copied.add(5, "Automotive : Manufacturers : Tesla")
+        copied.remove(3, NAMES[3])
+
+        self.assertEqual(sorted(self.trie.subtree_rows(self.trie.find("Automotive")).tolist()), [0, 1, 2])
+        self.assertIsNotNone(self.trie.find("Travel : Hotels"))
+        self.assertEqual([n.path_name for n in self.trie.match("bmw hotels")],
+                         ["Travel : Hotels", "Automotive : Manufacturers : BMW"])
+        self.assertEqual(sorted(copied.subtree_rows(copied.find("Automotive")).tolist()), [1, 2, 5])
+        self.assertIsNone(copied.find("Travel"))
+        self.assertEqual([n.path_name for n in copied.match("tesla hotels")], ["Automotive : Manufacturers : Tesla"])
+        # Untouched branches are shared, not copied
+        self.assertIs(copied.find("Automotive : Car Shopping"), self.trie.find("Automotive : Car Shopping"))
+
+
+class TestSnapshotTaxonomy(unittest.TestCase):
+    """Test taxonomy search through the catalog snapshot."""
+
+    def test_taxonomy_search_returns_subtree_segments(self):
+        segments = {
+            f"seg_{i}": {'id': f"seg_{i}", 'name': name, 'description': '', 'catalog_access': 'public',
+                         'coverage_percentage': float(COVERAGE[i])}
+            for i, name in enumerate(NAMES)
+        }
+        snapshot = CatalogSnapshot(segments, {})
+        results, nodes = snapshot.taxonomy_search("automotive audiences")
+        self.assertEqual([n.path_name for n in nodes], ["Automotive"])
+        self.assertEqual(sorted(s['id'] for s in results), ['seg_0', 'seg_1', 'seg_2'])
+
+        results, nodes = snapshot.taxonomy_search("sports fans")
+        self.assertEqual((results, nodes), ([], []))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+"""Tests for local embeddings and vector search."""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from vector_index import HashingEmbedder, VectorIndex
+
+
+SEGMENTS = [
+    {'id': 'auto', 'name': 'Auto Shopping', 'description': 'Users researching vehicle purchases'},
+    {'id': 'weather', 'name': 'Weather-Based Targeting', 'description': 'Sunny, rainy and cold conditions'},
+    {'id': 'finance', 'name': 'Financial News Context', 'description': 'Business news content'},
+]
+
+
+class TestHashingEmbedder(unittest.TestCase):
+    """Test the hashing vectorizer."""
+
+    def test_vectors_are_normalized_and_stable(self):
+        embedder = HashingEmbedder(dimension=64)
+        vectors = embedder.embed(["luxury car buyers", ""])
+        self.assertEqual(vectors.shape, (2, 64))
+        self.assertAlmostEqual(float(np.linalg.norm(vectors[0])), 1.0, places=5)
+        self.assertFalse(vectors[1].any())
+        np.testing.assert_array_equal(vectors[0], HashingEmbedder(dimension=64).embed_one("luxury car buyers"))
+
+
+class TestVectorIndex(unittest.TestCase):
+    """Test cosine top-k search over the embedding matrix."""
+
+    def setUp(self):
+        self.index = VectorIndex.build(SEGMENTS, HashingEmbedder())
+
+    def test_search_recalls_morphological_matches(self):
+        results = self.index.search("car shoppers", k=1)
+        self.assertEqual(results[0][0], 'auto')
+
+    def test_search_respects_mask_and_threshold(self):
+        mask = np.array([False, True, True])
+        self.assertNotIn('auto', [i for i, _ in self.index.search("auto shopping", k=3, mask=mask)])
+        self.assertEqual(self.index.search("zzzz qqqq", k=3, min_similarity=0.5), [])
+
+    def test_with_changes_only_embeds_changed_segments(self):
+        updated = self.index.with_changes([{'id': 'golf', 'name': 'Golfers', 'description': ''}], ['weather'])
+        self.assertEqual(updated.ids, ['auto', 'finance', 'golf'])
+        self.assertEqual(updated.search("golf", k=1)[0][0], 'golf')
+
+    def test_approximate_index_finds_exact_neighbour(self):
+        index = VectorIndex.build(SEGMENTS, HashingEmbedder(), approximate_threshold=1)
+        self.assertIsNotNone(index.ivf)
+        self.assertEqual(index.search("rainy weather", k=1)[0][0], 'weather')
+
+    def test_saved_matrix_is_reused_when_segments_match(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'vectors.npz')
+            self.index.save(path, SEGMENTS)
+            loaded = VectorIndex.load_or_build(path, SEGMENTS, HashingEmbedder())
+            np.testing.assert_array_equal(loaded.matrix, self.index.matrix)
+
+            changed = SEGMENTS[:2]
+            rebuilt = VectorIndex.load_or_build(path, changed, HashingEmbedder())
+            self.assertEqual(rebuilt.ids, ['auto', 'weather'])
+
+
+if __name__ == "__main__":
+    unittest.main()
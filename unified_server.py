@@ -2,13 +2,14 @@
 """Unified HTTP server supporting both MCP and A2A protocols."""
 
 import asyncio
+import json
 import logging
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
@@ -26,21 +27,39 @@ from schemas import (
 from database import init_db
 from config_loader import load_config
 from adapters.manager import AdapterManager
+from follow_up import CUSTOM_SEGMENTS, classify_follow_up, answer_follow_up
+from llm_batcher import BatchingLLMRanker
 
 # Import the MCP tools
 import main
 
 logger = logging.getLogger(__name__)
 
+# How often a waiting refinement stream checks for the refined response
+REFINEMENT_POLL_SECONDS = 1.0
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application lifecycle."""
     # Startup
     init_db()
+    main.entitlement_cache.warm()
+    main.activation_scheduler.start()
+    if main.proposal_store:
+        main.proposal_store.start(main.proposal_clusters_config.get('refresh_interval_seconds', 3600))
+    if main.context_retention_config.get('enabled', True):
+        main.context_retention.start(main.context_retention_config.get('interval_seconds', 300))
     yield
     # Shutdown
-    pass
+    if isinstance(main.llm_ranker, BatchingLLMRanker):
+        main.llm_ranker.stop()
+    main.activation_scheduler.stop()
+    main.context_retention.stop()
+    if main.context_writer:
+        main.context_writer.close()
+    if main.proposal_store:
+        main.proposal_store.stop()
 
 
 app = FastAPI(
@@ -86,29 +105,14 @@ async def root():
 async def handle_a2a_root_task(request: Dict[str, Any]):
     """Handle A2A task requests at root endpoint (A2A standard)."""
     # Check if this is a JSON-RPC message from A2A Inspector
+    if "jsonrpc" in request and request.get("method") == "message/stream":
+        # Streaming: locally ranked results first, the AI refinement as a later event
+        task_request = message_task_request(request)
+        task_request["parameters"]["progressive"] = True
+        return stream_a2a_task(request.get("id"), task_request)
+    
     if "jsonrpc" in request and request.get("method") == "message/send":
-        # Extract the actual message from JSON-RPC format
-        params = request.get("params", {})
-        message = params.get("message", {})
-        message_parts = message.get("parts", [])
-        
-        # Extract text from message parts
-        query = ""
-        for part in message_parts:
-            if part.get("kind") == "text":
-                query = part.get("text", "")
-                break
-        
-        # Convert to our expected task format
-        # Assume it's a discovery task since that's the most common
-        task_request = {
-            "taskId": request.get("id"),
-            "type": "discovery",
-            "contextId": params.get("contextId"),  # Pass through context from JSON-RPC
-            "parameters": {
-                "query": query
-            }
-        }
+        task_request = message_task_request(request)
         
         # Process the task
         task_result = await handle_a2a_task(task_request)
@@ -159,6 +163,149 @@ async def handle_a2a_root_task(request: Dict[str, Any]):
         # Standard A2A task format
         return await handle_a2a_task(request)
 
+def message_task_request(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a JSON-RPC message/send or message/stream request to our task format."""
+    # Extract the actual message from JSON-RPC format
+    params = request.get("params", {})
+    message = params.get("message", {})
+    message_parts = message.get("parts", [])
+    
+    # Extract text from message parts
+    query = ""
+    for part in message_parts:
+        if part.get("kind") == "text":
+            query = part.get("text", "")
+            break
+    
+    # Convert to our expected task format
+    # Assume it's a discovery task since that's the most common
+    return {
+        "taskId": request.get("id"),
+        "type": "discovery",
+        "contextId": params.get("contextId"),  # Pass through context from JSON-RPC
+        "parameters": {
+            "query": query
+        }
+    }
+
+
+def discovery_status_message(response: Dict[str, Any]) -> Dict[str, Any]:
+    """A2A agent message carrying a discovery response as text and data parts."""
+    parts = []
+    if response.get("message"):
+        parts.append({
+            "kind": "text",
+            "text": response["message"]
+        })
+    
+    # Add data part with structured response
+    parts.append({
+        "kind": "data",
+        "data": response
+    })
+    
+    return {
+        "kind": "message",
+        "message_id": f"msg_{datetime.now().timestamp()}",
+        "parts": parts,
+        "role": "agent"
+    }
+
+
+def sse_event(payload: Dict[str, Any], event: Optional[str] = None) -> str:
+    """Format one Server-Sent Event."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(payload, default=str)}\n\n"
+
+
+async def watch_refinement(context_id: str):
+    """Yield None on every poll while a discovery refinement is pending, then its state.
+    
+    The final state is still "pending" if the stream timeout passes first.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + main.progressive_config.get('stream_timeout_seconds', 60)
+    while True:
+        polled_at = loop.time()
+        refinement = await asyncio.to_thread(
+            main.get_discovery_refinement, context_id, REFINEMENT_POLL_SECONDS
+        )
+        if refinement is None or refinement.get("status") != "pending" or loop.time() >= deadline:
+            yield refinement
+            return
+        yield None
+        # Refinements running in another worker are read from the database
+        # without waiting, so pace the polling
+        await asyncio.sleep(max(0.0, REFINEMENT_POLL_SECONDS - (loop.time() - polled_at)))
+
+
+def stream_a2a_task(request_id: Any, task_request: Dict[str, Any]) -> StreamingResponse:
+    """Stream a progressive discovery task as JSON-RPC SSE events.
+    
+    The first event is the task with the locally ranked signals; once the AI
+    refinement is stored a final status-update event carries the refined
+    response.
+    """
+    async def event_generator():
+        task = await handle_a2a_task(task_request)
+        yield sse_event({"jsonrpc": "2.0", "id": request_id, "result": task})
+        if task.get("status", {}).get("state") != "working":
+            return
+        
+        discovery_context_id = task["metadata"]["context_id"]
+        refinement = None
+        async for refinement in watch_refinement(discovery_context_id):
+            if refinement is None:
+                yield ": refining\n\n"
+        
+        if refinement and refinement.get("status") == "completed":
+            status = {
+                "state": "completed",
+                "timestamp": datetime.now().isoformat(),
+                "message": discovery_status_message(refinement["response"])
+            }
+        else:
+            # The task still completes: the locally ranked signals stand
+            error = (refinement or {}).get("error", "AI refinement did not finish in time")
+            status = {
+                "state": "completed",
+                "timestamp": datetime.now().isoformat(),
+                "message": {
+                    "kind": "message",
+                    "message_id": f"msg_{datetime.now().timestamp()}",
+                    "parts": [{
+                        "kind": "text",
+                        "text": f"{error}. The locally ranked signals remain valid."
+                    }],
+                    "role": "agent"
+                }
+            }
+        yield sse_event({
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "result": {
+                "kind": "status-update",
+                "taskId": task["id"],
+                "contextId": task["contextId"],
+                "status": status,
+                "final": True,
+                "metadata": {
+                    "context_id": discovery_context_id,
+                    "refinement_status": (refinement or {}).get("status", "pending")
+                }
+            }
+        })
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+        }
+    )
+
+
 @app.get("/.well-known/agent.json")
 @app.get("/agent-card")
 async def get_agent_card(request: Request):
@@ -183,7 +330,7 @@ async def get_agent_card(request: Request):
         "defaultInputModes": ["text"],
         "defaultOutputModes": ["text"],
         "capabilities": {  # Required by spec - using fields from AgentCapabilities
-            "streaming": False,
+            "streaming": True,
             "pushNotifications": False,
             "stateTransitionHistory": False,
             "extensions": []
@@ -212,6 +359,10 @@ async def get_agent_card(request: Request):
                         "principal_id": {
                             "type": "string",
                             "description": "Principal identifier for access control"
+                        },
+                        "progressive": {
+                            "type": "boolean",
+                            "description": "Return locally ranked results at once; the AI refinement follows under the context_id"
                         }
                     },
                     "required": ["query"]
@@ -289,64 +440,23 @@ async def handle_a2a_task(request: Dict[str, Any]):
             # Support 'query' at root level or in parameters
             query = params.get("query", request.get("query", ""))
             
-            # Check if this is a contextual follow-up question
-            query_lower = query.lower()
-            
-            # Check for custom segment/signal queries
-            is_custom_segment_query = any([
-                "custom segment" in query_lower,
-                "custom signal" in query_lower,
-                "tell me about the custom" in query_lower,
-                "tell me more about the custom" in query_lower,
-                "what custom" in query_lower,
-                "explain the custom" in query_lower,
-                "describe the custom" in query_lower,
-                "more about custom" in query_lower
-            ])
-            
-            # Check for signal detail queries
-            is_signal_detail_query = any([
-                "tell me about the signal" in query_lower,
-                "tell me more about" in query_lower,
-                "can you tell me about" in query_lower,
-                "explain the signal" in query_lower,
-                "describe the signal" in query_lower,
-                "what about the" in query_lower and "signal" in query_lower,
-                "details about" in query_lower,
-                "more information" in query_lower
-            ])
-            
-            
-            # If this is asking about custom segments and we have a context_id
-            if is_custom_segment_query and context_id:
-                # Try to retrieve the previous response from context
-                # For now, we'll generate a helpful response explaining what custom segments are
-                # In a production system, you'd store and retrieve the actual context
-                
-                parts = [{
-                    "kind": "text",
-                    "text": (
-                        "Custom segments are AI-generated audience proposals based on your search criteria. "
-                        "These segments don't exist yet but can be created on demand by combining existing data signals. "
-                        "\n\nTo see custom segment proposals, run a discovery query first (e.g., 'sports audiences'). "
-                        "The system will analyze available segments and suggest custom combinations that better match your needs. "
-                        "\n\nEach custom segment proposal includes:\n"
-                        "• A descriptive name\n"
-                        "• Estimated coverage and CPM\n"
-                        "• The rationale for why it matches your criteria\n"
-                        "• A unique ID for activation\n\n"
-                        "You can activate these custom segments using their IDs, and they'll be deployed to your chosen platforms."
-                    )
-                }]
-                
+            # Follow-up questions about an earlier discovery are answered from
+            # its stored result instead of running discovery again
+            intent = classify_follow_up(query) if context_id else None
+            result = await asyncio.to_thread(main.get_discovery_result, context_id) if intent else None
+            if result is not None:
+                items = result["custom_segment_proposals"] if intent == CUSTOM_SEGMENTS else result["signals"]
                 status_message = {
                     "kind": "message",
                     "message_id": f"msg_{datetime.now().timestamp()}",
-                    "parts": parts,
+                    "parts": [
+                        {"kind": "text", "text": answer_follow_up(intent, result, query)},
+                        {"kind": "data", "data": {intent: items}}
+                    ],
                     "role": "agent"
                 }
                 
-                task_response = {
+                return {
                     "id": task_id,
                     "kind": "task",
                     "contextId": context_id,
@@ -356,60 +466,9 @@ async def handle_a2a_task(request: Dict[str, Any]):
                         "message": status_message
                     },
                     "metadata": {
-                        "response_type": "contextual_explanation"
+                        "response_type": "contextual_explanation" if intent == CUSTOM_SEGMENTS else "signal_details"
                     }
                 }
-                
-                return task_response
-            
-            # If this is asking for signal details and we have a context_id
-            elif is_signal_detail_query and context_id:
-                # Generate a detailed explanation of signals
-                # In production, would retrieve the actual previous signals from context
-                
-                parts = [{
-                    "kind": "text",
-                    "text": (
-                        "Based on your previous search, here are details about the signals found:\n\n"
-                        "**Sports Enthusiasts - Public**\n"
-                        "• Coverage: 45% of the addressable market\n"
-                        "• CPM: $3.50 per thousand impressions\n"
-                        "• Data Provider: Polk\n"
-                        "• Description: Broad sports audience available platform-wide\n"
-                        "• Deployment: Available on Index Exchange and The Trade Desk\n"
-                        "• Activation Time: ~60 minutes\n\n"
-                        "This signal targets users interested in sports content, including:\n"
-                        "- Sports news readers\n"
-                        "- Fantasy sports players\n"
-                        "- Sports merchandise buyers\n"
-                        "- Live sports streamers\n\n"
-                        "The signal is immediately available for activation across multiple platforms "
-                        "and provides good coverage at a competitive CPM rate."
-                    )
-                }]
-                
-                status_message = {
-                    "kind": "message",
-                    "message_id": f"msg_{datetime.now().timestamp()}",
-                    "parts": parts,
-                    "role": "agent"
-                }
-                
-                task_response = {
-                    "id": task_id,
-                    "kind": "task",
-                    "contextId": context_id,
-                    "status": {
-                        "state": "completed",
-                        "timestamp": datetime.now().isoformat(),
-                        "message": status_message
-                    },
-                    "metadata": {
-                        "response_type": "signal_details"
-                    }
-                }
-                
-                return task_response
             
             internal_request = GetSignalsRequest(
                 signal_spec=query,
@@ -419,37 +478,21 @@ async def handle_a2a_task(request: Dict[str, Any]):
                 principal_id=params.get("principal_id")
             )
             
-            # Call business logic
-            response = main.get_signals.fn(
+            # Call business logic; progressive discovery returns the local
+            # ranking now and refines it in the background
+            progressive = bool(params.get("progressive", False))
+            response = await asyncio.to_thread(
+                main.discover_signals,
                 signal_spec=internal_request.signal_spec,
                 deliver_to=internal_request.deliver_to,
                 filters=internal_request.filters,
                 max_results=internal_request.max_results,
-                principal_id=internal_request.principal_id
+                principal_id=internal_request.principal_id,
+                progressive=progressive
             )
-            
-            # Build A2A SDK-compliant response
-            # Create parts for the message
-            parts = []
-            if response.message:
-                parts.append({
-                    "kind": "text",
-                    "text": response.message
-                })
-            
-            # Add data part with structured response
-            parts.append({
-                "kind": "data",
-                "data": response.model_dump()
-            })
-            
-            # Create the status message
-            status_message = {
-                "kind": "message",
-                "message_id": f"msg_{datetime.now().timestamp()}",
-                "parts": parts,
-                "role": "agent"
-            }
+            if context_id:
+                # Follow-ups come back under the client's contextId, not ours
+                await asyncio.to_thread(main.link_discovery_context, context_id, response.context_id)
             
             # Build the task response with proper status structure
             task_response = {
@@ -457,15 +500,18 @@ async def handle_a2a_task(request: Dict[str, Any]):
                 "kind": "task",
                 "contextId": context_id or response.context_id,
                 "status": {
-                    "state": "completed",  # Using TaskState enum value
+                    "state": "working" if response.refinement_status == "pending" else "completed",
                     "timestamp": datetime.now().isoformat(),
-                    "message": status_message
+                    "message": discovery_status_message(response.model_dump())
                 },
                 "metadata": {
                     "signal_count": len(response.signals),
                     "context_id": response.context_id
                 }
             }
+            if progressive:
+                task_response["metadata"]["refinement_status"] = response.refinement_status
+                task_response["metadata"]["refinement_events"] = f"/discovery/{response.context_id}/events"
             
             return task_response
             
@@ -479,7 +525,8 @@ async def handle_a2a_task(request: Dict[str, Any]):
             )
             
             # Call business logic
-            response = main.activate_signal.fn(
+            response = await asyncio.to_thread(
+                main.activate_signal.fn,
                 signals_agent_segment_id=internal_request.signals_agent_segment_id,
                 platform=internal_request.platform,
                 account=internal_request.account,
@@ -589,6 +636,40 @@ async def handle_a2a_task(request: Dict[str, Any]):
         }
 
 
+# ===== Progressive Discovery =====
+
+@app.get("/discovery/{context_id}")
+async def get_discovery_refinement(context_id: str):
+    """Current state of a discovery's AI refinement, with the refined response once completed."""
+    refinement = await asyncio.to_thread(main.get_discovery_refinement, context_id)
+    if refinement is None:
+        raise HTTPException(status_code=404, detail=f"Discovery context '{context_id}' not found")
+    return {"context_id": context_id, **refinement}
+
+
+@app.get("/discovery/{context_id}/events")
+async def discovery_refinement_events(context_id: str):
+    """Server-Sent Events stream that delivers a discovery's AI refinement when it is ready."""
+    if await asyncio.to_thread(main.get_discovery_refinement, context_id) is None:
+        raise HTTPException(status_code=404, detail=f"Discovery context '{context_id}' not found")
+    
+    async def event_generator():
+        async for refinement in watch_refinement(context_id):
+            if refinement is None:
+                yield ": refining\n\n"
+            else:
+                yield sse_event({"context_id": context_id, **refinement}, event="refinement")
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+        }
+    )
+
+
 # ===== MCP Protocol Endpoints =====
 
 @app.get("/mcp")
@@ -669,7 +750,7 @@ async def handle_mcp_request(request: Request):
                         # Try to create DeliverySpecification directly
                         tool_params['deliver_to'] = DeliverySpecification(**tool_params['deliver_to'])
                     
-                    result = main.get_signals.fn(**tool_params)
+                    result = await asyncio.to_thread(main.get_signals.fn, **tool_params)
                     
                 except ValidationError as e:
                     # Return helpful error message with expected format
@@ -719,7 +800,7 @@ async def handle_mcp_request(request: Request):
                         "id": request_id
                     })
             elif tool_name == "activate_signal":
-                result = main.activate_signal.fn(**tool_params)
+                result = await asyncio.to_thread(main.activate_signal.fn, **tool_params)
             else:
                 raise ValueError(f"Unknown tool: {tool_name}")
                 
@@ -782,6 +863,30 @@ async def health_check():
     }
 
 
+# ===== Metrics =====
+
+@app.get("/metrics")
+async def metrics(format: str = "prometheus"):
+    """LLM call and circuit breaker metrics in Prometheus text format, or JSON with ?format=json."""
+    breaker = main.llm_breaker.stats() if main.llm_breaker else None
+    if format == "json":
+        return {"llm": main.llm_metrics.snapshot(), "circuit_breaker": breaker}
+    
+    text = main.llm_metrics.prometheus()
+    if breaker:
+        text += "# HELP llm_circuit_state Gemini circuit breaker state (1 for the current state).\n"
+        text += "# TYPE llm_circuit_state gauge\n"
+        for state in ("closed", "open", "half_open"):
+            text += f'llm_circuit_state{{state="{state}"}} {1 if breaker["state"] == state else 0}\n'
+        text += "# HELP llm_circuit_trips_total Times the Gemini circuit has opened.\n"
+        text += "# TYPE llm_circuit_trips_total counter\n"
+        text += f"llm_circuit_trips_total {breaker['trips']}\n"
+        text += "# HELP llm_circuit_rejected_total Gemini calls refused while the circuit was open.\n"
+        text += "# TYPE llm_circuit_rejected_total counter\n"
+        text += f"llm_circuit_rejected_total {breaker['rejected']}\n"
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+
 # ===== Main =====
 
 def run_unified_server(host: str = "localhost", port: int = 8000):
@@ -791,11 +896,12 @@ def run_unified_server(host: str = "localhost", port: int = 8000):
     logger.info(f"- A2A Tasks: http://{host}:{port}/a2a/task")
     logger.info(f"- MCP Endpoint: http://{host}:{port}/mcp")
     logger.info(f"- MCP SSE: http://{host}:{port}/mcp/sse")
+    logger.info(f"- Metrics: http://{host}:{port}/metrics")
+    logger.info(f"- Discovery refinements: http://{host}:{port}/discovery/<context_id>/events")
     
     uvicorn.run(app, host=host, port=port)
 
 
 if __name__ == "__main__":
-    import json
     logging.basicConfig(level=logging.INFO)
     run_unified_server()
\ No newline at end of file
@@ -0,0 +1,280 @@
+"""Local embedding and vector search for semantic segment recall.
+
+Embeddings are computed offline (at catalog load, or ahead of time with
+``python vector_index.py``) by a pluggable local embedder, so retrieval never
+needs the network. The default HashingEmbedder hashes word and character
+trigram features, which catches morphological matches ("shoppers" vs
+"Shopping") that exact keyword search misses; a model-backed Embedder can be
+swapped in for true synonym recall.
+"""
+
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import zlib
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+
+import numpy as np
+
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def segment_text(segment: Dict[str, Any]) -> str:
+    """Text embedded for a segment: name plus description."""
+    return f"{segment.get('name') or ''} {segment.get('description') or ''}".strip()
+
+
+class Embedder(ABC):
+    """Maps texts to L2-normalized float32 vectors."""
+
+    name: str = "embedder"
+    dimension: int
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into a (len(texts), dimension) float32 array."""
+        pass
+
+    def embed_one(self, text: str) -> np.ndarray:
+        """Embed a single text."""
+        return self.embed([text])[0]
+
+
+class HashingEmbedder(Embedder):
+    """Feature-hashing vectorizer over word unigrams and character trigrams.
+
+    Uses a stable hash (crc32) so vectors are identical across processes and
+    can be precomputed and stored.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dimension: int = 512, char_ngram: int = 3, word_weight: float = 2.0):
+        self.dimension = dimension
+        self.char_ngram = char_ngram
+        self.word_weight = word_weight
+
+    def _features(self, text: str) -> Dict[str, float]:
+        features: Dict[str, float] = {}
+        for word in WORD_PATTERN.findall(text.lower()):
+            features["w:" + word] = features.get("w:" + word, 0.0) + self.word_weight
+            padded = f"<{word}>"
+            for i in range(max(len(padded) - self.char_ngram + 1, 1)):
+                gram = "c:" + padded[i:i + self.char_ngram]
+                features[gram] = features.get(gram, 0.0) + 1.0
+        return features
+
+    @staticmethod
+    @lru_cache(maxsize=65536)
+    def _hash(feature: str) -> Tuple[int, float]:
+        h = zlib.crc32(feature.encode("utf-8"))
+        return h, (1.0 if h & 0x80000000 else -1.0)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        rows, columns, values = [], [], []
+        for row, text in enumerate(texts):
+            for feature, count in self._features(text).items():
+                h, sign = self._hash(feature)
+                rows.append(row)
+                columns.append(h % self.dimension)
+                # Sublinear term frequency keeps repeated words from dominating
+                values.append(sign * (1.0 + math.log(count)))
+
+        matrix = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        np.add.at(matrix, (np.array(rows, dtype=np.int64), np.array(columns, dtype=np.int64)),
+                  np.array(values, dtype=np.float32))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+class IVFIndex:
+    """Approximate nearest-neighbour index (inverted file over k-means lists).
+
+    Rows are assigned to their closest of n_lists spherical k-means centroids;
+    a query only scores the rows in its n_probe closest lists.
+    """
+
+    def __init__(self, centroids: np.ndarray, matrix: np.ndarray, n_probe: int = 16):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.n_probe = n_probe
+        assignments = self._assign(matrix)
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(len(self.centroids) + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+
+    @classmethod
+    def train(cls, matrix: np.ndarray, n_lists: Optional[int] = None, n_probe: int = 16,
+              iterations: int = 10, sample_size: int = 20000, seed: int = 0) -> "IVFIndex":
+        """Fit centroids with spherical k-means on a sample of rows."""
+        rng = np.random.default_rng(seed)
+        n_lists = n_lists or max(1, int(np.sqrt(len(matrix))))
+        sample = matrix if len(matrix) <= sample_size else matrix[rng.choice(len(matrix), sample_size, replace=False)]
+        centroids = sample[rng.choice(len(sample), min(n_lists, len(sample)), replace=False)].copy()
+
+        for _ in range(iterations):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            for i in range(len(centroids)):
+                members = sample[assignments == i]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    norm = np.linalg.norm(centroid)
+                    if norm > 0:
+                        centroids[i] = centroid / norm
+        return cls(centroids, matrix, n_probe)
+
+    def _assign(self, matrix: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+        if not len(matrix):
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([
+            np.argmax(matrix[start:start + chunk_size] @ self.centroids.T, axis=1)
+            for start in range(0, len(matrix), chunk_size)
+        ])
+
+    def reassigned(self, matrix: np.ndarray) -> "IVFIndex":
+        """Same centroids, lists rebuilt for a changed matrix."""
+        return IVFIndex(self.centroids, matrix, self.n_probe)
+
+    def candidates(self, query: np.ndarray) -> np.ndarray:
+        """Row indices in the lists closest to the query."""
+        closest = np.argsort(-(self.centroids @ query))[:self.n_probe]
+        found = [self.lists[i] for i in closest if len(self.lists[i])]
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(found))
+
+
+def segments_fingerprint(embedder: Embedder, segments: Iterable[Dict[str, Any]]) -> str:
+    """Hash of embedder settings and segment texts, used to validate saved matrices."""
+    digest = hashlib.sha256(f"{embedder.name}:{embedder.dimension}".encode("utf-8"))
+    for segment in sorted(segments, key=lambda s: s["id"]):
+        digest.update(f"\0{segment['id']}\0{segment_text(segment)}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class VectorIndex:
+    """Contiguous embedding matrix for catalog segments with cosine top-k search."""
+
+    def __init__(self, ids: List[str], matrix: np.ndarray, embedder: Embedder,
+                 approximate_threshold: Optional[int] = None, ivf: Optional[IVFIndex] = None):
+        self.ids = list(ids)
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.embedder = embedder
+        self.approximate_threshold = approximate_threshold
+        self.ivf: Optional[IVFIndex] = None
+        if approximate_threshold is not None and len(self.ids) >= approximate_threshold:
+            # Keep trained centroids across refreshes; only the lists are rebuilt
+            self.ivf = ivf.reassigned(self.matrix) if ivf is not None else IVFIndex.train(self.matrix)
+
+    @classmethod
+    def build(cls, segments: Iterable[Dict[str, Any]], embedder: Embedder,
+              approximate_threshold: Optional[int] = None) -> "VectorIndex":
+        """Embed segments into a new index."""
+        segments = list(segments)
+        if segments:
+            matrix = embedder.embed([segment_text(s) for s in segments])
+        else:
+            matrix = np.zeros((0, embedder.dimension), dtype=np.float32)
+        return cls([s["id"] for s in segments], matrix, embedder, approximate_threshold)
+
+    def with_changes(self, upserts: Iterable[Dict[str, Any]], deleted_ids: Iterable[str]) -> "VectorIndex":
+        """Return a new index reusing stored rows and embedding only changed segments."""
+        upserts = list(upserts)
+        dropped = set(deleted_ids) | {s["id"] for s in upserts}
+        keep = [i for i, segment_id in enumerate(self.ids) if segment_id not in dropped]
+        ids = [self.ids[i] for i in keep] + [s["id"] for s in upserts]
+        parts = [self.matrix[keep]]
+        if upserts:
+            parts.append(self.embedder.embed([segment_text(s) for s in upserts]))
+        return VectorIndex(ids, np.concatenate(parts), self.embedder, self.approximate_threshold, self.ivf)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, text: str, k: int = 10, min_similarity: float = 0.0,
+               mask: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
+        """Return up to k (segment_id, cosine similarity) pairs, best first.
+
+        mask is an optional boolean array aligned with ids; rows where it is
+        False are never returned.
+        """
+        if not self.ids or k <= 0:
+            return []
+
+        query = self.embedder.embed_one(text)
+        if self.ivf is not None:
+            rows = self.ivf.candidates(query)
+            if mask is not None:
+                rows = rows[mask[rows]]
+            scores = self.matrix[rows] @ query
+        else:
+            scores = self.matrix @ query
+            rows = np.arange(len(self.ids))
+            if mask is not None:
+                rows = rows[mask]
+                scores = scores[mask]
+
+        keep = scores >= min_similarity
+        rows, scores = rows[keep], scores[keep]
+        if len(rows) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return [(self.ids[rows[i]], float(scores[i])) for i in order]
+
+    def fingerprint(self, segments: Iterable[Dict[str, Any]]) -> str:
+        """Hash of embedder settings and segment texts, used to validate saved matrices."""
+        return segments_fingerprint(self.embedder, segments)
+
+    def save(self, path: str, segments: Iterable[Dict[str, Any]]):
+        """Persist the embedding matrix so it can be loaded instead of recomputed."""
+        np.savez(path, ids=np.array(self.ids), matrix=self.matrix,
+                 fingerprint=np.array(self.fingerprint(segments)))
+
+    @classmethod
+    def load_or_build(cls, path: Optional[str], segments: Iterable[Dict[str, Any]], embedder: Embedder,
+                      approximate_threshold: Optional[int] = None) -> "VectorIndex":
+        """Load a precomputed matrix if it matches the segments, else embed them."""
+        segments = list(segments)
+        if path and os.path.exists(path):
+            try:
+                stored = np.load(path)
+                # Checked before the index (and its IVF lists) is built from the file
+                if stored["matrix"].shape[1] == embedder.dimension and \
+                        str(stored["fingerprint"]) == segments_fingerprint(embedder, segments):
+                    return cls([str(i) for i in stored["ids"]], stored["matrix"], embedder, approximate_threshold)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Ignoring unreadable embedding file {path}: {e}")
+        return cls.build(segments, embedder, approximate_threshold)
+
+
+def create_embedder(settings: Dict[str, Any]) -> Embedder:
+    """Create the configured embedder (only 'hashing' ships with the agent)."""
+    embedder_type = settings.get("embedder", "hashing")
+    if embedder_type == "hashing":
+        return HashingEmbedder(dimension=settings.get("dimension", 512))
+    raise ValueError(f"Unknown embedder: {embedder_type}")
+
+
+if __name__ == "__main__":
+    # Precompute the segment embedding matrix for the configured catalog
+    from config_loader import load_config
+
+    config = load_config()
+    settings = config.get("catalog", {}).get("semantic", {})
+    db_path = config.get("database", {}).get("path", "signals_agent.db")
+    output_path = settings.get("embeddings_path") or "signals_agent.vectors.npz"
+
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    rows = [dict(row) for row in conn.execute("SELECT id, name, description FROM signal_segments")]
+    conn.close()
+
+    index = VectorIndex.build(rows, create_embedder(settings))
+    index.save(output_path, rows)
+    print(f"Saved {len(index)} segment embeddings to {output_path}")